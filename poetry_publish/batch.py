@@ -0,0 +1,345 @@
+"""
+    Release many repositories together, from a batch manifest
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    e.g. a framework and its plugins, in a JSON file like "batch.json":
+
+        {
+            "repositories": {
+                "pypi": {"url": "https://upload.pypi.org/legacy/", "interval": 30}
+            },
+            "options": {"native_upload": true},
+            "releases": [
+                {"name": "framework", "path": "../framework", "version": "2.0.0"},
+                {
+                    "name": "framework-foo",
+                    "path": "../framework-foo",
+                    "version": "1.1.0",
+                    "repository": "pypi",
+                    "depends_on": ["framework"]
+                }
+            ]
+        }
+
+    Every release is a complete poetry_publish() run in its own process (in the
+    repository directory), started as soon as all releases it depends on are released.
+    Independent releases run concurrently. The uploads to one index are throttled.
+
+    The state of every release is written to a report file, e.g.: "batch.report.json".
+    The next run with the same manifest skips the released versions. The other
+    releases resume at their first unfinished step.
+
+    e.g.:
+        ~$ python -m poetry_publish.batch batch.json
+
+    :copyleft: 2022 by the poetry-publish team
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+import inspect
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Tuple
+
+from poetry_publish.publish import poetry_publish
+from poetry_publish.utils.interactive import set_interactive
+from poetry_publish.utils.steps import Step, run_steps
+from poetry_publish.utils.throttle import MAX_UPLOADS, UPLOAD_INTERVAL, UploadThrottle
+from poetry_publish.utils.upload import PYPI_UPLOAD_URL
+
+
+DEFAULT_REPOSITORIES = {'pypi': {'url': PYPI_UPLOAD_URL}}
+
+# Arguments of poetry_publish() that are set by the batch, not by the manifest:
+BATCH_ARGUMENTS = ('package_root', 'version', 'repositories', 'upload_throttles')
+
+RELEASED = 'released'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+PENDING = 'pending'
+
+
+@dataclass(frozen=True)
+class BatchEntry:
+    name: str
+    path: Path
+    version: str
+    repository: str = 'pypi'
+    depends_on: Tuple[str, ...] = ()
+
+
+@dataclass
+class EntryResult:
+    name: str
+    version: str
+    status: str = PENDING
+    duration: float = 0
+    exit_code: int = None
+    error: str = None
+
+
+@dataclass
+class BatchManifest:
+    entries: list  # BatchEntry in the order of the manifest
+    repositories: dict  # name -> {'url': ..., 'max_uploads': ..., 'interval': ...}
+    options: dict  # passed to poetry_publish() of every release
+
+
+def check_options(options, name):
+    if not isinstance(options, dict):
+        raise ValueError(f'Options of {name} must be a JSON object, not: {options!r}')
+    allowed = set(inspect.signature(poetry_publish).parameters) - set(BATCH_ARGUMENTS)
+    unknown = set(options) - allowed
+    if unknown:
+        raise ValueError(f'Unknown options of {name}: {", ".join(sorted(unknown))}')
+
+
+def load_manifest(manifest_path):
+    """
+    Read and check the batch manifest. Paths are relative to the manifest directory.
+    """
+    manifest_path = Path(manifest_path)
+    data = json.loads(manifest_path.read_text())
+
+    repositories = data.get('repositories', DEFAULT_REPOSITORIES)
+    for name, repository in repositories.items():
+        if 'url' not in repository:
+            raise ValueError(f'Repository {name!r} has no "url"')
+
+    options = data.get('options', {})
+    check_options(options, name='the batch')
+
+    entries = []
+    for release in data.get('releases', []):
+        path = Path(manifest_path.parent, release['path']).resolve()
+        entry = BatchEntry(
+            name=release.get('name', path.name),
+            path=path,
+            version=release['version'],
+            repository=release.get('repository', 'pypi'),
+            depends_on=tuple(release.get('depends_on', ())),
+        )
+        if not entry.path.is_dir():
+            raise ValueError(f'Path of {entry.name!r} is not a directory: {entry.path}')
+        if entry.repository not in repositories:
+            raise ValueError(f'Unknown repository of {entry.name!r}: {entry.repository!r}')
+        entries.append(entry)
+
+    if not entries:
+        raise ValueError(f'No releases in {manifest_path}')
+
+    names = [entry.name for entry in entries]
+    if len(set(names)) != len(names):
+        raise ValueError(f'Release names are not unique: {names}')
+    for entry in entries:
+        unknown = set(entry.depends_on) - set(names)
+        if unknown:
+            raise ValueError(f'{entry.name!r} depends on unknown releases: {sorted(unknown)}')
+
+    return BatchManifest(entries=entries, repositories=repositories, options=options)
+
+
+class BatchReport:
+    """
+    The results of all releases, written to `path` after every change.
+    """
+
+    def __init__(self, path, entries):
+        self.path = Path(path)
+        self.results = {
+            entry.name: EntryResult(name=entry.name, version=entry.version) for entry in entries
+        }
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Keep the released versions of a earlier run. Returns their names.
+        """
+        try:
+            data = json.loads(self.path.read_text())
+        except (FileNotFoundError, ValueError):
+            return []
+
+        released = []
+        for record in data.get('releases', []):
+            result = self.results.get(record.get('name'))
+            if (
+                result is not None
+                and record.get('status') == RELEASED
+                and record.get('version') == result.version
+            ):
+                self.results[result.name] = EntryResult(**record)
+                released.append(result.name)
+        return released
+
+    def update(self, result):
+        with self._lock:
+            self.results[result.name] = result
+            # Write a new file and replace the old one: a crash never leaves a broken report
+            temp_path = self.path.with_name(f'{self.path.name}.tmp')
+            temp_path.write_text(
+                json.dumps(
+                    {'releases': [asdict(result) for result in self.results.values()]}, indent=4
+                )
+            )
+            os.replace(temp_path, self.path)
+
+    @property
+    def ok(self):
+        return all(result.status == RELEASED for result in self.results.values())
+
+
+def release_entry(entry, options, repository_url, throttle, release=poetry_publish):
+    """
+    Run the release in a worker process of the batch. Returns a EntryResult.
+    """
+    os.chdir(entry.path)
+    sys.argv = ['publish']  # nothing to pass through to "poetry publish"
+    result = EntryResult(name=entry.name, version=entry.version, status=RELEASED, exit_code=0)
+    start_time = time.monotonic()
+    try:
+        release(
+            package_root=entry.path,
+            version=entry.version,
+            repositories={entry.repository: repository_url},
+            upload_throttles={entry.repository: throttle},
+            **options,
+        )
+    except SystemExit as err:
+        if err.code:
+            result.status = FAILED
+            result.exit_code = err.code if isinstance(err.code, int) else 1
+            result.error = repr(err)
+    except Exception as err:
+        result.status = FAILED
+        result.exit_code = 1
+        result.error = repr(err)
+    result.duration = time.monotonic() - start_time
+    return result
+
+
+def print_report(report):
+    print('\nBatch report:')
+    name_width = max(len(name) for name in report.results)
+    for result in report.results.values():
+        line = (
+            f'\t{result.name:<{name_width}} v{result.version:<10}'
+            f' {result.status.upper():<8} {result.duration:.1f}s'
+        )
+        if result.error:
+            line += f' {result.error}'
+        print(line)
+
+
+def poetry_publish_batch(
+    manifest_path,
+    max_workers=None,
+    report_filename=None,
+    resume=True,
+    release=poetry_publish,
+):
+    """
+    Release all repositories of the batch manifest, in the order of their "depends_on".
+    At most `max_workers` releases run at the same time.
+
+    The uploads to a index are throttled by its "max_uploads" (default: MAX_UPLOADS)
+    at the same time and the "interval" in seconds (default: UPLOAD_INTERVAL) between
+    the starts of two uploads.
+
+    The releases are non-interactive: A question, e.g.: about a 'dev' version, fails the
+    release. The releases that depend on a failed one are skipped.
+
+    The report is written to `report_filename` (default: e.g.: "batch.report.json" next to
+    "batch.json"). With resume=True the released versions of the report are not released
+    again. Exit with an error after the report, if one of the releases is not released.
+    """
+    manifest_path = Path(manifest_path)
+    manifest = load_manifest(manifest_path)
+    report = BatchReport(
+        report_filename or manifest_path.with_suffix('.report.json'), manifest.entries
+    )
+    if resume:
+        released = report.load()
+        if released:
+            print(f'\nAlready released, skip: {", ".join(released)}')
+
+    # Fork the releases from a process without threads:
+    mp_context = multiprocessing.get_context('forkserver')
+    mp_context.set_forkserver_preload(['poetry_publish.publish'])
+
+    with mp_context.Manager() as manager, ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=mp_context,
+        initializer=set_interactive,
+        initargs=(False,),  # Nobody can answer questions from the worker processes
+    ) as executor:
+        throttles = {
+            name: UploadThrottle(
+                manager,
+                name=name,
+                max_uploads=repository.get('max_uploads', MAX_UPLOADS),
+                interval=repository.get('interval', UPLOAD_INTERVAL),
+            )
+            for name, repository in manifest.repositories.items()
+        }
+
+        def release_step(entry):
+            def func(context):
+                if report.results[entry.name].status == RELEASED:
+                    return
+
+                failed = [
+                    name for name in entry.depends_on if report.results[name].status != RELEASED
+                ]
+                if failed:
+                    result = EntryResult(
+                        name=entry.name,
+                        version=entry.version,
+                        status=SKIPPED,
+                        error=f'Not released: {", ".join(failed)}',
+                    )
+                else:
+                    print(f'\nRelease {entry.name} v{entry.version} ({entry.path})')
+                    try:
+                        result = executor.submit(
+                            release_entry,
+                            entry,
+                            options=manifest.options,
+                            repository_url=manifest.repositories[entry.repository]['url'],
+                            throttle=throttles[entry.repository],
+                            release=release,
+                        ).result()
+                    except Exception as err:  # e.g.: the worker process died
+                        result = EntryResult(
+                            name=entry.name, version=entry.version, status=FAILED, error=repr(err)
+                        )
+                    print(f'\n{entry.name} v{entry.version}: {result.status}')
+                report.update(result)
+
+            return Step(entry.name, func, requires=entry.depends_on)
+
+        # A failed release never raises: the independent releases go on.
+        steps = [release_step(entry) for entry in manifest.entries]
+        run_steps(steps, None, max_workers=max_workers)
+
+    print_report(report)
+    print(f'\nReport written to: {report.path}')
+    if not report.ok:
+        print('\n *** ERROR: Not all releases are done.')
+        print('Fix the errors and start the batch again: The released versions are skipped.')
+        sys.exit(5)
+    return report.results
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        print(f'Usage: {sys.argv[0]} <manifest> [<max workers>]')
+        sys.exit(1)
+    poetry_publish_batch(sys.argv[1], *(int(arg) for arg in sys.argv[2:]))
@@ -0,0 +1,344 @@
+"""
+    Release daemon: Accept release jobs over a local UNIX socket
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    A client sends one JSON line with the job, e.g.:
+
+        {"package_root": "/srv/foo", "version": "1.2.3", "options": {"native_upload": true}}
+
+    and gets a JSON line for every event, until the job is done: "queued", "job_start",
+    the records of the publish log (e.g.: "step_start", "step_end", "output"),
+    "console" for the printed output and "job_end" with the exit code.
+
+    The jobs of one git repository run one after another, in the order they arrived.
+    At most `max_jobs` jobs run at the same time. Every job runs in a new process,
+    forked from a server process that has imported poetry-publish already.
+
+    e.g.:
+        ~$ python -m poetry_publish.daemon /run/poetry-publish.sock
+
+    :copyleft: 2022 by the poetry-publish team
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import traceback
+from datetime import datetime, timezone
+from pathlib import Path
+
+from poetry_publish.publish import poetry_publish
+from poetry_publish.utils.interactive import set_interactive
+from poetry_publish.utils.publish_log import JsonLinesFormatter, StepFilter, logger
+from poetry_publish.utils.subprocess_utils import verbose_check_output
+
+
+# Jobs that run at the same time, in different repositories:
+MAX_JOBS = 2
+
+# Options of poetry_publish() that a job can set:
+JOB_OPTIONS = (
+    'log_filename',
+    'creole_readme',
+    'max_workers',
+    'twine_in_process',
+    'twine_fail_fast',
+    'native_upload',
+    'build_in_process',
+    'compression_level',
+    'build_in_worktree',
+    'scratch_dir',
+    'output_dir',
+    'smoke_test',
+    'validate_archives',
+    'repository_url',
+    'upload_timeout',
+    'resume',
+    'step_timeouts',
+    'repositories',
+)
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds')
+
+
+def _event(event, message='', **fields):
+    return json.dumps({'time': _now(), 'event': event, 'message': message, **fields})
+
+
+class JobError(ValueError):
+    pass
+
+
+def check_job(job):
+    if not isinstance(job, dict):
+        raise JobError(f'Job must be a JSON object, not: {job!r}')
+    for key in ('package_root', 'version'):
+        if not isinstance(job.get(key), str):
+            raise JobError(f'Job needs a {key!r} string')
+    if not Path(job['package_root']).is_dir():
+        raise JobError(f'Package root {job["package_root"]!r} is not a directory')
+    unknown = set(job.get('options', {})) - set(JOB_OPTIONS)
+    if unknown:
+        raise JobError(f'Unknown options: {", ".join(sorted(unknown))}')
+    publish_args = job.get('publish_args', [])
+    if not isinstance(publish_args, list) or not all(isinstance(arg, str) for arg in publish_args):
+        raise JobError('Job "publish_args" must be a list of strings')
+
+
+def get_repository(package_root):
+    """
+    Returns the root of the git repository: The jobs of one repository are serialized.
+    """
+    call_info, output = verbose_check_output(
+        'git', 'rev-parse', '--show-toplevel', cwd=package_root
+    )
+    return output.strip()
+
+
+class EventHandler(logging.Handler):
+    """
+    Send the records of the publish log to the daemon.
+    """
+
+    def __init__(self, send):
+        super().__init__()
+        self.send = send
+        self.setFormatter(JsonLinesFormatter())
+        self.addFilter(StepFilter())
+
+    def emit(self, record):
+        self.send(self.format(record))
+
+
+def _forward_console(read_fd, send):
+    with open(read_fd, encoding='utf-8', errors='replace') as console:
+        for line in console:
+            send(_event('console', line))
+
+
+def run_job(job, connection, release=poetry_publish):
+    """
+    Run the release in the job process: All output is sent as events over `connection`,
+    the last message is the exit code.
+    """
+    lock = threading.Lock()
+
+    def send(line):
+        with lock:
+            connection.send(line)
+
+    # The output of the release and of all called programs goes to the daemon:
+    sys.stdout.flush()
+    sys.stderr.flush()
+    read_fd, write_fd = os.pipe()
+    os.dup2(write_fd, 1)
+    os.dup2(write_fd, 2)
+    os.close(write_fd)
+    sys.stdout.reconfigure(line_buffering=True)
+    sys.stderr.reconfigure(line_buffering=True)
+    reader = threading.Thread(target=_forward_console, args=(read_fd, send), daemon=True)
+    reader.start()
+
+    handler = EventHandler(send)
+    logger.addHandler(handler)
+    set_interactive(False)  # Nobody can answer questions
+    sys.argv = ['publish', *job.get('publish_args', [])]  # passed to "poetry publish"
+
+    exit_code = 0
+    try:
+        os.chdir(job['package_root'])
+        release(
+            package_root=Path(job['package_root']),
+            version=job['version'],
+            **job.get('options', {}),
+        )
+    except SystemExit as err:
+        if err.code is None:
+            exit_code = 0
+        elif isinstance(err.code, int):
+            exit_code = err.code
+        else:
+            print(err.code)
+            exit_code = 1
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        logger.removeHandler(handler)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.close(1)
+        os.close(2)
+        reader.join(timeout=5)  # a program that is still running may hold the output open
+        send(exit_code)
+        connection.close()
+
+
+class RepositoryQueue:
+    """
+    The waiting and the running jobs of one repository, in the order they arrived.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.job_ids = []
+
+    def enter(self, job_id):
+        """
+        Returns the number of jobs before this one.
+        """
+        with self.condition:
+            self.job_ids.append(job_id)
+            return len(self.job_ids) - 1
+
+    def wait(self, job_id):
+        with self.condition:
+            self.condition.wait_for(lambda: self.job_ids[0] == job_id)
+
+    def leave(self, job_id):
+        with self.condition:
+            self.job_ids.remove(job_id)
+            self.condition.notify_all()
+
+
+class ReleaseDaemon:
+    def __init__(self, max_jobs=MAX_JOBS, release=poetry_publish):
+        self.release = release
+        self.semaphore = threading.BoundedSemaphore(max_jobs)
+        self.queues = {}  # repository -> RepositoryQueue
+        self.lock = threading.Lock()
+        self.job_ids = itertools.count(1)
+
+        # Fork the jobs from a process without threads, that imported everything once:
+        self.mp_context = multiprocessing.get_context('forkserver')
+        self.mp_context.set_forkserver_preload(['poetry_publish.publish'])
+
+    def get_queue(self, repository):
+        with self.lock:
+            if repository not in self.queues:
+                self.queues[repository] = RepositoryQueue()
+            return self.queues[repository]
+
+    def run(self, job, send):
+        """
+        Queue the job, run it and send all events. Returns the exit code.
+        """
+        check_job(job)
+        repository = get_repository(job['package_root'])
+        queue = self.get_queue(repository)
+        job_id = next(self.job_ids)
+
+        position = queue.enter(job_id)
+        try:
+            send(_event('queued', job=job_id, repository=repository, position=position))
+            queue.wait(job_id)
+            with self.semaphore:
+                send(_event('job_start', job=job_id))
+                return self._run_process(job_id, job, send)
+        finally:
+            queue.leave(job_id)
+
+    def _run_process(self, job_id, job, send):
+        receiver, sender = self.mp_context.Pipe(duplex=False)
+        process = self.mp_context.Process(target=run_job, args=(job, sender, self.release))
+        process.start()
+        sender.close()
+        exit_code = None
+        try:
+            while True:
+                try:
+                    message = receiver.recv()
+                except EOFError:
+                    break
+                if isinstance(message, int):
+                    exit_code = message
+                else:
+                    send(message)
+        finally:
+            receiver.close()
+            process.join()
+
+        if exit_code is None:  # The job process died
+            exit_code = process.exitcode or 1
+        send(_event('job_end', job=job_id, ok=exit_code == 0, exit_code=exit_code))
+        return exit_code
+
+
+class JobRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        def send(line):
+            try:
+                self.wfile.write(f'{line}\n'.encode('utf-8'))
+                self.wfile.flush()
+            except OSError:
+                pass  # The client is gone, but the release must be finished
+
+        try:
+            job = json.loads(self.rfile.readline())
+            self.server.release_daemon.run(job, send)
+        except (ValueError, OSError, subprocess.CalledProcessError) as err:
+            # e.g.: a invalid job or not a git repository
+            send(_event('error', str(err)))
+
+
+class ReleaseServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, release_daemon):
+        self.release_daemon = release_daemon
+        super().__init__(str(socket_path), JobRequestHandler)
+
+
+def serve(socket_path, max_jobs=MAX_JOBS, release=poetry_publish):
+    """
+    Accept release jobs on the UNIX socket, until the process is stopped.
+    Only the owner of the daemon process can use the socket.
+    """
+    socket_path = Path(socket_path)
+    if socket_path.is_socket():
+        socket_path.unlink()  # from a old daemon process
+
+    release_daemon = ReleaseDaemon(max_jobs=max_jobs, release=release)
+    old_umask = os.umask(0o177)
+    try:
+        server = ReleaseServer(socket_path, release_daemon)
+    finally:
+        os.umask(old_umask)
+
+    print(f'Accept release jobs on: {socket_path} (max. {max_jobs} jobs at the same time)')
+    try:
+        with server:
+            server.serve_forever()
+    except KeyboardInterrupt:
+        print('Bye.')
+    finally:
+        socket_path.unlink()
+
+
+def submit_job(socket_path, job):
+    """
+    Send a release job to the daemon and yield all events as dicts.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(socket_path))
+        sock.sendall(f'{json.dumps(job)}\n'.encode('utf-8'))
+        with sock.makefile('r', encoding='utf-8') as events:
+            for line in events:
+                yield json.loads(line)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        print(f'Usage: {sys.argv[0]} <socket path> [<max jobs>]')
+        sys.exit(1)
+    serve(sys.argv[1], *(int(arg) for arg in sys.argv[2:]))
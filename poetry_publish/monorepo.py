@@ -0,0 +1,235 @@
+"""
+    Publish many poetry packages of one git repository
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    The git prechecks run only once for the whole repository.
+    Build, twine check and upload of the packages run in parallel worker processes.
+
+    :copyleft: 2022 by the poetry-publish team
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+import functools
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from poetry_publish.publish import (
+    DEFAULT_STEP_TIMEOUT,
+    REQUIRED_PROGRAMS,
+    ReleaseContext,
+    check_git_branch,
+    check_git_clean,
+    check_git_tag,
+    check_git_up_to_date,
+    git_fetch,
+    git_push,
+    git_push_tags,
+    git_tag_version,
+    poetry_build,
+    run_poetry_check,
+    set_poetry_version,
+    twine_check,
+    upload,
+    write_release_manifest,
+)
+from poetry_publish.utils.interactive import confirm, reset_abort, set_interactive
+from poetry_publish.utils.publish_log import publish_log
+from poetry_publish.utils.steps import Step, run_steps, set_timeouts
+from poetry_publish.utils.subprocess_utils import check_programs
+from poetry_publish.utils.upload import PYPI_UPLOAD_URL
+
+
+# Steps for every package, executed in the worker processes:
+PACKAGE_STEPS = (
+    Step('poetry_check', run_poetry_check),
+    Step('build', poetry_build),
+    Step('manifest', write_release_manifest, requires=('build',)),
+    Step('twine_check', twine_check, requires=('build',)),
+    Step('upload', upload, requires=('poetry_check', 'manifest', 'twine_check')),
+)
+
+
+@dataclass
+class PackageResult:
+    name: str
+    version: str
+    ok: bool
+    duration: float
+    error: str = None
+
+
+def release_package(context, steps=PACKAGE_STEPS):
+    """
+    Build, check and upload one package. Errors are returned in the result, not raised.
+    """
+    start_time = time.monotonic()
+    try:
+        with publish_log(context.log_filename):
+            run_steps(steps, context, max_workers=1)
+    except (Exception, SystemExit) as err:
+        return PackageResult(
+            name=context.name,
+            version=context.version,
+            ok=False,
+            duration=time.monotonic() - start_time,
+            error=repr(err),
+        )
+    return PackageResult(
+        name=context.name,
+        version=context.version,
+        ok=True,
+        duration=time.monotonic() - start_time,
+    )
+
+
+def release_packages(contexts, max_workers=None, steps=PACKAGE_STEPS):
+    func = functools.partial(release_package, steps=steps)
+    if max_workers == 1:
+        return [func(context) for context in contexts]
+
+    # Nobody can answer questions from the worker processes:
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=set_interactive, initargs=(False,)
+    ) as executor:
+        return list(executor.map(func, contexts))
+
+
+def _for_package(func, context):
+    """
+    Call the step function with the package context instead of the repository context.
+    """
+    return lambda repository: func(context)
+
+
+def print_report(results):
+    print('\nRelease report:')
+    name_width = max(len(result.name) for result in results)
+    for result in results:
+        status = 'OK' if result.ok else 'ERROR'
+        line = (
+            f'\t{result.name:<{name_width}} v{result.version:<10}'
+            f' {status:<5} {result.duration:.1f}s'
+        )
+        if result.error:
+            line += f' {result.error}'
+        print(line)
+
+
+def poetry_publish_many(
+    packages,
+    repository_root=None,
+    log_filename='publish.log',
+    max_workers=None,
+    twine_in_process=False,
+    native_upload=False,
+    repository_url=PYPI_UPLOAD_URL,
+    step_timeouts=None,
+):
+    """
+    Publish many packages of one git repository, e.g.:
+
+        poetry_publish_many(
+            packages={
+                Path(repository_root, 'foo'): foo.__version__,
+                Path(repository_root, 'bar'): bar.__version__,
+            },
+            repository_root=repository_root,
+        )
+
+    The git branch/clean/up-to-date checks run once for the whole repository.
+    The packages are released in parallel processes. Use max_workers=1 to release them
+    one after another in the current process.
+
+    Every step has a deadline of DEFAULT_STEP_TIMEOUT seconds: If it's exceeded, the
+    running command is killed and the package fails. Set other deadlines for the steps of
+    the packages with e.g.: step_timeouts={'build': 3600, 'upload': None}
+
+    Every released package is tagged with "<package directory name>-v<version>".
+    Exit with an error after the report, if one of the packages failed.
+    """
+    if not packages:
+        raise ValueError('No packages to publish')
+    package_steps = set_timeouts(PACKAGE_STEPS, step_timeouts, default=DEFAULT_STEP_TIMEOUT)
+
+    check_programs(*REQUIRED_PROGRAMS)
+    reset_abort()
+
+    contexts = []
+    for package_root, version in packages.items():
+        package_root = Path(package_root)
+        contexts.append(
+            ReleaseContext(
+                package_root=package_root,
+                version=version,
+                log_filename=str(Path(package_root, log_filename)),
+                cwd=package_root,
+                tag_prefix=f'{package_root.name}-',
+                twine_in_process=twine_in_process,
+                native_upload=native_upload,
+                repository_url=repository_url,
+            )
+        )
+
+    names = [context.name for context in contexts]
+    if len(set(names)) != len(names):
+        raise ValueError(f'Package directory names are not unique: {names}')
+
+    for context in contexts:
+        for key in ('dev', 'rc'):
+            if key in context.version:
+                confirm(f'WARNING: {context.name} version contains {key!r}: v{context.version}\n')
+                break
+
+    # ------------------------------------------------------------------------
+
+    repository = ReleaseContext(
+        package_root=Path(repository_root or '.'), version=None, cwd=repository_root
+    )
+    steps = [Step('git_branch', check_git_branch)]
+    version_steps = []
+    tag_steps = []
+    for context in contexts:
+        version_steps.append(f'{context.name}:poetry_version')
+        steps.append(
+            Step(
+                version_steps[-1],
+                _for_package(set_poetry_version, context),
+                requires=('git_branch',),
+            )
+        )
+        tag_steps.append(f'{context.name}:git_tag_check')
+        steps.append(
+            Step(tag_steps[-1], _for_package(check_git_tag, context), requires=('git_branch',))
+        )
+    steps += [
+        Step('git_clean', check_git_clean, requires=tuple(version_steps)),
+        Step('git_fetch', git_fetch, requires=('git_branch',)),
+        Step('git_up_to_date', check_git_up_to_date, requires=('git_branch', 'git_fetch')),
+        Step(
+            'git_push',
+            git_push,
+            requires=('git_branch', 'git_clean', 'git_up_to_date', *tag_steps),
+        ),
+    ]
+    steps = set_timeouts(steps, default=DEFAULT_STEP_TIMEOUT)
+    run_steps(steps, repository, max_workers=max_workers)
+
+    # ------------------------------------------------------------------------
+
+    results = release_packages(contexts, max_workers=max_workers, steps=package_steps)
+
+    # ------------------------------------------------------------------------
+
+    for context, result in zip(contexts, results):
+        if result.ok:
+            git_tag_version(context)
+    if any(result.ok for result in results):
+        git_push_tags(repository)
+
+    print_report(results)
+    if not all(result.ok for result in results):
+        sys.exit(5)
+    return results
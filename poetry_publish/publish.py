@@ -11,51 +11,140 @@ import os
 import shutil
 import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
 
 from poetry_publish.utils import update_rst_readme
-from poetry_publish.utils.interactive import confirm
-from poetry_publish.utils.subprocess_utils import verbose_check_call, verbose_check_output
+from poetry_publish.utils.backend_build import build_artifacts
+from poetry_publish.utils.build_cache import (
+    get_backend_version,
+    get_build_key,
+    get_cached_build,
+    store_build,
+)
+from poetry_publish.utils.cache import get_cache_dir
+from poetry_publish.utils.interactive import confirm, reset_abort
+from poetry_publish.utils.journal import ReleaseJournal
+from poetry_publish.utils.manifest import hash_artifacts, write_manifest
+from poetry_publish.utils.publish_log import (
+    LOG_BACKUP_COUNT,
+    LOG_MAX_AGE,
+    LOG_MAX_BYTES,
+    CommandLog,
+    log_event,
+    publish_log,
+)
+from poetry_publish.utils.smoke_test import smoke_test_wheel
+from poetry_publish.utils.steps import Step, run_steps, set_timeouts
+from poetry_publish.utils.subprocess_utils import (
+    check_programs,
+    verbose_check_call,
+    verbose_check_output,
+    verbose_stream_call,
+)
+from poetry_publish.utils.timing import (
+    bind_current_step,
+    print_timings,
+    write_profile,
+    write_report,
+)
 from poetry_publish.utils.twine_check import run_twine_check
+from poetry_publish.utils.upload import (
+    PYPI_UPLOAD_URL,
+    UPLOAD_TIMEOUT,
+    RepositoryResult,
+    get_credential_variables,
+    get_credentials,
+    print_repository_report,
+    print_upload_report,
+    upload_artifacts,
+)
+from poetry_publish.utils.validate import print_validation_result, validate_artifacts
+from poetry_publish.utils.watchdog import StepTimeoutError
+from poetry_publish.utils.worktree import collect_artifacts, get_git_prefix, git_worktree
 
 
-def poetry_publish(package_root, version, log_filename='publish.log', creole_readme=False):
-    """
-    Helper to build and upload to PyPi, with prechecks.
+REQUIRED_PROGRAMS = ('git', 'poetry', 'twine')
 
-    Optional arguments are passed to `poetry publish` e.g.:
+# Seconds until "git fetch" of the main branch is aborted:
+FETCH_TIMEOUT = 60
 
-        $ poetry config repositories.testpypi https://test.pypi.org/simple
-        $ poetry run publish --repository=testpypi
+# Seconds a release step may run, until all its commands are killed:
+DEFAULT_STEP_TIMEOUT = 20 * 60
 
-    Build and upload to PyPi, if...
-        ... __version__ doesn't contains 'dev'
-        ... we are on git "master" branch
-        ... git repository is 'clean' (no changed files)
 
-    Upload with 'poetry', git tag the current version and git push --tag
-
-    add this to poetry pyproject.toml, e.g.:
-
-        [tool.poetry.scripts]
-        publish = 'foo.bar:publish'
-
-    based on:
-    https://github.com/jedie/python-code-snippets/blob/master/CodeSnippets/setup_publish.py
+@dataclass
+class ReleaseContext:
+    """
+    State of one release, shared between all release steps.
     """
-    if creole_readme:
-        update_rst_readme(package_root=package_root, filename='README.creole')
-
-    # ------------------------------------------------------------------------
-
-    for key in ('dev', 'rc'):
-        if key in version:
-            confirm(f'WARNING: Version contains {key!r}: v{version}\n')
-            break
-
-    # ------------------------------------------------------------------------
 
+    package_root: Path
+    version: str
+    log_filename: str = 'publish.log'
+    cwd: Path = None  # None -> run all commands in the current directory
+    twine_in_process: bool = False
+    twine_fail_fast: bool = False
+    native_upload: bool = False
+    build_in_process: bool = False
+    compression_level: int = None  # None -> the poetry-core defaults
+    build_in_worktree: bool = False
+    scratch_dir: Path = None  # for the worktree, None -> tmpfs, if available
+    output_dir: Path = None  # for "dist" and the state of the release, None -> base_path
+    smoke_test: bool = False
+    validate_archives: bool = False
+    repository_url: str = PYPI_UPLOAD_URL
+    upload_timeout: tuple = UPLOAD_TIMEOUT  # (connect, read) seconds of the native upload
+    repositories: dict = None  # name -> upload URL, to upload to more than one repository
+    upload_throttles: dict = None  # repository name -> UploadThrottle
+    tag_prefix: str = ''
+    commit: str = None
+    artifacts: list = None  # ArtifactDigests of all files in "dist", set by the build step
+    journal: ReleaseJournal = None  # records the uploads to every repository, too
+    current_branch: str = None
+    all_branches: set = field(default_factory=set)
+
+    @property
+    def name(self):
+        return self.package_root.name
+
+    @property
+    def base_path(self):
+        """
+        The directory in which the commands run.
+        """
+        return Path(self.cwd or '.')
+
+    @property
+    def output_path(self):
+        """
+        The directory of "dist", the build cache, the journal and the release manifest.
+        """
+        return Path(self.output_dir or self.base_path)
+
+    @property
+    def dist_path(self):
+        return Path(self.output_path, 'dist')
+
+    @property
+    def dist_dir(self):
+        """
+        "dist" for the commands that run in `base_path`, e.g.: "twine upload dist/*.*"
+        """
+        return 'dist' if self.output_dir is None else str(self.dist_path.resolve())
+
+    @property
+    def git_tag(self):
+        return f'{self.tag_prefix}v{self.version}'
+
+
+def check_git_branch(context):
     print('\nCheck if we are on "master" branch:')
-    call_info, output = verbose_check_output('git', 'branch', '--no-color')
+    call_info, output = verbose_check_output('git', 'branch', '--no-color', cwd=context.cwd)
     print(f'\t{call_info}')
     current_branch = None
     all_branches = set()
@@ -76,15 +165,22 @@ def poetry_publish(package_root, version, log_filename='publish.log', creole_rea
     else:
         confirm(f'\nNOTE: It seems you are not on "main" or "master":\n{output}')
 
-    # ------------------------------------------------------------------------
+    context.current_branch = current_branch
+    context.all_branches = all_branches
 
-    print(f'\nSet version in "pyproject.toml" to: v{version}')
-    verbose_check_call('poetry', 'version', version)
 
-    # ------------------------------------------------------------------------
+def set_poetry_version(context):
+    print(f'\nSet version in "pyproject.toml" to: v{context.version}')
+    verbose_check_call('poetry', 'version', context.version, cwd=context.cwd)
+
 
+def check_git_clean(context):
     print('\ncheck if if git repro is clean:')
-    call_info, output = verbose_check_output('git', 'status', '--porcelain')
+    # The untracked cache avoids scanning all directories for new files.
+    # A file system monitor (core.fsmonitor) is used, too, if it's configured.
+    call_info, output = verbose_check_output(
+        'git', '-c', 'core.untrackedCache=true', 'status', '--porcelain', cwd=context.cwd
+    )
     print(f'\t{call_info}')
     if output == '':
         print('OK')
@@ -93,43 +189,77 @@ def poetry_publish(package_root, version, log_filename='publish.log', creole_rea
         print(output)
         sys.exit(1)
 
-    # ------------------------------------------------------------------------
 
+def run_poetry_check(context):
     print('\nRun "poetry check":')
-    call_info, output = verbose_check_output('poetry', 'check')
+    call_info, output = verbose_check_output('poetry', 'check', cwd=context.cwd)
     if 'All set!' not in output:
         print(output)
         confirm('Poetry check failed!')
     else:
         print('OK')
 
-    # ------------------------------------------------------------------------
 
-    print('\ncheck if pull is needed')
-    verbose_check_call('git', 'fetch', '--all')
-    main_branch = None
+def get_main_branch(context):
     for branch_name in ('main', 'master'):
-        if branch_name in all_branches:
-            main_branch = branch_name
-            break
-    if not main_branch:
-        print(f'ERROR Did not find the "main" git branch in: {all_branches}')
-        sys.exit(4)
+        if branch_name in context.all_branches:
+            return branch_name
+
+    print(f'ERROR Did not find the "main" git branch in: {context.all_branches}')
+    sys.exit(4)
+
 
+def git_fetch(context):
+    print('\ncheck if pull is needed')
+    main_branch = get_main_branch(context)
+    # Fetch only the main branch from "origin", instead of all branches of all remotes:
+    try:
+        verbose_check_call(
+            'git',
+            'fetch',
+            '--no-tags',
+            'origin',
+            f'+refs/heads/{main_branch}:refs/remotes/origin/{main_branch}',
+            cwd=context.cwd,
+            timeout=FETCH_TIMEOUT,
+        )
+    except subprocess.TimeoutExpired:
+        print(f'\n *** ERROR: git fetch of {main_branch!r} timed out after {FETCH_TIMEOUT}s!')
+        sys.exit(8)
+
+
+def check_git_up_to_date(context):
+    main_branch = get_main_branch(context)
+
+    # Count the commits, instead of listing them: The output has always the same size.
     call_info, output = verbose_check_output(
-        'git', 'log', f'HEAD..origin/{main_branch}', '--oneline'
+        'git', 'rev-list', '--left-right', '--count', f'HEAD...origin/{main_branch}',
+        cwd=context.cwd,
     )
     print(f'\t{call_info}')
-    if output == '':
-        print('OK')
+    ahead, behind = (int(count) for count in output.split())
+    if not behind:
+        print(f'OK ({ahead} commits ahead of origin/{main_branch})')
     else:
         print('\n *** ERROR: git repro is not up-to-date:')
+        print(f'origin/{main_branch} has {behind} new commit(s), e.g.:')
+        call_info, output = verbose_check_output(
+            'git', 'log', '--oneline', '-n', '10', f'HEAD..origin/{main_branch}', cwd=context.cwd
+        )
         print(output)
         sys.exit(2)
-    verbose_check_call('git', 'push', 'origin', current_branch)
 
-    # ------------------------------------------------------------------------
 
+def git_push(context):
+    verbose_check_call('git', 'push', 'origin', context.current_branch, cwd=context.cwd)
+
+
+def get_git_commit(cwd=None):
+    call_info, output = verbose_check_output('git', 'rev-parse', 'HEAD', cwd=cwd)
+    return output.strip()
+
+
+def cleanup_builds(context):
     print('\nCleanup old builds:')
 
     def rmtree(path):
@@ -137,61 +267,646 @@ def poetry_publish(package_root, version, log_filename='publish.log', creole_rea
         if os.path.isdir(path):
             print('\tremove tree:', path)
             shutil.rmtree(path)
-    rmtree('./dist')
-    rmtree('./build')
 
-    # ------------------------------------------------------------------------
+    rmtree(context.dist_path)
+    if not context.build_in_worktree:  # The worktree is always clean
+        rmtree(Path(context.base_path, 'dist'))
+        rmtree(Path(context.base_path, 'build'))
+
+
+def get_release_build_key(context):
+    """
+    The build cache key of the sources, the version and all settings that change the build.
+    """
+    options = {
+        'build_in_process': context.build_in_process,
+        'compression_level': context.compression_level,
+        'build_in_worktree': context.build_in_worktree,
+        'backend': get_backend_version(build_in_process=context.build_in_process),
+    }
+    return get_build_key(context.version, cwd=context.cwd, options=options)
+
+
+def poetry_build(context):
+    build_key = get_release_build_key(context)
+    context.artifacts = get_cached_build(context.output_path, build_key)
+    if context.artifacts is not None:
+        print(
+            '\nSources and version are unchanged:'
+            f' Use the existing build in {context.dist_dir!r}'
+        )
+        return
+
+    cleanup_builds(context)
+
+    if context.build_in_worktree:
+        build_in_worktree(context)
+    else:
+        run_build(context, build_path=context.base_path)
+        if context.output_dir is not None:
+            collect_artifacts(Path(context.base_path, 'dist'), context.dist_path)
+
+    context.artifacts = hash_artifacts(context.dist_path)
+    store_build(context.output_path, build_key, artifacts=context.artifacts)
+
+
+def run_build(context, build_path):
+    """
+    Build sdist and wheel of the project in `build_path` into `build_path`/dist
+    """
+    if context.build_in_process:
+        build_in_process(context, build_path)
+        return
 
     print('\nbuild but do not upload...')
 
-    with open(log_filename, 'a') as log:
-        log.write('\n')
-        log.write('-' * 100)
-        log.write('\n')
-        call_info, output = verbose_check_output('poetry', 'build', log=log)
-        print(f'\t{call_info}')
-        log.write(call_info)
-        log.write(output)
+    with CommandLog() as log:
+        verbose_stream_call('poetry', 'build', log=log, cwd=build_path)
 
-    print(f'Build log file is here: {log_filename!r}')
+    print(f'Build log file is here: {context.log_filename!r}')
 
-    # ------------------------------------------------------------------------
 
-    run_twine_check()
+def build_in_worktree(context):
+    print('\nBuild in a clean git worktree:')
+    prefix = get_git_prefix(cwd=context.cwd)  # e.g.: the package of a monorepo
+    with git_worktree(
+        cwd=context.cwd, commit=context.commit or 'HEAD', scratch_dir=context.scratch_dir
+    ) as worktree_path:
+        build_path = Path(worktree_path, prefix)
+        run_build(context, build_path=build_path)
+        paths = collect_artifacts(Path(build_path, 'dist'), context.dist_path)
+
+    print('\nArtifacts:')
+    for path in paths:
+        print(f'\t{path}')
+
+
+def build_in_process(context, build_path):
+    level = context.compression_level
+    print(
+        '\nBuild sdist and wheel in parallel with poetry-core'
+        f' (compression level: {"default" if level is None else level}):'
+    )
+    start_time = time.monotonic()
+    paths = build_artifacts(build_path, Path(build_path, 'dist'), compression_level=level)
+    for path in paths:
+        print(f'\t{path.name}')
+    print(f'OK ({time.monotonic() - start_time:.1f}s)')
+
+
+def verify_build(context):
+    print('\nCheck the build of the interrupted release:')
+    build_key = get_release_build_key(context)
+    context.artifacts = get_cached_build(context.output_path, build_key)
+    if context.artifacts is not None:
+        print('OK')
+    else:
+        print('\n *** ERROR: Sources or artifacts in "dist" changed since the interrupted release!')
+        sys.exit(7)
+
+
+def write_release_manifest(context):
+    print('\nRelease manifest:')
+    for artifact in context.artifacts:
+        print(f'\t{artifact.name} {artifact.size / 1024:.1f} KiB sha256:{artifact.sha256}')
+    manifest_path = write_manifest(
+        context.output_path,
+        context.artifacts,
+        name=context.name,
+        version=context.version,
+        commit=context.commit,
+    )
+    print(f'Release manifest is here: {str(manifest_path)!r}')
+
+
+def validate_archives(context):
+    if not context.validate_archives:
+        return
+
+    print('\nValidate the archives:')
+    results = validate_artifacts(context.dist_path, version=context.version)
+    for result in results:
+        print_validation_result(result)
+    if not results or not all(result.ok for result in results):
+        print('\n *** ERROR: Broken archives!')
+        sys.exit(11)
+    if any(result.warnings for result in results):
+        confirm('Archives contain unexpected files!')
+    else:
+        print('OK')
 
-    # ------------------------------------------------------------------------
 
-    git_tag = f'v{version}'
+def smoke_test(context):
+    if not context.smoke_test:
+        return
+
+    print('\nSmoke test: Install and import the wheel in a new virtualenv:')
+    wheel_names = [
+        artifact.name for artifact in context.artifacts if artifact.name.endswith('.whl')
+    ]
+    if not wheel_names:
+        print('\n *** ERROR: No wheel found!')
+        sys.exit(10)
+
+    for wheel_name in wheel_names:
+        try:
+            result = smoke_test_wheel(
+                Path(context.dist_path, wheel_name), base_path=context.base_path
+            )
+        except subprocess.CalledProcessError:
+            print(f'\n *** ERROR: Smoke test of {wheel_name} failed!')
+            sys.exit(10)
+        print(
+            f'\t{wheel_name}: import {", ".join(result.packages)} OK'
+            f' (install: {result.install_duration:.1f}s, import: {result.import_duration:.2f}s)'
+        )
+
+
+def twine_check(context):
+    run_twine_check(
+        cwd=context.cwd,
+        in_process=context.twine_in_process,
+        fail_fast=context.twine_fail_fast,
+        dist_dir=context.dist_dir,
+    )
+
+
+def check_git_tag(context):
+    git_tag = context.git_tag
 
     print('\ncheck git tag')
-    call_info, output = verbose_check_output('git', 'tag')
-    if git_tag in output.splitlines():
+    # Look up only this one tag, instead of listing all tags:
+    call_info, output = verbose_check_output(
+        'git', 'for-each-ref', '--format=%(refname)', f'refs/tags/{git_tag}', cwd=context.cwd
+    )
+    if f'refs/tags/{git_tag}' in output.splitlines():
         print(f'\n *** ERROR: git tag {git_tag!r} already exists!')
-        print(output)
         sys.exit(3)
     else:
         print('OK')
 
-    # ------------------------------------------------------------------------
+
+def upload_native(context):
+    print(f'\nUpload to {context.repository_url}:')
+    results = upload_artifacts(
+        context.dist_path,
+        repository_url=context.repository_url,
+        artifacts=context.artifacts,
+        timeout=context.upload_timeout,
+    )
+    print_upload_report(results)
+    if not results or not all(result.ok for result in results):
+        print('\n *** ERROR: Upload failed!')
+        sys.exit(6)
+
+
+def get_publish_args():
+    """
+    Arguments for "poetry publish" that are passed through, e.g.: "--repository=testpypi"
+    """
+    return [arg for arg in sys.argv[1:] if arg != 'publish']
+
+
+def get_repository_publish_args():
+    """
+    get_publish_args() without "--repository"/"-r": The repository of every upload
+    to `context.repositories` is set by upload_to_repository()
+    """
+    args = []
+    publish_args = iter(get_publish_args())
+    for arg in publish_args:
+        if arg in ('--repository', '-r'):
+            next(publish_args, None)  # skip the value, too
+        elif not arg.startswith(('--repository=', '-r')):
+            args.append(arg)
+    return args
+
+
+def get_dist_dir_args(context):
+    """
+    Arguments for "poetry publish" to upload the artifacts of `context.output_dir`
+    """
+    if context.output_dir is None:
+        return []
+    return [f'--dist-dir={context.dist_dir}']
+
+
+def upload_to_repository(context, name, url, log_lock):
+    """
+    Upload all artifacts to one of `context.repositories` and return a RepositoryResult.
+    Wait for a upload slot first, if the repository has a UploadThrottle.
+
+    The done uploads are recorded in the journal: If the upload to a other repository
+    failed, the resumed release uploads only to the failed ones.
+    """
+    result = RepositoryResult(name=name)
+    journal_name = f'upload:{name}'
+    if context.journal is not None and context.journal.is_done(journal_name):
+        with log_lock:
+            print(f'\nUpload to {name!r} is already done, skip.')
+        result.ok = True
+        return result
+
+    # Never send the TWINE_* credentials of one index to a other one:
+    username, password = get_credentials(name)
+    if not (username and password):
+        token_name, username_name, password_name = get_credential_variables(name)
+        result.error = (
+            f'No credentials for {name!r}: Set {token_name}'
+            f' or {username_name} and {password_name}'
+        )
+        return result
+
+    throttle = (context.upload_throttles or {}).get(name)
+    start_time = time.monotonic()
+    try:
+        with throttle.slot() if throttle else nullcontext():
+            if context.native_upload:
+                results = upload_artifacts(
+                    context.dist_path,
+                    repository_url=url,
+                    username=username,
+                    password=password,
+                    artifacts=context.artifacts,
+                    timeout=context.upload_timeout,
+                )
+                with log_lock:
+                    print(f'\nUpload to {name} ({url}):')
+                    print_upload_report(results)
+                errors = [
+                    f'{upload_result.filename}: {upload_result.error}'
+                    for upload_result in results
+                    if not upload_result.ok
+                ]
+                if not results:
+                    errors.append('No artifacts')
+                result.error = ', '.join(errors) or None
+            else:
+                # The output is captured: A question would never be shown
+                args = [
+                    'poetry',
+                    'publish',
+                    '--repository',
+                    name,
+                    '--no-interaction',
+                    *get_dist_dir_args(context),
+                    *get_repository_publish_args(),
+                ]
+                if '-vvv' not in args:
+                    args.append('-vvv')
+                try:
+                    call_info, output = verbose_check_output(*args, cwd=context.cwd)
+                except subprocess.CalledProcessError:
+                    print(f'\nPoetry publish to {name} error -> fallback and use twine')
+                    call_info, output = verbose_check_output(
+                        'twine',
+                        'upload',
+                        '--non-interactive',
+                        '--repository-url',
+                        url,
+                        f'{context.dist_dir}/*.*',
+                        cwd=context.cwd,
+                        env={'TWINE_USERNAME': username, 'TWINE_PASSWORD': password},
+                    )
+                with CommandLog() as log:
+                    log.write(f'{call_info}\n{output}')
+            result.ok = result.error is None
+    except Exception as err:
+        result.error = repr(err)
+    result.duration = time.monotonic() - start_time
+    if result.ok and context.journal is not None:
+        context.journal.mark_done(journal_name)
+    return result
+
+
+def upload_to_repositories(context):
+    repositories = context.repositories
+    print(f'\nUpload to {len(repositories)} repositories: {", ".join(repositories)}')
+    log_lock = threading.Lock()
+    func = bind_current_step(upload_to_repository)
+    with ThreadPoolExecutor(max_workers=len(repositories)) as executor:
+        futures = [
+            executor.submit(func, context, name, url, log_lock)
+            for name, url in repositories.items()
+        ]
+        results = [future.result() for future in futures]
+
+    print('\nUpload report:')
+    print_repository_report(results)
+    if not all(result.ok for result in results):
+        print('\n *** ERROR: Upload failed!')
+        sys.exit(6)
+
+
+def upload(context):
+    if context.repositories:
+        return upload_to_repositories(context)
+
+    if context.native_upload:
+        return upload_native(context)
 
     print('\nUpload to PyPi via poetry:')
-    extra_args = [arg for arg in sys.argv[1:] if arg != 'publish']
-    args = ['poetry', 'publish'] + extra_args
+    extra_args = get_publish_args()
+    args = ['poetry', 'publish', *get_dist_dir_args(context)] + extra_args
     if '-vvv' not in sys.argv:
         args.append('-vvv')
 
+    with CommandLog() as log:
+        try:
+            verbose_stream_call(*args, log=log, cwd=context.cwd)
+        except subprocess.CalledProcessError:
+            print('\nPoetry publish error -> fallback and use twine')
+            verbose_stream_call(
+                'twine', 'upload', f'{context.dist_dir}/*.*', *extra_args, log=log, cwd=context.cwd
+            )
+
+
+def git_tag_version(context):
+    print('\ngit tag version')
+    verbose_check_call(
+        'git',
+        'tag',
+        '-a',
+        context.git_tag,
+        '-m',
+        f"publishing version {context.version}",
+        cwd=context.cwd,
+    )
+
+
+def verify_git_tag(context):
+    git_tag = context.git_tag
+
+    print(f'\nCheck git tag {git_tag!r} of the interrupted release:')
     try:
-        verbose_check_call(*args)
-    except subprocess.CalledProcessError:
-        print('\nPoetry publish error -> fallback and use twine')
-        verbose_check_call('poetry', 'run', 'twine', 'upload', 'dist/*.*', *extra_args)
+        call_info, output = verbose_check_output(
+            'git', 'rev-parse', '--verify', '--quiet', f'refs/tags/{git_tag}^{{commit}}',
+            cwd=context.cwd,
+        )
+    except subprocess.CalledProcessError:  # the tag doesn't exist
+        output = ''
+    if output.strip() == context.commit:
+        print('OK')
+    else:
+        print(f'\n *** ERROR: git tag {git_tag!r} does not point to {context.commit}')
+        sys.exit(7)
+
+
+def git_push_tags(context):
+    print('\ngit push tag to server')
+    verbose_check_call('git', 'push', '--tags', cwd=context.cwd)
+
+
+# All steps of a release. The order is used, if the steps are not run in parallel.
+# If a interrupted release is resumed, the `verify` function of done steps is called.
+RELEASE_STEPS = (
+    Step('git_branch', check_git_branch, verify=check_git_branch),
+    # Nothing is changed, before the user confirmed a other branch:
+    Step('poetry_version', set_poetry_version, requires=('git_branch',)),
+    Step('git_clean', check_git_clean, requires=('poetry_version',), verify=check_git_clean),
+    Step('poetry_check', run_poetry_check, requires=('poetry_version',)),
+    Step('git_fetch', git_fetch, requires=('git_branch',)),
+    Step('git_up_to_date', check_git_up_to_date, requires=('git_branch', 'git_fetch')),
+    Step(
+        'git_push',
+        git_push,
+        requires=('git_branch', 'git_clean', 'poetry_check', 'git_up_to_date'),
+    ),
+    Step('build', poetry_build, requires=('git_clean',), verify=verify_build),
+    Step('manifest', write_release_manifest, requires=('build',), verify=write_release_manifest),
+    Step('twine_check', twine_check, requires=('build',)),
+    Step('validate_archives', validate_archives, requires=('build',)),
+    Step('smoke_test', smoke_test, requires=('build',)),
+    Step('git_tag_check', check_git_tag, requires=('git_branch',)),
+    Step(
+        'upload',
+        upload,
+        requires=(
+            'git_push',
+            'manifest',
+            'twine_check',
+            'validate_archives',
+            'smoke_test',
+            'git_tag_check',
+        ),
+    ),
+    Step('git_tag', git_tag_version, requires=('upload',), verify=verify_git_tag),
+    Step('git_push_tags', git_push_tags, requires=('git_tag',)),
+)
+
+
+def report_timings(context, timings, profile=False):
+    print_timings(timings)
+
+    # In the cache directory next to the log file: It never makes the git repository "unclean"
+    log_path = Path(context.log_filename)
+    cache_dir = get_cache_dir(log_path.parent)
+    report_path = Path(cache_dir, log_path.with_suffix('.json').name)
+    write_report(timings, report_path, name=context.name, version=context.version)
+    print(f'Timing report is here: {str(report_path)!r}')
+
+    if profile:
+        profile_path = Path(cache_dir, log_path.with_suffix('.prof').name)
+        write_profile(timings, profile_path)
+        print(f'Profile statistics are here: {str(profile_path)!r}')
+
+
+def poetry_publish(
+    package_root,
+    version,
+    log_filename='publish.log',
+    creole_readme=False,
+    max_workers=None,
+    twine_in_process=False,
+    twine_fail_fast=False,
+    native_upload=False,
+    build_in_process=False,
+    compression_level=None,
+    build_in_worktree=False,
+    scratch_dir=None,
+    output_dir=None,
+    smoke_test=False,
+    validate_archives=False,
+    repository_url=PYPI_UPLOAD_URL,
+    upload_timeout=UPLOAD_TIMEOUT,
+    profile=False,
+    resume=True,
+    step_timeouts=None,
+    repositories=None,
+    upload_throttles=None,
+    log_max_bytes=LOG_MAX_BYTES,
+    log_max_age=LOG_MAX_AGE,
+    log_backup_count=LOG_BACKUP_COUNT,
+):
+    """
+    Helper to build and upload to PyPi, with prechecks.
+
+    Optional arguments are passed to `poetry publish` e.g.:
+
+        $ poetry config repositories.testpypi https://test.pypi.org/simple
+        $ poetry run publish --repository=testpypi
+
+    Build and upload to PyPi, if...
+        ... __version__ doesn't contains 'dev'
+        ... we are on git "master" branch
+        ... git repository is 'clean' (no changed files)
+
+    Upload with 'poetry', git tag the current version and git push --tag
+
+    Independent checks run in parallel. Use max_workers=1 to run all steps one after another.
+
+    With twine_in_process=True the artifacts are checked by the twine API in this process,
+    instead of calling "twine check" (that is still called, if the twine version has
+    not the needed API). With twine_fail_fast=True the check stops at the
+    first failed artifact and the release ends, without the question to publish anyhow.
+
+    With native_upload=True all artifacts are uploaded concurrently to `repository_url`
+    (instead of calling "poetry publish"). The credentials are read from
+    TWINE_USERNAME and TWINE_PASSWORD environment variables. A request is retried, if the
+    index doesn't answer within the (connect, read) `upload_timeout` in seconds.
+
+    With build_in_process=True sdist and wheel are built concurrently by the poetry-core
+    builders in this process (poetry-core must be installed), instead of calling
+    "poetry build". Set a zlib compression_level (0-9) to trade the archive size
+    for the build speed, e.g.: compression_level=1 for big packages.
+
+    With build_in_worktree=True the committed sources are checked out in a new git worktree
+    in `scratch_dir` (default: tmpfs, if it has enough free space, otherwise the temp
+    directory) and built there. The artifacts are hard-linked or copied into "dist", the
+    checkout is not touched otherwise. So many releases can build from the same clone at once.
+
+    With a `output_dir` the artifacts are collected into its "dist" and the build cache,
+    the journal and the release manifest are stored there, instead of in the checkout.
+    "twine check", the validation, the smoke test and the upload read the artifacts
+    from there. So the releases of e.g.: different versions from one clone don't collide.
+
+    With validate_archives=True the wheel and the sdist are read as streams, without
+    extracting them: The files of the wheel are compared with the hashes in its RECORD
+    and the version in the metadata of both must be `version`. Large files
+    and files from a "build" directory must be confirmed.
+
+    With smoke_test=True the wheel is installed (with its dependencies) into a new
+    virtualenv and its top-level packages are imported, before anything is uploaded.
+    The virtualenvs are hard-linked clones of a cached template: Only the first
+    smoke test must create a virtualenv with pip.
+
+    To upload the same artifacts to more than one repository, pass the names and
+    upload URLs, e.g.:
+
+        repositories={
+            'testpypi': 'https://test.pypi.org/legacy/',
+            'pypi': 'https://upload.pypi.org/legacy/',
+        }
+
+    The uploads to all repositories run concurrently, with "poetry publish --repository"
+    (poetry must know the repositories) or with native_upload=True. The credentials of
+    every repository must be set in e.g.: POETRY_PYPI_TOKEN_TESTPYPI, they are never read
+    from TWINE_USERNAME/TWINE_PASSWORD (also not by the "twine upload" fallback).
+    The git tag is only created, if all uploads succeed.
+
+    Pass a UploadThrottle per repository name in `upload_throttles` to wait for a free
+    upload slot, e.g.: to stay under the rate limits of a index (see poetry_publish.batch).
+
+    All steps are timed: A summary is printed and a JSON report is written into the cache
+    directory next to the log file, e.g.: ".poetry_publish_cache/publish.json".
+    With profile=True the Python code of all steps is profiled, too, and the merged
+    cProfile statistics are stored in e.g.: ".poetry_publish_cache/publish.prof"
+
+    The size and the sha256, blake2b and md5 digests of all artifacts are stored
+    in a release manifest: ".poetry_publish_cache/manifest.json"
+
+    Every finished step is recorded in a journal, for the version and the current git commit.
+    If a release is interrupted, e.g.: after the upload, the next call resumes at the first
+    unfinished step. Done steps are skipped or only verified, e.g.: the build artifacts.
+    The upload to every one of `repositories` is recorded, too: Only the failed uploads
+    are done again. Use resume=False to start from the beginning.
+
+    The start and the end of every step and the output of the called programs are written
+    as JSON lines into `log_filename` by a background thread. The log file is rotated, if
+    it's bigger than `log_max_bytes` or older than `log_max_age` seconds. Only
+    `log_backup_count` gzip compressed generations are kept in the cache directory,
+    e.g.: ".poetry_publish_cache/logs/publish.log.1.gz"
+
+    Every step has a deadline of DEFAULT_STEP_TIMEOUT seconds. If it's exceeded,
+    the running command and all its child processes are killed. Set other deadlines
+    for single steps with e.g.: step_timeouts={'build': 3600, 'upload': None}
+
+    add this to poetry pyproject.toml, e.g.:
+
+        [tool.poetry.scripts]
+        publish = 'foo.bar:publish'
+
+    based on:
+    https://github.com/jedie/python-code-snippets/blob/master/CodeSnippets/setup_publish.py
+    """
+    check_programs(*REQUIRED_PROGRAMS)
+    reset_abort()
+
+    if creole_readme:
+        update_rst_readme(package_root=package_root, filename='README.creole')
 
     # ------------------------------------------------------------------------
 
-    print('\ngit tag version')
-    verbose_check_call('git', 'tag', '-a', git_tag, '-m', f"publishing version {version}")
+    for key in ('dev', 'rc'):
+        if key in version:
+            confirm(f'WARNING: Version contains {key!r}: v{version}\n')
+            break
 
     # ------------------------------------------------------------------------
 
-    print('\ngit push tag to server')
-    verbose_check_call('git', 'push', '--tags')
+    context = ReleaseContext(
+        package_root=Path(package_root),
+        version=version,
+        log_filename=log_filename,
+        twine_in_process=twine_in_process,
+        twine_fail_fast=twine_fail_fast,
+        native_upload=native_upload,
+        build_in_process=build_in_process,
+        compression_level=compression_level,
+        build_in_worktree=build_in_worktree,
+        scratch_dir=scratch_dir,
+        output_dir=output_dir,
+        smoke_test=smoke_test,
+        validate_archives=validate_archives,
+        repository_url=repository_url,
+        upload_timeout=upload_timeout,
+        repositories=repositories,
+        upload_throttles=upload_throttles,
+        commit=get_git_commit(),
+    )
+    journal = ReleaseJournal(context.output_path, version=version, commit=context.commit)
+    context.journal = journal
+    if resume and journal.load():
+        print(f'\nResume the interrupted release of v{version}, done steps:')
+        print(f'\t{", ".join(journal.done)}')
+
+    timings = []
+    steps = set_timeouts(RELEASE_STEPS, step_timeouts, default=DEFAULT_STEP_TIMEOUT)
+    with publish_log(
+        log_filename,
+        max_bytes=log_max_bytes,
+        max_age=log_max_age,
+        backup_count=log_backup_count,
+    ):
+        log_event('release_start', name=context.name, version=version, commit=context.commit)
+        try:
+            run_steps(
+                steps,
+                context,
+                max_workers=max_workers,
+                timings=timings,
+                profile=profile,
+                journal=journal,
+            )
+            journal.remove()
+        except StepTimeoutError as err:
+            print(f'\n *** ERROR: {err}')
+            log_event('release_end', str(err), ok=False)
+            sys.exit(9)
+        except BaseException as err:
+            log_event('release_end', repr(err), ok=False)
+            raise
+        else:
+            log_event('release_end', ok=True)
+        finally:
+            report_timings(context, timings, profile=profile)
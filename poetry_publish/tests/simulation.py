@@ -0,0 +1,271 @@
+"""
+    Simulated git/poetry/twine toolchain
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Replaces the child processes of poetry_publish.utils.subprocess_utils, so the whole
+    publish pipeline can run in tests and benchmarks without calling any real program.
+
+    And the helpers of the tests, that need a user, a project, a artifact or a git repository.
+"""
+
+import io
+import subprocess
+import threading
+import time
+import zipfile
+from contextlib import ExitStack
+from pathlib import Path
+from unittest.mock import patch
+
+
+def fake_replace_prog(args):
+    return [f'/fake/bin/{args[0]}', *args[1:]]
+
+
+# The most a read from a pipe returns on Linux: the default pipe capacity
+PIPE_SIZE = 64 * 1024
+
+
+class SimulatedOutput:
+    """
+    stdout of a simulated process: the predefined output plus `extra_size` bytes of
+    generated lines. The generated lines are never held in memory as a whole.
+    """
+
+    line = f'{"x" * 79}\n'
+
+    def __init__(self, output, extra_size=0, line=None):
+        self.output = output
+        self.extra_size = extra_size
+        if line is not None:
+            self.line = line  # e.g.: progress output with only "\r"
+        self._lines = None
+        self._buffer = b''
+
+    def __iter__(self):
+        yield from io.StringIO(self.output)
+        count, rest = divmod(self.extra_size, len(self.line))
+        for _ in range(count):
+            yield self.line
+        if rest:
+            yield self.line[-rest:]
+
+    def read(self):
+        return ''.join(self)
+
+    def read1(self, size=-1):
+        """
+        Binary read of up to `size` bytes, like from a pipe: The chunks split the lines.
+        """
+        if self._lines is None:
+            self._lines = iter(self)
+        size = PIPE_SIZE if size < 0 else min(size, PIPE_SIZE)
+        parts = [self._buffer]
+        length = len(self._buffer)
+        while length < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            parts.append(line.encode())
+            length += len(parts[-1])
+        data = b''.join(parts)
+        chunk, self._buffer = data[:size], data[size:]
+        return chunk
+
+    def close(self):
+        pass
+
+
+class SimulatedProcess:
+    rusage = None
+
+    def __init__(self, args, stdout, returncode=0):
+        self.args = args
+        self.stdout = stdout
+        self._returncode = returncode
+        self.returncode = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.wait()
+
+    def wait(self, timeout=None):
+        if self.returncode is None:
+            self.returncode = self._returncode
+        return self.returncode
+
+    def terminate(self):
+        self.returncode = -15
+
+    def kill_tree(self):
+        self.returncode = -9
+
+
+class SimulatedToolchain:
+    """
+    Use as context manager, e.g.:
+
+        toolchain = SimulatedToolchain(outputs={'/fake/bin/git branch --no-color': '* main'})
+        with toolchain:
+            ...
+        assert toolchain.calls == [...]  # all calls without a predefined output
+        assert toolchain.outputs == {}  # all predefined outputs are used
+
+    outputs:
+        command -> output. Use a list of outputs, if the command is called more than once.
+    latency:
+        seconds every call takes, or a dict of program name -> seconds, e.g.: {'git': 0.1}
+    output_sizes:
+        command -> number of bytes that are added to the output
+    output_lines:
+        command -> the line that is repeated for the added output, e.g.: '\\rBuilding...'
+    returncodes:
+        command -> exit status, e.g.: {'/fake/bin/git push --tags': 1} to simulate a error
+    """
+
+    def __init__(
+        self, outputs=None, latency=0.0, output_sizes=None, output_lines=None, returncodes=None
+    ):
+        self.outputs = outputs or {}
+        self.latency = latency
+        self.output_sizes = output_sizes or {}
+        self.output_lines = output_lines or {}
+        self.returncodes = returncodes or {}
+        self.calls = []
+        self.all_calls = []
+        self.envs = {}  # command -> environment of the last call
+        self._lock = threading.Lock()
+        self._exit_stack = None
+
+    def get_latency(self, args):
+        if isinstance(self.latency, dict):
+            return self.latency.get(Path(args[0]).name, 0.0)
+        return self.latency
+
+    def pop_output(self, cmd):
+        output = self.outputs[cmd]
+        if isinstance(output, list):  # The same command is called more than once
+            output = output.pop(0)
+            if self.outputs[cmd]:
+                return output
+        del self.outputs[cmd]
+        return output
+
+    def __call__(self, args, **kwargs):
+        cmd = ' '.join(args)
+        with self._lock:
+            self.all_calls.append(cmd)
+            self.envs[cmd] = kwargs.get('env')
+            if cmd in self.outputs:
+                output = self.pop_output(cmd)
+            else:
+                self.calls.append(cmd)
+                output = ''
+
+        latency = self.get_latency(args)
+        if latency:
+            time.sleep(latency)
+
+        return SimulatedProcess(
+            args,
+            SimulatedOutput(output, self.output_sizes.get(cmd, 0), self.output_lines.get(cmd)),
+            returncode=self.returncodes.get(cmd, 0),
+        )
+
+    def __enter__(self):
+        self._exit_stack = ExitStack()
+        self._exit_stack.enter_context(
+            patch('poetry_publish.utils.subprocess_utils.replace_prog', fake_replace_prog)
+        )
+        self._exit_stack.enter_context(
+            patch('poetry_publish.utils.subprocess_utils.ChildProcess', self)
+        )
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._exit_stack.close()
+
+
+class MockConfirm:
+    """
+    Replaces input() of confirm(): Answers with the `behaviour` keys and records the questions.
+    """
+
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+        self.call_count = 0
+        self.calls = []
+
+    def __call__(self, txt):
+        print(txt, end=' ')
+        self.call_count += 1
+
+        txt = txt.strip()
+        txt = txt.rsplit('\n', 1)[0]
+        txt = txt.strip()
+        self.calls.append(txt)
+
+        key = self.behaviour.pop(0)
+        print(key)
+        return key
+
+
+def create_project(path):
+    """
+    A poetry project "foo" in `path`, with a big package to build
+    """
+    Path(path, 'pyproject.toml').write_text(
+        '[tool.poetry]\n'
+        'name = "foo"\n'
+        'version = "1.2.3"\n'
+        'description = "Test package"\n'
+        'authors = ["Foo Bar <foo@example.com>"]\n'
+        '\n'
+        '[tool.poetry.dependencies]\n'
+        'python = "^3.7"\n'
+        '\n'
+        '[build-system]\n'
+        'requires = ["poetry-core"]\n'
+        'build-backend = "poetry.core.masonry.api"\n'
+    )
+    package_path = Path(path, 'foo')
+    package_path.mkdir()
+    Path(package_path, '__init__.py').write_text('"""Foo"""\n' * 10000)
+
+
+def make_wheel(dist_path, name, description):
+    """
+    A minimal wheel with the reStructuredText `description`, for "twine check"
+    """
+    wheel_path = Path(dist_path, f'{name}-1.0-py3-none-any.whl')
+    with zipfile.ZipFile(wheel_path, 'w') as wheel:
+        wheel.writestr(
+            f'{name}-1.0.dist-info/METADATA',
+            (
+                'Metadata-Version: 2.1\n'
+                f'Name: {name}\n'
+                'Version: 1.0\n'
+                'Description-Content-Type: text/x-rst\n'
+                '\n'
+                f'{description}'
+            ),
+        )
+        wheel.writestr(f'{name}-1.0.dist-info/WHEEL', 'Wheel-Version: 1.0\n')
+    return wheel_path
+
+
+def git_commit_all(cwd):
+    """
+    A new git repository in `cwd`, with all files committed
+    """
+    subprocess.check_call(['git', 'init', '--quiet'], cwd=cwd)
+    subprocess.check_call(['git', 'add', '.'], cwd=cwd)
+    subprocess.check_call(
+        [
+            'git', '-c', 'user.name=Foo Bar', '-c', 'user.email=foo@example.com',
+            'commit', '--quiet', '-m', 'init',
+        ],
+        cwd=cwd,
+    )
@@ -4,11 +4,14 @@
     :license: GNU GPL v3 or above, see LICENSE for more details.
 """
 
+import sys
 from pathlib import Path
+from unittest.mock import patch
 
 from creole.setup_utils import update_rst_readme
 
 import poetry_publish
+import poetry_publish.utils
 
 
 PACKAGE_ROOT = Path(poetry_publish.__file__).parent.parent
@@ -23,3 +26,14 @@ def test_update_rst_readme(capsys):
     assert captured.err == ''
     assert isinstance(rest_readme_path, Path)
     assert rest_readme_path.name == 'README.rst'
+
+
+def test_update_rst_readme_without_creole(capsys, tmp_path):
+    Path(tmp_path, 'README.creole').write_text('= Title =')
+    with patch.dict(sys.modules, {'creole.setup_utils': None}):  # not installed
+        rest_readme_path = poetry_publish.utils.update_rst_readme(
+            package_root=tmp_path, filename='README.creole'
+        )
+    assert rest_readme_path is None
+    captured = capsys.readouterr()
+    assert captured.out == 'WARNING: python-creole package is not installed.\n'
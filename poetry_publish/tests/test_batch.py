@@ -0,0 +1,135 @@
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+from poetry_publish.batch import load_manifest, poetry_publish_batch
+
+
+def fake_release(package_root, version, repositories, upload_throttles, **options):
+    """
+    Runs in the worker processes of the batch, instead of poetry_publish()
+    """
+    assert Path.cwd() == package_root
+    with Path(package_root, 'calls.txt').open('a') as f:
+        f.write(f'{version} {sorted(repositories.items())} {options}\n')
+
+    start_time = time.monotonic()
+    time.sleep(0.1)  # build
+    if version == '0.0.0':
+        raise SystemExit(6)
+
+    (repository,) = repositories
+    with upload_throttles[repository].slot() as upload_time:
+        pass
+    Path(package_root, 'times.json').write_text(
+        json.dumps([start_time, upload_time, time.monotonic()])
+    )
+
+
+def write_manifest(tmp_path, plugin_version):
+    manifest = {
+        'repositories': {
+            'pypi': {'url': 'https://upload.pypi.org/legacy/', 'interval': 0.3},
+            'testpypi': {'url': 'https://test.pypi.org/legacy/'},
+        },
+        'options': {'native_upload': True},
+        'releases': [
+            {'path': 'plugin', 'version': plugin_version, 'depends_on': ['framework']},
+            {'path': 'framework', 'version': '2.0.0'},
+            {'path': 'other', 'version': '1.0.0'},
+            {'path': 'plugin2', 'version': '1.0.0', 'depends_on': ['plugin']},
+            {'path': 'test', 'version': '1.0.0', 'repository': 'testpypi'},
+        ],
+    }
+    manifest_path = Path(tmp_path, 'batch.json')
+    manifest_path.write_text(json.dumps(manifest))
+    return manifest_path
+
+
+def read_times(tmp_path, name):
+    return json.loads(Path(tmp_path, name, 'times.json').read_text())
+
+
+def test_batch(tmp_path, capsys):
+    names = ('framework', 'plugin', 'plugin2', 'other', 'test')
+    for name in names:
+        Path(tmp_path, name).mkdir()
+
+    manifest_path = write_manifest(tmp_path, plugin_version='0.0.0')  # plugin fails
+    with pytest.raises(SystemExit) as exit:
+        poetry_publish_batch(manifest_path, max_workers=3, release=fake_release)
+    assert exit.value.code == 5
+
+    report = json.loads(Path(tmp_path, 'batch.report.json').read_text())
+    assert [
+        (record['name'], record['status'], record['exit_code'], record['error'])
+        for record in report['releases']
+    ] == [
+        ('plugin', 'failed', 6, 'SystemExit(6)'),
+        ('framework', 'released', 0, None),
+        ('other', 'released', 0, None),
+        ('plugin2', 'skipped', None, 'Not released: plugin'),
+        ('test', 'released', 0, None),
+    ]
+    assert Path(tmp_path, 'framework', 'calls.txt').read_text() == (
+        "2.0.0 [('pypi', 'https://upload.pypi.org/legacy/')] {'native_upload': True}\n"
+    )
+    assert not Path(tmp_path, 'plugin2', 'calls.txt').exists()
+
+    # The uploads of independent releases to "pypi" are throttled:
+    framework_upload = read_times(tmp_path, 'framework')[1]
+    other_upload = read_times(tmp_path, 'other')[1]
+    assert abs(framework_upload - other_upload) >= 0.3
+
+    out, err = capsys.readouterr()
+    assert 'Batch report:\n' in out
+    assert '\tplugin    v0.0.0      FAILED   ' in out
+    assert '\tplugin2   v1.0.0      SKIPPED  ' in out
+    assert 'Fix the errors and start the batch again' in out
+
+    # Resume with a fixed plugin version: The released versions are skipped
+    manifest_path = write_manifest(tmp_path, plugin_version='1.0.0')
+    results = poetry_publish_batch(manifest_path, max_workers=3, release=fake_release)
+    assert {name: result.status for name, result in results.items()} == {
+        name: 'released' for name in names
+    }
+    for name in ('framework', 'other', 'test', 'plugin2'):
+        assert len(Path(tmp_path, name, 'calls.txt').read_text().splitlines()) == 1
+    assert len(Path(tmp_path, 'plugin', 'calls.txt').read_text().splitlines()) == 2
+
+    # The dependency order:
+    assert read_times(tmp_path, 'plugin2')[0] > read_times(tmp_path, 'plugin')[2]
+
+    out, err = capsys.readouterr()
+    assert 'Already released, skip: framework, other, test\n' in out
+
+
+def test_load_manifest_errors(tmp_path):
+    Path(tmp_path, 'foo').mkdir()
+    manifest_path = Path(tmp_path, 'batch.json')
+
+    def check(manifest, message):
+        manifest_path.write_text(json.dumps(manifest))
+        with pytest.raises(ValueError) as err:
+            load_manifest(manifest_path)
+        assert str(err.value) == message
+
+    check({'releases': []}, f'No releases in {manifest_path}')
+    check(
+        {'releases': [{'path': 'foo', 'version': '1.0', 'depends_on': ['bar']}]},
+        "'foo' depends on unknown releases: ['bar']",
+    )
+    check(
+        {'releases': [{'path': 'foo', 'version': '1.0', 'repository': 'bar'}]},
+        "Unknown repository of 'foo': 'bar'",
+    )
+    check(
+        {'options': {'package_root': '.'}, 'releases': [{'path': 'foo', 'version': '1.0'}]},
+        'Unknown options of the batch: package_root',
+    )
+    check(
+        {'releases': [{'path': 'foo', 'version': '1.0'}, {'path': 'foo', 'version': '1.1'}]},
+        "Release names are not unique: ['foo', 'foo']",
+    )
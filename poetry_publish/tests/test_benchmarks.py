@@ -0,0 +1,122 @@
+"""
+    Benchmarks of the publish pipeline with a simulated toolchain
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    The results are compared with "benchmark_baselines.json": A benchmark fails, if the
+    result is worse than the baseline value by more than the "tolerance" factor.
+
+    The benchmarks of wall-clock times run only on request, on a otherwise idle machine:
+
+        ~/poetry-publish$ make benchmark
+
+    Store the current results as new baselines with:
+
+        ~/poetry-publish$ POETRY_PUBLISH_UPDATE_BASELINES=1 poetry run pytest -k benchmark
+"""
+
+import json
+import os
+import time
+import tracemalloc
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from poetry_publish.publish import poetry_publish
+from poetry_publish.tests.simulation import SimulatedToolchain
+from poetry_publish.utils.publish_log import logger
+
+
+BASELINES_PATH = Path(__file__).parent / 'benchmark_baselines.json'
+
+
+def release_outputs():
+    return {
+        '/fake/bin/git rev-parse HEAD': 'abc123',  # the released commit
+        '/fake/bin/git branch --no-color': '* main',
+        '/fake/bin/git -c core.untrackedCache=true status --porcelain': '',
+        '/fake/bin/poetry check': 'All set!',
+        '/fake/bin/git rev-list --left-right --count HEAD...origin/main': '0\t0',
+        '/fake/bin/git ls-files --stage -z': '',
+        '/fake/bin/poetry build': '',
+        '/fake/bin/twine check dist/*.*': 'Checking dist/foo.whl: PASSED',
+        '/fake/bin/git for-each-ref --format=%(refname) refs/tags/v1.0.0': '',
+    }
+
+
+def run_release(toolchain, max_workers=None):
+    # Without the log capture of pytest, that keeps all records in memory:
+    with toolchain, patch('sys.stdout', open(os.devnull, 'w')) as devnull, patch.object(
+        logger, 'handlers', []
+    ):
+        start_time = time.monotonic()
+        poetry_publish(package_root=Path.cwd(), version='1.0.0', max_workers=max_workers)
+        duration = time.monotonic() - start_time
+    devnull.close()
+    assert toolchain.outputs == {}
+    return duration
+
+
+def assert_baseline(name, value):
+    baselines = json.loads(BASELINES_PATH.read_text())
+    baseline = baselines[name]
+    if os.environ.get('POETRY_PUBLISH_UPDATE_BASELINES'):
+        baseline['value'] = value
+        BASELINES_PATH.write_text(json.dumps(baselines, indent=4) + '\n')
+        return
+
+    if baseline.get('higher_is_better'):
+        limit = baseline['value'] / baseline['tolerance']
+        assert value >= limit, f'{name} regression: {value} < {limit} ({baseline["description"]})'
+    else:
+        limit = baseline['value'] * baseline['tolerance']
+        assert value <= limit, f'{name} regression: {value} > {limit} ({baseline["description"]})'
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.mark.wall_clock
+def test_benchmark_pipeline_overhead():
+    runs = 10
+    duration = sum(
+        run_release(SimulatedToolchain(outputs=release_outputs()), max_workers=1)
+        for _ in range(runs)
+    )
+    assert_baseline('pipeline_overhead', duration / runs)
+
+
+def test_benchmark_parallel_speedup():
+    latency = 0.05
+    serial = run_release(SimulatedToolchain(outputs=release_outputs(), latency=latency), 1)
+    parallel = run_release(SimulatedToolchain(outputs=release_outputs(), latency=latency))
+    assert_baseline('parallel_speedup', serial / parallel)
+
+
+def get_peak_memory(toolchain):
+    tracemalloc.start()
+    try:
+        run_release(toolchain, max_workers=1)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def test_benchmark_large_output_memory():
+    toolchain = SimulatedToolchain(
+        outputs=release_outputs(), output_sizes={'/fake/bin/poetry build': 10 * 1024 * 1024}
+    )
+    assert_baseline('large_output_peak_memory', get_peak_memory(toolchain))
+
+
+def test_benchmark_progress_output_memory():
+    toolchain = SimulatedToolchain(
+        outputs=release_outputs(),
+        output_sizes={'/fake/bin/poetry build': 10 * 1024 * 1024},
+        output_lines={'/fake/bin/poetry build': f'\rBuilding {"x" * 70}'},  # no newline
+    )
+    assert_baseline('progress_output_peak_memory', get_peak_memory(toolchain))
@@ -0,0 +1,108 @@
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from poetry_publish.daemon import ReleaseDaemon, ReleaseServer, submit_job
+from poetry_publish.utils.publish_log import log_event
+from poetry_publish.utils.steps import Step, run_steps
+
+
+def fake_release(package_root, version, **options):
+    """
+    Runs in the job process of the daemon, instead of poetry_publish()
+    """
+    print(f'Release {package_root.name} v{version} {options}')
+
+    def build(context):
+        log_event('output', 'Building')
+        time.sleep(0.2)
+
+    run_steps([Step('build', build)], None, max_workers=1)
+    if version == '0.0.0':
+        sys.exit(3)
+
+
+@pytest.fixture()
+def socket_path(tmp_path):
+    socket_path = Path(tmp_path, 'daemon.sock')
+    server = ReleaseServer(socket_path, ReleaseDaemon(max_jobs=2, release=fake_release))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield socket_path
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_daemon(tmp_path, socket_path):
+    repo_path = Path(tmp_path, 'repo')
+    repo_path.mkdir()
+    subprocess.check_call(['git', 'init', '--quiet'], cwd=repo_path)
+
+    def submit(job, events):
+        events.extend(submit_job(socket_path, job))
+
+    jobs = [
+        {'package_root': str(repo_path), 'version': '1.0.0', 'options': {'resume': False}},
+        {'package_root': str(repo_path), 'version': '0.0.0'},
+    ]
+    results = [[], []]
+    threads = [
+        threading.Thread(target=submit, args=(job, events)) for job, events in zip(jobs, results)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for events in results:
+        events_by_name = {event['event']: event for event in events}
+        # The printed output is forwarded by a other thread, in any order to the log:
+        assert [event['event'] for event in events if event['event'] != 'console'] == [
+            'queued',
+            'job_start',
+            'step_start',
+            'output',
+            'step_end',
+            'job_end',
+        ]
+        assert events[-2]['event'] in ('console', 'step_end')
+        assert events_by_name['queued']['repository'] == str(repo_path)
+        assert events_by_name['output']['step'] == 'build'
+        assert events_by_name['output']['message'] == 'Building'
+
+    def get_console(events):
+        return [event['message'] for event in events if event['event'] == 'console']
+
+    ok_events, error_events = results
+    assert get_console(ok_events) == ["Release repo v1.0.0 {'resume': False}\n"]
+    assert ok_events[-1]['ok'] is True
+    assert ok_events[-1]['exit_code'] == 0
+    assert get_console(error_events) == ['Release repo v0.0.0 {}\n']
+    assert error_events[-1]['ok'] is False
+    assert error_events[-1]['exit_code'] == 3
+
+    # The jobs of one repository run one after another:
+    first, second = sorted(results, key=lambda events: events[0]['position'])
+    assert [first[0]['position'], second[0]['position']] == [0, 1]
+    assert second[1]['time'] >= first[-1]['time']
+
+
+def test_daemon_invalid_job(tmp_path, socket_path):
+    events = list(submit_job(socket_path, {'package_root': str(tmp_path), 'version': '1.0.0'}))
+    assert [event['event'] for event in events] == ['error']  # not a git repository
+
+    events = list(submit_job(socket_path, {'package_root': str(tmp_path), 'version': 1}))
+    assert events[0]['message'] == "Job needs a 'version' string"
+
+    events = list(
+        submit_job(
+            socket_path,
+            {'package_root': str(tmp_path), 'version': '1.0.0', 'options': {'foo': 1}},
+        )
+    )
+    assert events[0]['message'] == 'Unknown options: foo'
@@ -0,0 +1,61 @@
+import platform
+import subprocess
+import sys
+
+import pytest
+
+
+# Seconds for "import poetry_publish.self", incl. all needed standard library modules:
+IMPORT_TIME_BUDGET = 0.25
+
+# Optional or heavy dependencies must be imported by the step that needs them:
+LAZY_MODULES = (
+    'creole',
+    'docutils',
+    'readme_renderer',
+    'twine',
+    'requests',
+    'requests_toolbelt',
+    'cProfile',
+    'pstats',
+)
+
+
+def get_import_times(module_name):
+    """
+    Returns the cumulative import times in microseconds, measured by "python -X importtime"
+    """
+    output = subprocess.check_output(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    import_times = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_time, cumulative_time, name = line[len('import time:'):].split('|')
+        if cumulative_time.strip().isdigit():
+            import_times[name.strip()] = int(cumulative_time)
+    return import_times
+
+
+skip_no_importtime = pytest.mark.skipif(
+    platform.python_implementation() != 'CPython', reason='-X importtime is CPython only'
+)
+
+
+@skip_no_importtime
+def test_lazy_imports():
+    import_times = get_import_times('poetry_publish.self')
+
+    lazy_imported = [name for name in import_times if name.split('.')[0] in LAZY_MODULES]
+    assert lazy_imported == []
+
+
+@skip_no_importtime
+@pytest.mark.wall_clock
+def test_import_time():
+    import_times = get_import_times('poetry_publish.self')
+    import_time = import_times['poetry_publish.self'] / 1_000_000
+    assert import_time < IMPORT_TIME_BUDGET
@@ -0,0 +1,94 @@
+from unittest.mock import patch
+
+import pytest
+
+from poetry_publish.monorepo import PackageResult, poetry_publish_many
+from poetry_publish.publish import DEFAULT_STEP_TIMEOUT
+from poetry_publish.tests.simulation import MockConfirm, SimulatedToolchain
+
+
+def test_publish_many(tmp_path, capsys):
+    packages = {}
+    for name in ('foo', 'bar'):
+        package_root = tmp_path / name
+        package_root.mkdir()
+        packages[package_root] = '1.0.0'
+
+    mock_confirm = MockConfirm(behaviour=['n'])  # don't publish 'bar' with twine errors
+    toolchain = SimulatedToolchain(
+        outputs={
+            '/fake/bin/git branch --no-color': '* main',
+            '/fake/bin/git for-each-ref --format=%(refname) refs/tags/foo-v1.0.0': '',
+            '/fake/bin/git for-each-ref --format=%(refname) refs/tags/bar-v1.0.0': '',
+            '/fake/bin/git -c core.untrackedCache=true status --porcelain': '',  # it's clean
+            '/fake/bin/git rev-list --left-right --count HEAD...origin/main': '0\t0',  # no changes
+            '/fake/bin/poetry check': ['All set!', 'All set!'],
+            '/fake/bin/git ls-files --stage -z': ['', ''],  # build cache keys
+            '/fake/bin/poetry build': ['', ''],
+            '/fake/bin/twine check dist/*.*': [
+                'Checking dist/foo.whl: PASSED',
+                'Checking dist/bar.whl: FAILED',
+            ],
+        }
+    )
+
+    with patch(
+        'poetry_publish.utils.interactive.input', mock_confirm
+    ) as confirm, toolchain, pytest.raises(SystemExit) as exit:
+        poetry_publish_many(packages=packages, repository_root=tmp_path, max_workers=1)
+
+    assert exit.value.code == 5
+    assert toolchain.calls == [
+        '/fake/bin/poetry version 1.0.0',  # foo
+        '/fake/bin/poetry version 1.0.0',  # bar
+        '/fake/bin/git fetch --no-tags origin +refs/heads/main:refs/remotes/origin/main',
+        '/fake/bin/git push origin main',
+        '/fake/bin/poetry publish -vvv',  # only foo
+        '/fake/bin/git tag -a foo-v1.0.0 -m publishing version 1.0.0',
+        '/fake/bin/git push --tags',
+    ]
+    assert toolchain.outputs == {}
+    assert confirm.calls == ['Twine check failed!']
+
+    out, err = capsys.readouterr()
+    assert 'Release report:\n' in out
+    assert '\tfoo v1.0.0      OK ' in out
+    assert '\tbar v1.0.0      ERROR ' in out
+    assert 'SystemExit(-1)' in out
+
+
+def test_publish_many_step_timeouts(tmp_path):
+    with pytest.raises(ValueError) as err:
+        poetry_publish_many(packages={})
+    assert str(err.value) == 'No packages to publish'
+
+    package_root = tmp_path / 'foo'
+    package_root.mkdir()
+    toolchain = SimulatedToolchain(
+        outputs={
+            '/fake/bin/git branch --no-color': '* main',
+            '/fake/bin/git for-each-ref --format=%(refname) refs/tags/foo-v1.0.0': '',
+            '/fake/bin/git -c core.untrackedCache=true status --porcelain': '',  # it's clean
+            '/fake/bin/git rev-list --left-right --count HEAD...origin/main': '0\t0',  # no changes
+        }
+    )
+    result = PackageResult(name='foo', version='1.0.0', ok=True, duration=0)
+    with toolchain, patch(
+        'poetry_publish.monorepo.release_packages', return_value=[result]
+    ) as release_packages:
+        poetry_publish_many(
+            packages={package_root: '1.0.0'},
+            repository_root=tmp_path,
+            max_workers=1,
+            step_timeouts={'build': 3600, 'upload': None},
+        )
+
+    # A hanging command in a package is killed:
+    steps = release_packages.call_args.kwargs['steps']
+    assert {step.name: step.timeout for step in steps} == {
+        'poetry_check': DEFAULT_STEP_TIMEOUT,
+        'build': 3600,
+        'manifest': DEFAULT_STEP_TIMEOUT,
+        'twine_check': DEFAULT_STEP_TIMEOUT,
+        'upload': None,
+    }
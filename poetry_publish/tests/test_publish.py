@@ -1,106 +1,84 @@
+import subprocess
+import time
 from pathlib import Path
 from unittest.mock import patch
 
 import pytest
 
 import poetry_publish
+from poetry_publish.publish import ReleaseContext, get_release_build_key
 from poetry_publish.self import publish_poetry_publish
+from poetry_publish.tests.simulation import MockConfirm, SimulatedToolchain
+from poetry_publish.utils.build_cache import store_build
+from poetry_publish.utils.cache import CACHE_DIR_NAME
+from poetry_publish.utils.journal import ReleaseJournal
+from poetry_publish.utils.upload import PYPI_UPLOAD_URL
 
 
-class MockConfirm:
-    def __init__(self, behaviour):
-        self.behaviour = behaviour
-        self.call_count = 0
-        self.calls = []
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    """
+    Don't create "dist", "publish.log" etc. in the project directory.
+    """
+    monkeypatch.chdir(tmp_path)
 
-    def __call__(self, txt):
-        print(txt, end=' ')
-        self.call_count += 1
 
-        txt = txt.strip()
-        txt = txt.rsplit('\n', 1)[0]
-        txt = txt.strip()
-        self.calls.append(txt)
-
-        key = self.behaviour.pop(0)
-        print(key)
-        return key
-
-
-class MockCheckCall:
-    def __init__(self):
-        self.calls = []
-
-    def __call__(self, args, **kwargs):
-        self.calls.append(' '.join(args))
-
-
-class MockCheckOutput:
-    def __init__(self, behaviour):
-        self.behaviour = behaviour
-
-    def __call__(self, args, **kwargs):
-        return self.behaviour.pop(' '.join(args))
-
-
-def fake_poetry_publish(version, creole_readme=True):
+def fake_poetry_publish(version, creole_readme=True, max_workers=1):
     poetry_publish.publish.poetry_publish(
         package_root=Path(poetry_publish.__file__).parent.parent,
         version=version,
-        creole_readme=creole_readme
+        creole_readme=creole_readme,
+        max_workers=max_workers,  # default: call all steps in a deterministic order
     )
 
 
-def fake_replace_prog(args):
-    return [f'/fake/bin/{args[0]}', *args[1:]]
-
-
 def test_publish_on_master():
     mock_confirm = MockConfirm(behaviour=[])  # nothing to confirm
-    mock_check_output = MockCheckOutput(
-        behaviour={
+    toolchain = SimulatedToolchain(
+        outputs={
+            '/fake/bin/git rev-parse HEAD': 'abc123',  # the released commit
             '/fake/bin/git branch --no-color': ('  develop\n' '* master'),  # we are not on master
-            '/fake/bin/git status --porcelain': '',  # it's clean
+            '/fake/bin/git -c core.untrackedCache=true status --porcelain': '',  # it's clean
             '/fake/bin/poetry check': 'All set!',  # all ok
-            '/fake/bin/git log HEAD..origin/master --oneline': '',  # no changes
+            '/fake/bin/git rev-list --left-right --count HEAD...origin/master': '0\t0',  # in sync
+            '/fake/bin/git ls-files --stage -z': '',  # build cache key
             '/fake/bin/poetry build': '',  # build ok
-            '/fake/bin/poetry run twine check dist/*.*': 'Checking dist/foobar.whl: PASSED',  # ok
-            '/fake/bin/git tag': 'v0.0.1\nv0.0.2',  # version doesn't exist, yet
+            '/fake/bin/twine check dist/*.*': 'Checking dist/foobar.whl: PASSED',  # ok
+            '/fake/bin/git for-each-ref --format=%(refname) refs/tags/v1.2.3': '',  # new tag
         }
     )
 
-    with patch('poetry_publish.utils.interactive.input', mock_confirm) as confirm, patch(
-        'poetry_publish.utils.subprocess_utils.replace_prog', fake_replace_prog
-    ), patch('subprocess.check_call', MockCheckCall()) as check_call, patch(
-        'subprocess.check_output', mock_check_output
-    ) as check_output:
+    with patch('poetry_publish.utils.interactive.input', mock_confirm) as confirm, toolchain:
         fake_poetry_publish(version='1.2.3', creole_readme=True)
 
-    assert check_call.calls == [
+    assert toolchain.calls == [
         '/fake/bin/poetry version 1.2.3',
-        '/fake/bin/git fetch --all',
+        '/fake/bin/git fetch --no-tags origin +refs/heads/master:refs/remotes/origin/master',
         '/fake/bin/git push origin master',
         '/fake/bin/poetry publish -vvv',
         '/fake/bin/git tag -a v1.2.3 -m publishing version 1.2.3',
         '/fake/bin/git push --tags',
     ]
-    assert check_output.behaviour == {}
+    assert toolchain.outputs == {}
 
     assert confirm.call_count == 0
     assert confirm.calls == []
 
+    # Nothing makes the git repository "unclean" for the next release:
+    assert sorted(path.name for path in Path.cwd().iterdir()) == [
+        '.poetry_publish_cache',
+        'publish.log',
+    ]
+    assert Path('.poetry_publish_cache', 'publish.json').is_file()
+
 
 def test_publish_abort_on_dev_version(capsys):
     mock_confirm = MockConfirm(behaviour=['n'])  # no confirm
-    mock_check_output = MockCheckOutput(behaviour={})
-
-    with patch('poetry_publish.utils.interactive.input', mock_confirm) as confirm, patch(
-        'poetry_publish.utils.subprocess_utils.replace_prog', fake_replace_prog
-    ), patch('subprocess.check_call', MockCheckCall()) as check_call, patch(
-        'subprocess.check_output', mock_check_output
-    ) as check_output, pytest.raises(
-        SystemExit
-    ) as exit:
+    toolchain = SimulatedToolchain(outputs={})
+
+    with patch(
+        'poetry_publish.utils.interactive.input', mock_confirm
+    ) as confirm, toolchain, pytest.raises(SystemExit) as exit:
         fake_poetry_publish(version='1.2.3.dev0', creole_readme=True)
 
     # Check exit from confirm():
@@ -108,8 +86,8 @@ def test_publish_abort_on_dev_version(capsys):
     assert "Bye." in out
     assert exit.value.code == -1
 
-    assert check_call.calls == []
-    assert check_output.behaviour == {}
+    assert toolchain.calls == []
+    assert toolchain.outputs == {}
 
     assert confirm.call_count == 1
     assert confirm.calls == ["WARNING: Version contains 'dev': v1.2.3.dev0"]
@@ -117,36 +95,34 @@ def test_publish_abort_on_dev_version(capsys):
 
 def test_publish_confirm_dev_version():
     mock_confirm = MockConfirm(behaviour=['y'])  # confirm dev version
-    mock_check_output = MockCheckOutput(
-        behaviour={
+    toolchain = SimulatedToolchain(
+        outputs={
+            '/fake/bin/git rev-parse HEAD': 'abc123',  # the released commit
             '/fake/bin/git branch --no-color': ('  develop\n' '* master'),  # we are not on master
-            '/fake/bin/git status --porcelain': '',  # it's clean
+            '/fake/bin/git -c core.untrackedCache=true status --porcelain': '',  # it's clean
             '/fake/bin/poetry check': 'All set!',  # all ok
-            '/fake/bin/git log HEAD..origin/master --oneline': '',  # no changes
+            '/fake/bin/git rev-list --left-right --count HEAD...origin/master': '0\t0',  # in sync
+            '/fake/bin/git ls-files --stage -z': '',  # build cache key
             '/fake/bin/poetry build': '',  # build ok
-            '/fake/bin/poetry run twine check dist/*.*': (
+            '/fake/bin/twine check dist/*.*': (
                 'Checking dist/foobar.whl: PASSED\n' 'Checking dist/foobar.tar.gz: PASSED'
             ),  # ok
-            '/fake/bin/git tag': 'v0.0.1\nv0.0.2',  # version doesn't exist, yet
+            '/fake/bin/git for-each-ref --format=%(refname) refs/tags/v1.2.3.dev1': '',  # new tag
         }
     )
 
-    with patch('poetry_publish.utils.interactive.input', mock_confirm) as confirm, patch(
-        'poetry_publish.utils.subprocess_utils.replace_prog', fake_replace_prog
-    ), patch('subprocess.check_call', MockCheckCall()) as check_call, patch(
-        'subprocess.check_output', mock_check_output
-    ) as check_output:
+    with patch('poetry_publish.utils.interactive.input', mock_confirm) as confirm, toolchain:
         fake_poetry_publish(version='1.2.3.dev1', creole_readme=True)
 
-    assert check_call.calls == [
+    assert toolchain.calls == [
         '/fake/bin/poetry version 1.2.3.dev1',
-        '/fake/bin/git fetch --all',
+        '/fake/bin/git fetch --no-tags origin +refs/heads/master:refs/remotes/origin/master',
         '/fake/bin/git push origin master',
         '/fake/bin/poetry publish -vvv',
         '/fake/bin/git tag -a v1.2.3.dev1 -m publishing version 1.2.3.dev1',
         '/fake/bin/git push --tags',
     ]
-    assert check_output.behaviour == {}
+    assert toolchain.outputs == {}
 
     assert confirm.call_count == 1
     assert confirm.calls == ["WARNING: Version contains 'dev': v1.2.3.dev1"]
@@ -154,19 +130,16 @@ def test_publish_confirm_dev_version():
 
 def test_publish_abort_not_on_master(capsys):
     mock_confirm = MockConfirm(behaviour=['n'])  # no confirm
-    mock_check_output = MockCheckOutput(
-        behaviour={
+    toolchain = SimulatedToolchain(
+        outputs={
+            '/fake/bin/git rev-parse HEAD': 'abc123',  # the released commit
             '/fake/bin/git branch --no-color': ('* develop\n' '  master'),  # we are not on master
         }
     )
 
-    with patch('poetry_publish.utils.interactive.input', mock_confirm) as confirm, patch(
-        'poetry_publish.utils.subprocess_utils.replace_prog', fake_replace_prog
-    ), patch('subprocess.check_call', MockCheckCall()) as check_call, patch(
-        'subprocess.check_output', mock_check_output
-    ) as check_output, pytest.raises(
-        SystemExit
-    ) as exit:
+    with patch(
+        'poetry_publish.utils.interactive.input', mock_confirm
+    ) as confirm, toolchain, pytest.raises(SystemExit) as exit:
         fake_poetry_publish(version='1.2.3', creole_readme=True)
 
     # Check exit from confirm():
@@ -179,40 +152,64 @@ def test_publish_abort_not_on_master(capsys):
         'NOTE: It seems you are not on "main" or "master":\n* develop\n  master'
     ]
 
-    assert check_call.calls == []
-    assert check_output.behaviour == {}
+    assert toolchain.calls == []
+    assert toolchain.outputs == {}
+
+
+def test_publish_abort_not_on_master_parallel(capsys):
+    mock_confirm = MockConfirm(behaviour=['n'])  # no confirm
+    toolchain = SimulatedToolchain(
+        outputs={
+            '/fake/bin/git rev-parse HEAD': 'abc123',  # the released commit
+            '/fake/bin/git branch --no-color': ('* develop\n' '  master'),  # we are not on master
+        },
+        latency=0.1,
+    )
+
+    with patch(
+        'poetry_publish.utils.interactive.input', mock_confirm
+    ) as confirm, toolchain, pytest.raises(SystemExit) as exit:
+        fake_poetry_publish(version='1.2.3', creole_readme=False, max_workers=None)
+    assert exit.value.code == -1
+
+    # No other step starts before the question is answered, e.g.: "poetry version"
+    assert confirm.calls == [
+        'NOTE: It seems you are not on "main" or "master":\n* develop\n  master'
+    ]
+    assert toolchain.all_calls == [
+        '/fake/bin/git rev-parse HEAD',
+        '/fake/bin/git branch --no-color',
+    ]
 
 
 def test_publish_confirm_not_on_master(capsys):
     mock_confirm = MockConfirm(behaviour=['y'])  # confirm not on master
-    mock_check_output = MockCheckOutput(
-        behaviour={
+    toolchain = SimulatedToolchain(
+        outputs={
+            '/fake/bin/git rev-parse HEAD': 'abc123',  # the released commit
             '/fake/bin/git branch --no-color': ('* develop\n' '  master'),  # we are not on master
-            '/fake/bin/git status --porcelain': '',  # it's clean
+            '/fake/bin/git -c core.untrackedCache=true status --porcelain': '',  # it's clean
             '/fake/bin/poetry check': 'All set!',  # all ok
-            '/fake/bin/git log HEAD..origin/master --oneline': '',  # no changes
+            '/fake/bin/git rev-list --left-right --count HEAD...origin/master': '0\t0',  # in sync
+            '/fake/bin/git ls-files --stage -z': '',  # build cache key
             '/fake/bin/poetry build': '',  # build ok
-            '/fake/bin/poetry run twine check dist/*.*': 'Checking dist/foobar.whl: PASSED',  # ok
-            '/fake/bin/git tag': 'v0.0.1\nv0.0.2',  # version doesn't exist, yet
+            '/fake/bin/twine check dist/*.*': 'Checking dist/foobar.whl: PASSED',  # ok
+            '/fake/bin/git for-each-ref --format=%(refname) refs/tags/v1.2.3': '',  # new tag
         }
     )
 
-    with patch('poetry_publish.utils.interactive.input', mock_confirm) as confirm, patch(
-        'poetry_publish.utils.subprocess_utils.replace_prog', fake_replace_prog
-    ), patch('subprocess.check_call', MockCheckCall()) as check_call, patch(
-        'subprocess.check_output', mock_check_output
-    ) as check_output:
+    with patch('poetry_publish.utils.interactive.input', mock_confirm) as confirm, toolchain:
         fake_poetry_publish(version='1.2.3', creole_readme=True)
 
-    assert check_call.calls == [
+    assert toolchain.calls == [
         '/fake/bin/poetry version 1.2.3',
-        '/fake/bin/git fetch --all',
+        '/fake/bin/git fetch --no-tags origin +refs/heads/master:refs/remotes/origin/master',
         '/fake/bin/git push origin develop',
         '/fake/bin/poetry publish -vvv',
         '/fake/bin/git tag -a v1.2.3 -m publishing version 1.2.3',
         '/fake/bin/git push --tags',
     ]
-    assert check_output.behaviour == {}
+    assert toolchain.outputs == {}
 
     assert confirm.call_count == 1
     assert confirm.calls == [
@@ -222,20 +219,19 @@ def test_publish_confirm_not_on_master(capsys):
 
 def test_publish_abort_git_not_clean(capsys):
     mock_confirm = MockConfirm(behaviour=[])  # nothing to confirm
-    mock_check_output = MockCheckOutput(
-        behaviour={
+    toolchain = SimulatedToolchain(
+        outputs={
+            '/fake/bin/git rev-parse HEAD': 'abc123',  # the released commit
             '/fake/bin/git branch --no-color': ('  develop\n' '* master'),  # we are not on master
-            '/fake/bin/git status --porcelain': ' M poetry_publish/tests/test_publish.py',  # not clean
+            '/fake/bin/git -c core.untrackedCache=true status --porcelain': (
+                ' M poetry_publish/tests/test_publish.py'  # not clean
+            ),
         }
     )
 
-    with patch('poetry_publish.utils.interactive.input', mock_confirm) as confirm, patch(
-        'poetry_publish.utils.subprocess_utils.replace_prog', fake_replace_prog
-    ), patch('subprocess.check_call', MockCheckCall()) as check_call, patch(
-        'subprocess.check_output', mock_check_output
-    ) as check_output, pytest.raises(
-        SystemExit
-    ) as exit:
+    with patch(
+        'poetry_publish.utils.interactive.input', mock_confirm
+    ) as confirm, toolchain, pytest.raises(SystemExit) as exit:
         fake_poetry_publish(version='1.2.3', creole_readme=True)
 
     # Check exit from confirm():
@@ -243,8 +239,8 @@ def test_publish_abort_git_not_clean(capsys):
     assert "ERROR: git repro not clean:\n M poetry_publish/tests/test_publish.py" in out
     assert exit.value.code == 1
 
-    assert check_call.calls == ['/fake/bin/poetry version 1.2.3']
-    assert check_output.behaviour == {}
+    assert toolchain.calls == ['/fake/bin/poetry version 1.2.3']
+    assert toolchain.outputs == {}
 
     assert confirm.call_count == 0
     assert confirm.calls == []
@@ -252,21 +248,18 @@ def test_publish_abort_git_not_clean(capsys):
 
 def test_publish_abort_poetry_check_failed(capsys):
     mock_confirm = MockConfirm(behaviour=['n'])  # no confirm
-    mock_check_output = MockCheckOutput(
-        behaviour={
+    toolchain = SimulatedToolchain(
+        outputs={
+            '/fake/bin/git rev-parse HEAD': 'abc123',  # the released commit
             '/fake/bin/git branch --no-color': ('  develop\n' '* master'),  # we are not on master
-            '/fake/bin/git status --porcelain': '',  # it's clean
+            '/fake/bin/git -c core.untrackedCache=true status --porcelain': '',  # it's clean
             '/fake/bin/poetry check': 'Error?!?',  # fail!
         }
     )
 
-    with patch('poetry_publish.utils.interactive.input', mock_confirm) as confirm, patch(
-        'poetry_publish.utils.subprocess_utils.replace_prog', fake_replace_prog
-    ), patch('subprocess.check_call', MockCheckCall()) as check_call, patch(
-        'subprocess.check_output', mock_check_output
-    ) as check_output, pytest.raises(
-        SystemExit
-    ) as exit:
+    with patch(
+        'poetry_publish.utils.interactive.input', mock_confirm
+    ) as confirm, toolchain, pytest.raises(SystemExit) as exit:
         fake_poetry_publish(version='1.2.3', creole_readme=True)
 
     # Check exit from confirm():
@@ -274,43 +267,76 @@ def test_publish_abort_poetry_check_failed(capsys):
     assert "Bye." in out
     assert exit.value.code == -1
 
-    assert check_call.calls == ['/fake/bin/poetry version 1.2.3']
-    assert check_output.behaviour == {}
+    assert toolchain.calls == ['/fake/bin/poetry version 1.2.3']
+    assert toolchain.outputs == {}
 
     assert confirm.call_count == 1
     assert confirm.calls == ['Poetry check failed!']
 
 
+def test_publish_abort_poetry_check_failed_parallel(capsys):
+    mock_confirm = MockConfirm(behaviour=['n'])  # no confirm
+
+    def slow_input(txt):
+        time.sleep(0.5)  # the other failed step asks in the meantime
+        return mock_confirm(txt)
+
+    toolchain = SimulatedToolchain(
+        outputs={
+            '/fake/bin/git rev-parse HEAD': 'abc123',  # the released commit
+            '/fake/bin/git branch --no-color': '* master',
+            '/fake/bin/git -c core.untrackedCache=true status --porcelain': '',  # it's clean
+            '/fake/bin/poetry check': 'Error?!?',  # fail!
+            '/fake/bin/git rev-list --left-right --count HEAD...origin/master': '0\t0',  # in sync
+            '/fake/bin/git ls-files --stage -z': '',  # build cache key
+            '/fake/bin/poetry build': '',  # build ok
+            '/fake/bin/twine check dist/*.*': 'Checking dist/foobar.whl: FAILED',  # fail, too!
+            '/fake/bin/git for-each-ref --format=%(refname) refs/tags/v1.2.3': '',  # new tag
+        }
+    )
+
+    with patch(
+        'poetry_publish.utils.interactive.input', slow_input
+    ), toolchain, pytest.raises(SystemExit) as exit:
+        fake_poetry_publish(version='1.2.3', creole_readme=False, max_workers=None)
+    assert exit.value.code == -1
+
+    # Only one question, the other failed step aborts without asking again:
+    assert mock_confirm.call_count == 1
+    assert mock_confirm.calls[0] in ('Poetry check failed!', 'Twine check failed!')
+    out, err = capsys.readouterr()
+    assert out.count('Bye.') == 1
+    assert '/fake/bin/poetry publish -vvv' not in toolchain.all_calls
+
+
 def test_publish_confim_poetry_check_failed(capsys):
     mock_confirm = MockConfirm(behaviour=['y'])  # confirm with failed poetry check
-    mock_check_output = MockCheckOutput(
-        behaviour={
+    toolchain = SimulatedToolchain(
+        outputs={
+            '/fake/bin/git rev-parse HEAD': 'abc123',  # the released commit
             '/fake/bin/git branch --no-color': ('  develop\n' '* master'),  # we are not on master
-            '/fake/bin/git status --porcelain': '',  # it's clean
+            '/fake/bin/git -c core.untrackedCache=true status --porcelain': '',  # it's clean
             '/fake/bin/poetry check': 'Error?!?',  # fail!
-            '/fake/bin/git log HEAD..origin/master --oneline': '',  # no changes
+            '/fake/bin/git rev-list --left-right --count HEAD...origin/master': '0\t0',  # in sync
+            '/fake/bin/git ls-files --stage -z': '',  # build cache key
             '/fake/bin/poetry build': '',  # build ok
-            '/fake/bin/poetry run twine check dist/*.*': 'Checking dist/foobar.whl: PASSED',  # ok
-            '/fake/bin/git tag': 'v0.0.1\nv0.0.2',  # version doesn't exist, yet
+            '/fake/bin/twine check dist/*.*': 'Checking dist/foobar.whl: PASSED',  # ok
+            '/fake/bin/git for-each-ref --format=%(refname) refs/tags/v1.2.3': '',  # new tag
         }
     )
 
-    with patch('poetry_publish.utils.interactive.input', mock_confirm) as confirm, patch(
-        'poetry_publish.utils.subprocess_utils.replace_prog', fake_replace_prog
-    ), patch('subprocess.check_call', MockCheckCall()) as check_call, patch(
-        'subprocess.check_output', mock_check_output
-    ) as check_output:
+    with patch('poetry_publish.utils.interactive.input', mock_confirm) as confirm, toolchain:
         fake_poetry_publish(version='1.2.3', creole_readme=True)
 
-    assert check_call.calls == [
+    assert toolchain.calls == [
         '/fake/bin/poetry version 1.2.3',
-        '/fake/bin/git fetch --all',
+        '/fake/bin/git fetch --no-tags origin +refs/heads/master:refs/remotes/origin/master',
         '/fake/bin/git push origin master',
         '/fake/bin/poetry publish -vvv',
         '/fake/bin/git tag -a v1.2.3 -m publishing version 1.2.3',
         '/fake/bin/git push --tags',
     ]
-    assert check_output.behaviour == {}
+    assert toolchain.outputs == {}
 
     assert confirm.call_count == 1
     assert confirm.calls == ['Poetry check failed!']
@@ -318,37 +344,38 @@ def test_publish_confim_poetry_check_failed(capsys):
 
 def test_publish_abort_repro_not_up_to_date(capsys):
     mock_confirm = MockConfirm(behaviour=[])  # nothing to confirm
-    mock_check_output = MockCheckOutput(
-        behaviour={
+    toolchain = SimulatedToolchain(
+        outputs={
+            '/fake/bin/git rev-parse HEAD': 'abc123',  # the released commit
             '/fake/bin/git branch --no-color': ('  develop\n' '* master'),  # we are not on master
-            '/fake/bin/git status --porcelain': '',  # it's clean
+            '/fake/bin/git -c core.untrackedCache=true status --porcelain': '',  # it's clean
             '/fake/bin/poetry check': 'All set!',  # all ok
-            '/fake/bin/git log HEAD..origin/master --oneline': '5dabb6002e (origin/master, origin/HEAD) One commit',
+            '/fake/bin/git rev-list --left-right --count HEAD...origin/master': '0\t1',
+            '/fake/bin/git log --oneline -n 10 HEAD..origin/master': (
+                '5dabb6002e (origin/master, origin/HEAD) One commit'
+            ),
         }
     )
 
-    with patch('poetry_publish.utils.interactive.input', mock_confirm) as confirm, patch(
-        'poetry_publish.utils.subprocess_utils.replace_prog', fake_replace_prog
-    ), patch('subprocess.check_call', MockCheckCall()) as check_call, patch(
-        'subprocess.check_output', mock_check_output
-    ) as check_output, pytest.raises(
-        SystemExit
-    ) as exit:
+    with patch(
+        'poetry_publish.utils.interactive.input', mock_confirm
+    ) as confirm, toolchain, pytest.raises(SystemExit) as exit:
         fake_poetry_publish(version='1.2.3', creole_readme=True)
 
     # Check exit from confirm():
     out, err = capsys.readouterr()
     assert (
         "ERROR: git repro is not up-to-date:\n"
+        "origin/master has 1 new commit(s), e.g.:\n"
         "5dabb6002e (origin/master, origin/HEAD) One commit"
     ) in out
     assert exit.value.code == 2
 
-    assert check_call.calls == [
+    assert toolchain.calls == [
         '/fake/bin/poetry version 1.2.3',
-        '/fake/bin/git fetch --all',
+        '/fake/bin/git fetch --no-tags origin +refs/heads/master:refs/remotes/origin/master',
     ]
-    assert check_output.behaviour == {}
+    assert toolchain.outputs == {}
 
     assert confirm.call_count == 0
     assert confirm.calls == []
@@ -356,24 +383,22 @@ def test_publish_abort_repro_not_up_to_date(capsys):
 
 def test_publish_abort_twine_error(capsys):
     mock_confirm = MockConfirm(behaviour=['n'])  # Don't confirm
-    mock_check_output = MockCheckOutput(
-        behaviour={
+    toolchain = SimulatedToolchain(
+        outputs={
+            '/fake/bin/git rev-parse HEAD': 'abc123',  # the released commit
             '/fake/bin/git branch --no-color': ('  develop\n' '* master'),  # we are not on master
-            '/fake/bin/git status --porcelain': '',  # it's clean
+            '/fake/bin/git -c core.untrackedCache=true status --porcelain': '',  # it's clean
             '/fake/bin/poetry check': 'All set!',  # all ok
-            '/fake/bin/git log HEAD..origin/master --oneline': '',  # no changes
+            '/fake/bin/git rev-list --left-right --count HEAD...origin/master': '0\t0',  # in sync
+            '/fake/bin/git ls-files --stage -z': '',  # build cache key
             '/fake/bin/poetry build': '',  # build ok
-            '/fake/bin/poetry run twine check dist/*.*': 'Checking dist/foobar.whl: FAILED\nFoo Bar Error',  # fail!
+            '/fake/bin/twine check dist/*.*': 'Checking dist/foobar.whl: FAILED\nFoo Bar Error',  # fail!
         }
     )
 
-    with patch('poetry_publish.utils.interactive.input', mock_confirm) as confirm, patch(
-        'poetry_publish.utils.subprocess_utils.replace_prog', fake_replace_prog
-    ), patch('subprocess.check_call', MockCheckCall()) as check_call, patch(
-        'subprocess.check_output', mock_check_output
-    ) as check_output, pytest.raises(
-        SystemExit
-    ) as exit:
+    with patch(
+        'poetry_publish.utils.interactive.input', mock_confirm
+    ) as confirm, toolchain, pytest.raises(SystemExit) as exit:
         fake_poetry_publish(version='1.2.3', creole_readme=True)
 
     # Check exit from confirm():
@@ -383,12 +408,12 @@ def test_publish_abort_twine_error(capsys):
     ) in out
     assert exit.value.code != 0
 
-    assert check_call.calls == [
+    assert toolchain.calls == [
         '/fake/bin/poetry version 1.2.3',
-        '/fake/bin/git fetch --all',
+        '/fake/bin/git fetch --no-tags origin +refs/heads/master:refs/remotes/origin/master',
         '/fake/bin/git push origin master',
     ]
-    assert check_output.behaviour == {}
+    assert toolchain.outputs == {}
 
     assert confirm.call_count == 1
     assert confirm.calls == ['Twine check failed!']
@@ -396,26 +421,24 @@ def test_publish_abort_twine_error(capsys):
 
 def test_publish_confirm_twine_error(capsys):
     mock_confirm = MockConfirm(behaviour=['y'])  # Don't confirm
-    mock_check_output = MockCheckOutput(
-        behaviour={
+    toolchain = SimulatedToolchain(
+        outputs={
+            '/fake/bin/git rev-parse HEAD': 'abc123',  # the released commit
             '/fake/bin/git branch --no-color': ('  develop\n' '* master'),  # we are not on master
-            '/fake/bin/git status --porcelain': '',  # it's clean
+            '/fake/bin/git -c core.untrackedCache=true status --porcelain': '',  # it's clean
             '/fake/bin/poetry check': 'All set!',  # all ok
-            '/fake/bin/git log HEAD..origin/master --oneline': '',  # no changes
+            '/fake/bin/git rev-list --left-right --count HEAD...origin/master': '0\t0',  # in sync
+            '/fake/bin/git ls-files --stage -z': '',  # build cache key
             '/fake/bin/poetry build': '',  # build ok
-            '/fake/bin/poetry run twine check dist/*.*': (
+            '/fake/bin/twine check dist/*.*': (
                 'Checking dist/foobar.whl: PASSED\n'
                 'Checking dist/foobar.tar.gz: FAILED\nFoo Bar Error'
             ),  # fail!
-            '/fake/bin/git tag': 'v0.0.1\nv0.0.2',  # version doesn't exist, yet
+            '/fake/bin/git for-each-ref --format=%(refname) refs/tags/v1.2.3': '',  # new tag
         }
     )
 
-    with patch('poetry_publish.utils.interactive.input', mock_confirm) as confirm, patch(
-        'poetry_publish.utils.subprocess_utils.replace_prog', fake_replace_prog
-    ), patch('subprocess.check_call', MockCheckCall()) as check_call, patch(
-        'subprocess.check_output', mock_check_output
-    ) as check_output:
+    with patch('poetry_publish.utils.interactive.input', mock_confirm) as confirm, toolchain:
         fake_poetry_publish(version='1.2.3', creole_readme=True)
 
     # Check exit from confirm():
@@ -424,15 +447,15 @@ def test_publish_confirm_twine_error(capsys):
         "Twine check failed!\nPublish anyhow? (Y/N) y\n"
     ) in out
 
-    assert check_call.calls == [
+    assert toolchain.calls == [
         '/fake/bin/poetry version 1.2.3',
-        '/fake/bin/git fetch --all',
+        '/fake/bin/git fetch --no-tags origin +refs/heads/master:refs/remotes/origin/master',
         '/fake/bin/git push origin master',
         '/fake/bin/poetry publish -vvv',
         '/fake/bin/git tag -a v1.2.3 -m publishing version 1.2.3',
         '/fake/bin/git push --tags',
     ]
-    assert check_output.behaviour == {}
+    assert toolchain.outputs == {}
 
     assert confirm.call_count == 1
     assert confirm.calls == ['Twine check failed!']
@@ -440,37 +463,37 @@ def test_publish_confirm_twine_error(capsys):
 
 def test_publish_abort_tag_exists(capsys):
     mock_confirm = MockConfirm(behaviour=[])  # nothing to confirm
-    mock_check_output = MockCheckOutput(
-        behaviour={
+    toolchain = SimulatedToolchain(
+        outputs={
+            '/fake/bin/git rev-parse HEAD': 'abc123',  # the released commit
             '/fake/bin/git branch --no-color': ('  develop\n' '* master'),  # we are not on master
-            '/fake/bin/git status --porcelain': '',  # it's clean
+            '/fake/bin/git -c core.untrackedCache=true status --porcelain': '',  # it's clean
             '/fake/bin/poetry check': 'All set!',  # all ok
-            '/fake/bin/git log HEAD..origin/master --oneline': '',  # no changes
+            '/fake/bin/git rev-list --left-right --count HEAD...origin/master': '0\t0',  # in sync
+            '/fake/bin/git ls-files --stage -z': '',  # build cache key
             '/fake/bin/poetry build': '',  # build ok
-            '/fake/bin/poetry run twine check dist/*.*': 'Checking dist/foobar.whl: PASSED',  # ok
-            '/fake/bin/git tag': 'v0.0.1\nv0.0.2\nv1.2.3\nv2.0',  # version already exists
+            '/fake/bin/twine check dist/*.*': 'Checking dist/foobar.whl: PASSED',  # ok
+            '/fake/bin/git for-each-ref --format=%(refname) refs/tags/v1.2.3': (
+                'refs/tags/v1.2.3'  # version already exists
+            ),
         }
     )
 
-    with patch('poetry_publish.utils.interactive.input', mock_confirm) as confirm, patch(
-        'poetry_publish.utils.subprocess_utils.replace_prog', fake_replace_prog
-    ), patch('subprocess.check_call', MockCheckCall()) as check_call, patch(
-        'subprocess.check_output', mock_check_output
-    ) as check_output, pytest.raises(
-        SystemExit
-    ) as exit:
+    with patch(
+        'poetry_publish.utils.interactive.input', mock_confirm
+    ) as confirm, toolchain, pytest.raises(SystemExit) as exit:
         fake_poetry_publish(version='1.2.3', creole_readme=True)
 
     out, err = capsys.readouterr()
     assert "*** ERROR: git tag 'v1.2.3' already exists!" in out
     assert exit.value.code == 3
 
-    assert check_call.calls == [
+    assert toolchain.calls == [
         '/fake/bin/poetry version 1.2.3',
-        '/fake/bin/git fetch --all',
+        '/fake/bin/git fetch --no-tags origin +refs/heads/master:refs/remotes/origin/master',
         '/fake/bin/git push origin master',
     ]
-    assert check_output.behaviour == {}
+    assert toolchain.outputs == {}
 
     assert confirm.call_count == 0
     assert confirm.calls == []
@@ -478,37 +501,336 @@ def test_publish_abort_tag_exists(capsys):
 
 def test_publish_poetry_publish():
     mock_confirm = MockConfirm(behaviour=[])  # nothing to confirm
-    mock_check_output = MockCheckOutput(
-        behaviour={
+    toolchain = SimulatedToolchain(
+        outputs={
+            '/fake/bin/git rev-parse HEAD': 'abc123',  # the released commit
             '/fake/bin/git branch --no-color': ('  develop\n' '* master'),  # we are not on master
-            '/fake/bin/git status --porcelain': '',  # it's clean
+            '/fake/bin/git -c core.untrackedCache=true status --porcelain': '',  # it's clean
             '/fake/bin/poetry check': 'All set!',  # all ok
-            '/fake/bin/git log HEAD..origin/master --oneline': '',  # no changes
+            '/fake/bin/git rev-list --left-right --count HEAD...origin/master': '0\t0',  # in sync
+            '/fake/bin/git ls-files --stage -z': '',  # build cache key
             '/fake/bin/poetry build': '',  # build ok
-            '/fake/bin/poetry run twine check dist/*.*': 'Checking dist/foobar.whl: PASSED',  # ok
-            '/fake/bin/git tag': 'v0.0.1\nv0.0.2',  # version doesn't exist, yet
+            '/fake/bin/twine check dist/*.*': 'Checking dist/foobar.whl: PASSED',  # ok
+            '/fake/bin/git for-each-ref --format=%(refname) refs/tags/v1.2.3': '',  # new tag
         }
     )
 
-    with patch('poetry_publish.utils.interactive.input', mock_confirm) as confirm, patch(
-        'poetry_publish.utils.subprocess_utils.replace_prog', fake_replace_prog
-    ), patch('subprocess.check_call', MockCheckCall()) as check_call, patch(
-        'subprocess.check_output', mock_check_output
-    ) as check_output, patch(
-        'poetry_publish.__version__', '1.2.3'
-    ):
+    with patch(
+        'poetry_publish.utils.interactive.input', mock_confirm
+    ) as confirm, toolchain, patch('poetry_publish.__version__', '1.2.3'):
         publish_poetry_publish()
 
-    assert check_call.calls == [
-        '/fake/bin/make fix-code-style',
+    # The independent prechecks run in parallel:
+    assert toolchain.calls[0] == '/fake/bin/make fix-code-style'
+    assert sorted(toolchain.calls[1:3]) == [
+        '/fake/bin/git fetch --no-tags origin +refs/heads/master:refs/remotes/origin/master',
         '/fake/bin/poetry version 1.2.3',
-        '/fake/bin/git fetch --all',
+    ]
+    assert toolchain.calls[3:] == [
         '/fake/bin/git push origin master',
         '/fake/bin/poetry publish -vvv',
         '/fake/bin/git tag -a v1.2.3 -m publishing version 1.2.3',
         '/fake/bin/git push --tags',
     ]
-    assert check_output.behaviour == {}
+    assert toolchain.outputs == {}
 
     assert confirm.call_count == 0
     assert confirm.calls == []
+
+
+def test_publish_resume_after_upload(capsys):
+    # Use the existing build in "dist":
+    Path('dist').mkdir()
+    Path('dist', 'foobar-1.2.3-py3-none-any.whl').write_bytes(b'wheel')
+    with SimulatedToolchain(outputs={'/fake/bin/git ls-files --stage -z': ''}):
+        context = ReleaseContext(package_root=Path.cwd(), version='1.2.3')
+        store_build(Path.cwd(), get_release_build_key(context))
+
+    mock_confirm = MockConfirm(behaviour=[])  # nothing to confirm
+    toolchain = SimulatedToolchain(
+        outputs={
+            '/fake/bin/git rev-parse HEAD': 'abc123',  # the released commit
+            '/fake/bin/git branch --no-color': ('  develop\n' '* master'),
+            '/fake/bin/git -c core.untrackedCache=true status --porcelain': '',  # it's clean
+            '/fake/bin/poetry check': 'All set!',  # all ok
+            '/fake/bin/git rev-list --left-right --count HEAD...origin/master': '0\t0',  # in sync
+            '/fake/bin/git ls-files --stage -z': '',  # build cache key
+            '/fake/bin/twine check dist/*.*': 'Checking dist/foobar.whl: PASSED',  # ok
+            '/fake/bin/git for-each-ref --format=%(refname) refs/tags/v1.2.3': '',  # new tag
+        },
+        returncodes={'/fake/bin/git push --tags': 128},  # e.g.: network error
+    )
+    with patch(
+        'poetry_publish.utils.interactive.input', mock_confirm
+    ), toolchain, pytest.raises(subprocess.CalledProcessError):
+        fake_poetry_publish(version='1.2.3', creole_readme=False)
+
+    assert toolchain.calls == [
+        '/fake/bin/poetry version 1.2.3',
+        '/fake/bin/git fetch --no-tags origin +refs/heads/master:refs/remotes/origin/master',
+        '/fake/bin/git push origin master',
+        '/fake/bin/poetry publish -vvv',
+        '/fake/bin/git tag -a v1.2.3 -m publishing version 1.2.3',
+        '/fake/bin/git push --tags',
+    ]
+    capsys.readouterr()
+
+    # Resume: Only the git push of the tags is missing. Cheap checks are made again:
+    toolchain = SimulatedToolchain(
+        outputs={
+            '/fake/bin/git rev-parse HEAD': 'abc123',  # the released commit
+            '/fake/bin/git branch --no-color': ('  develop\n' '* master'),
+            '/fake/bin/git -c core.untrackedCache=true status --porcelain': '',  # it's clean
+            '/fake/bin/git ls-files --stage -z': '',  # build cache key
+            '/fake/bin/git rev-parse --verify --quiet refs/tags/v1.2.3^{commit}': 'abc123',
+        }
+    )
+    with patch('poetry_publish.utils.interactive.input', mock_confirm), toolchain:
+        fake_poetry_publish(version='1.2.3', creole_readme=False)
+
+    assert toolchain.calls == ['/fake/bin/git push --tags']
+    assert toolchain.outputs == {}
+    assert mock_confirm.calls == []
+
+    out, err = capsys.readouterr()
+    assert 'Resume the interrupted release of v1.2.3' in out
+    assert "Step 'upload' is already done, skip." in out
+
+    # The release is complete: Nothing to resume.
+    assert not Path(CACHE_DIR_NAME, 'release.json').exists()
+
+
+def test_publish_no_resume_of_other_commit():
+    journal = ReleaseJournal(Path.cwd(), version='1.2.3', commit='abc123')
+    journal.mark_done('upload')
+
+    assert ReleaseJournal(Path.cwd(), version='1.2.3', commit='abc123').load() is True
+    assert ReleaseJournal(Path.cwd(), version='1.2.3', commit='def456').load() is False
+    assert ReleaseJournal(Path.cwd(), version='1.2.4', commit='abc123').load() is False
+
+
+def test_publish_to_many_repositories(capsys, monkeypatch):
+    monkeypatch.setenv('POETRY_PYPI_TOKEN_TESTPYPI', 'testpypi-token')
+    monkeypatch.setenv('POETRY_PYPI_TOKEN_PYPI', 'pypi-token')
+    # A repository of the command line would conflict with the one of every upload:
+    monkeypatch.setattr(
+        'sys.argv', ['publish', 'publish', '--repository=foo', '-r', 'bar', '--dry-run']
+    )
+    toolchain = SimulatedToolchain(
+        outputs={
+            '/fake/bin/git rev-parse HEAD': 'abc123',  # the released commit
+            '/fake/bin/git branch --no-color': '* main',
+            '/fake/bin/git -c core.untrackedCache=true status --porcelain': '',  # it's clean
+            '/fake/bin/poetry check': 'All set!',  # all ok
+            '/fake/bin/git rev-list --left-right --count HEAD...origin/main': '0\t0',  # in sync
+            '/fake/bin/git ls-files --stage -z': '',  # build cache key
+            '/fake/bin/twine check dist/*.*': 'Checking dist/foobar.whl: PASSED',  # ok
+            '/fake/bin/git for-each-ref --format=%(refname) refs/tags/v1.2.3': '',  # new tag
+            '/fake/bin/poetry publish --repository testpypi --no-interaction --dry-run -vvv': (
+                'Publishing to testpypi'
+            ),
+            '/fake/bin/poetry publish --repository pypi --no-interaction --dry-run -vvv': (
+                'Publishing to pypi'
+            ),
+        }
+    )
+    with patch('poetry_publish.utils.interactive.input', MockConfirm(behaviour=[])), toolchain:
+        poetry_publish.publish.poetry_publish(
+            package_root=Path.cwd(),
+            version='1.2.3',
+            repositories={
+                'testpypi': 'https://test.pypi.org/legacy/',
+                'pypi': 'https://upload.pypi.org/legacy/',
+            },
+        )
+
+    # Build once, upload to both repositories:
+    assert toolchain.all_calls.count('/fake/bin/poetry build') == 1
+    assert toolchain.outputs == {}
+    assert toolchain.calls[-2:] == [
+        '/fake/bin/git tag -a v1.2.3 -m publishing version 1.2.3',
+        '/fake/bin/git push --tags',
+    ]
+
+    out, err = capsys.readouterr()
+    assert 'Upload to 2 repositories: testpypi, pypi' in out
+    assert '\ttestpypi: ' in out
+    assert '\tpypi: ' in out
+    assert 'Publishing to testpypi' in Path('publish.log').read_text()
+
+
+def test_publish_to_many_repositories_error(capsys, monkeypatch):
+    monkeypatch.setenv('TWINE_USERNAME', '__token__')
+    monkeypatch.setenv('TWINE_PASSWORD', 'pypi-SECRET-TOKEN')  # only for the upload to PyPi
+    monkeypatch.setenv('POETRY_PYPI_TOKEN_PYPI', 'pypi-token')
+    monkeypatch.setenv('POETRY_HTTP_BASIC_MIRROR_USERNAME', 'mirror-user')
+    monkeypatch.setenv('POETRY_HTTP_BASIC_MIRROR_PASSWORD', 'mirror-password')
+    toolchain = SimulatedToolchain(
+        outputs={
+            '/fake/bin/git rev-parse HEAD': 'abc123',  # the released commit
+            '/fake/bin/git branch --no-color': '* main',
+            '/fake/bin/git -c core.untrackedCache=true status --porcelain': '',  # it's clean
+            '/fake/bin/poetry check': 'All set!',  # all ok
+            '/fake/bin/git rev-list --left-right --count HEAD...origin/main': '0\t0',  # in sync
+            '/fake/bin/git ls-files --stage -z': '',  # build cache key
+            '/fake/bin/twine check dist/*.*': 'Checking dist/foobar.whl: PASSED',  # ok
+            '/fake/bin/git for-each-ref --format=%(refname) refs/tags/v1.2.3': '',  # new tag
+        },
+        returncodes={
+            '/fake/bin/poetry publish --repository mirror --no-interaction -vvv': 1,
+            '/fake/bin/twine upload --non-interactive --repository-url https://mirror/ dist/*.*': 1,
+        },
+    )
+    with patch(
+        'poetry_publish.utils.interactive.input', MockConfirm(behaviour=[])
+    ), toolchain, pytest.raises(SystemExit) as exit:
+        poetry_publish.publish.poetry_publish(
+            package_root=Path.cwd(),
+            version='1.2.3',
+            repositories={'pypi': PYPI_UPLOAD_URL, 'mirror': 'https://mirror/'},
+        )
+    assert exit.value.code == 6
+
+    # No git tag, if one upload fails:
+    assert not any(call.startswith('/fake/bin/git tag') for call in toolchain.all_calls)
+
+    # The twine fallback gets the credentials of the mirror, not the ones of PyPi:
+    env = toolchain.envs[
+        '/fake/bin/twine upload --non-interactive --repository-url https://mirror/ dist/*.*'
+    ]
+    assert env['TWINE_USERNAME'] == 'mirror-user'
+    assert env['TWINE_PASSWORD'] == 'mirror-password'
+
+    out, err = capsys.readouterr()
+    assert '\tpypi: ' in out
+    assert "\tmirror: " in out
+    assert "s - ERROR: CalledProcessError(1, ['/fake/bin/twine', 'upload'," in out
+
+
+def test_publish_to_many_repositories_without_credentials(capsys, monkeypatch):
+    monkeypatch.setenv('TWINE_PASSWORD', 'pypi-SECRET-TOKEN')  # only for the upload to PyPi
+    monkeypatch.setenv('POETRY_PYPI_TOKEN_PYPI', 'pypi-token')
+    toolchain = SimulatedToolchain(
+        outputs={
+            '/fake/bin/git rev-parse HEAD': 'abc123',  # the released commit
+            '/fake/bin/git branch --no-color': '* main',
+            '/fake/bin/git -c core.untrackedCache=true status --porcelain': '',  # it's clean
+            '/fake/bin/poetry check': 'All set!',  # all ok
+            '/fake/bin/git rev-list --left-right --count HEAD...origin/main': '0\t0',  # in sync
+            '/fake/bin/git ls-files --stage -z': '',  # build cache key
+            '/fake/bin/twine check dist/*.*': 'Checking dist/foobar.whl: PASSED',  # ok
+            '/fake/bin/git for-each-ref --format=%(refname) refs/tags/v1.2.3': '',  # new tag
+        },
+    )
+    with patch(
+        'poetry_publish.utils.interactive.input', MockConfirm(behaviour=[])
+    ), patch(
+        'poetry_publish.publish.upload_artifacts', return_value=[]
+    ) as upload_artifacts, toolchain, pytest.raises(SystemExit) as exit:
+        poetry_publish.publish.poetry_publish(
+            package_root=Path.cwd(),
+            version='1.2.3',
+            native_upload=True,
+            repositories={'pypi': PYPI_UPLOAD_URL, 'internal-mirror': 'http://mirror/'},
+        )
+    assert exit.value.code == 6
+
+    # Only the upload to PyPi, with its own credentials:
+    assert [call.kwargs['repository_url'] for call in upload_artifacts.call_args_list] == [
+        PYPI_UPLOAD_URL
+    ]
+    assert upload_artifacts.call_args.kwargs['password'] == 'pypi-token'
+
+    out, err = capsys.readouterr()
+    assert (
+        "\tinternal-mirror: 0.00s - ERROR: No credentials for 'internal-mirror':"
+        ' Set POETRY_PYPI_TOKEN_INTERNAL_MIRROR'
+        ' or POETRY_HTTP_BASIC_INTERNAL_MIRROR_USERNAME'
+        ' and POETRY_HTTP_BASIC_INTERNAL_MIRROR_PASSWORD\n'
+    ) in out
+
+
+def test_publish_to_many_repositories_without_credentials_via_poetry(capsys, monkeypatch):
+    monkeypatch.setenv('TWINE_PASSWORD', 'pypi-SECRET-TOKEN')  # only for the upload to PyPi
+    monkeypatch.setenv('POETRY_PYPI_TOKEN_PYPI', 'pypi-token')
+    toolchain = SimulatedToolchain(
+        outputs={
+            '/fake/bin/git rev-parse HEAD': 'abc123',  # the released commit
+            '/fake/bin/git branch --no-color': '* main',
+            '/fake/bin/git -c core.untrackedCache=true status --porcelain': '',  # it's clean
+            '/fake/bin/poetry check': 'All set!',  # all ok
+            '/fake/bin/git rev-list --left-right --count HEAD...origin/main': '0\t0',  # in sync
+            '/fake/bin/git ls-files --stage -z': '',  # build cache key
+            '/fake/bin/twine check dist/*.*': 'Checking dist/foobar.whl: PASSED',  # ok
+            '/fake/bin/git for-each-ref --format=%(refname) refs/tags/v1.2.3': '',  # new tag
+        },
+    )
+    with patch(
+        'poetry_publish.utils.interactive.input', MockConfirm(behaviour=[])
+    ), toolchain, pytest.raises(SystemExit) as exit:
+        poetry_publish.publish.poetry_publish(
+            package_root=Path.cwd(),
+            version='1.2.3',
+            repositories={'pypi': PYPI_UPLOAD_URL, 'internal-mirror': 'http://mirror/'},
+        )
+    assert exit.value.code == 6
+
+    # Neither poetry nor twine are called for the mirror:
+    uploads = [call for call in toolchain.all_calls if 'publish' in call or 'upload' in call]
+    assert uploads == ['/fake/bin/poetry publish --repository pypi --no-interaction -vvv']
+
+    out, err = capsys.readouterr()
+    assert "\tinternal-mirror: 0.00s - ERROR: No credentials for 'internal-mirror':" in out
+
+
+def test_publish_to_many_repositories_resume(capsys, monkeypatch):
+    monkeypatch.setenv('POETRY_PYPI_TOKEN_PYPI', 'pypi-token')
+    monkeypatch.setenv('POETRY_PYPI_TOKEN_MIRROR', 'mirror-token')
+    # Use the existing build in "dist", it's verified by the resumed release:
+    Path('dist').mkdir()
+    Path('dist', 'foobar-1.2.3-py3-none-any.whl').write_bytes(b'wheel')
+    with SimulatedToolchain(outputs={'/fake/bin/git ls-files --stage -z': ''}):
+        context = ReleaseContext(package_root=Path.cwd(), version='1.2.3')
+        store_build(Path.cwd(), get_release_build_key(context))
+
+    def release(returncodes):
+        toolchain = SimulatedToolchain(
+            outputs={
+                '/fake/bin/git rev-parse HEAD': 'abc123',  # the released commit
+                '/fake/bin/git branch --no-color': '* main',
+                '/fake/bin/git -c core.untrackedCache=true status --porcelain': '',  # clean
+                '/fake/bin/poetry check': 'All set!',  # all ok
+                '/fake/bin/git rev-list --left-right --count HEAD...origin/main': '0\t0',
+                '/fake/bin/git ls-files --stage -z': '',  # build cache key
+                '/fake/bin/twine check dist/*.*': 'Checking dist/foobar.whl: PASSED',  # ok
+                '/fake/bin/git for-each-ref --format=%(refname) refs/tags/v1.2.3': '',  # new tag
+            },
+            returncodes=returncodes,
+        )
+        with patch('poetry_publish.utils.interactive.input', MockConfirm(behaviour=[])), toolchain:
+            poetry_publish.publish.poetry_publish(
+                package_root=Path.cwd(),
+                version='1.2.3',
+                repositories={'pypi': PYPI_UPLOAD_URL, 'mirror': 'https://mirror/'},
+            )
+        return [call for call in toolchain.all_calls if 'publish --' in call or 'upload' in call]
+
+    # The upload to PyPi succeeds, the upload to the mirror fails:
+    with pytest.raises(SystemExit) as exit:
+        release(
+            returncodes={
+                '/fake/bin/poetry publish --repository mirror --no-interaction -vvv': 1,
+                '/fake/bin/twine upload --non-interactive --repository-url https://mirror/'
+                ' dist/*.*': 1,
+            }
+        )
+    assert exit.value.code == 6
+    capsys.readouterr()
+
+    # Resume: Upload only to the mirror, PyPi would reject the existing files:
+    assert release(returncodes={}) == [
+        '/fake/bin/poetry publish --repository mirror --no-interaction -vvv'
+    ]
+    out, err = capsys.readouterr()
+    assert "Upload to 'pypi' is already done, skip." in out
+    assert not Path(CACHE_DIR_NAME, 'release.json').exists()
@@ -0,0 +1,39 @@
+import tarfile
+import zipfile
+from pathlib import Path
+
+import pytest
+from poetry.core.masonry.builders import sdist, wheel
+
+from poetry_publish.tests.simulation import create_project
+from poetry_publish.utils.backend_build import build_artifacts
+
+
+def test_build_artifacts(tmp_path):
+    create_project(tmp_path)
+
+    sizes = {}
+    for level in (0, 9, None):
+        dist_path = Path(tmp_path, f'dist{level}')
+        sdist_path, wheel_path = build_artifacts(tmp_path, dist_path, compression_level=level)
+        assert sorted(path.name for path in dist_path.iterdir()) == [
+            'foo-1.2.3-py3-none-any.whl',
+            'foo-1.2.3.tar.gz',
+        ]
+        with zipfile.ZipFile(wheel_path) as zip_file:
+            assert zip_file.read('foo/__init__.py') == b'"""Foo"""\n' * 10000
+        with tarfile.open(sdist_path) as tar_file:
+            assert 'foo-1.2.3/foo/__init__.py' in tar_file.getnames()
+        sizes[level] = (sdist_path.stat().st_size, wheel_path.stat().st_size)
+
+    assert sizes[0][0] > sizes[9][0]
+    assert sizes[0][1] > sizes[9][1]
+
+    # The builder modules are unchanged after the build:
+    assert wheel.zipfile is zipfile
+    assert sdist.GzipFile.__module__ == 'gzip'
+
+
+def test_build_artifacts_invalid_level(tmp_path):
+    with pytest.raises(ValueError, match='Compression level must be between 0 and 9, not: 10'):
+        build_artifacts(tmp_path, tmp_path, compression_level=10)
@@ -0,0 +1,136 @@
+import shutil
+import subprocess
+from pathlib import Path
+from unittest.mock import patch
+
+from poetry_publish.tests.simulation import SimulatedToolchain
+from poetry_publish.utils.build_cache import (
+    get_backend_version,
+    get_build_key,
+    get_cached_build,
+    get_include_files,
+    store_build,
+)
+from poetry_publish.utils.cache import CACHE_DIR_NAME
+
+
+def is_build_cached(base_path, key):
+    return get_cached_build(base_path, key) is not None
+
+
+def test_build_cache(tmp_path):
+    subprocess.check_call(['git', 'init', '--quiet'], cwd=tmp_path)
+    source_path = Path(tmp_path, 'source.py')
+    source_path.write_text('print("Hello World")')
+    subprocess.check_call(['git', 'add', 'source.py'], cwd=tmp_path)
+
+    key = get_build_key('1.0.0', cwd=tmp_path)
+    assert get_build_key('1.0.0', cwd=tmp_path) == key
+    assert get_build_key('1.0.1', cwd=tmp_path) != key
+
+    assert is_build_cached(tmp_path, key) is False
+    store_build(tmp_path, key)  # no artifacts -> nothing to store
+    assert not Path(tmp_path, CACHE_DIR_NAME, 'build.json').exists()
+
+    dist_path = Path(tmp_path, 'dist')
+    dist_path.mkdir()
+    wheel_path = Path(dist_path, 'foo-1.0.0-py3-none-any.whl')
+    wheel_path.write_bytes(b'wheel content')
+    store_build(tmp_path, key)
+    assert is_build_cached(tmp_path, key) is True
+
+    # The cache directory doesn't change the git status:
+    output = subprocess.check_output(['git', 'status', '--porcelain'], cwd=tmp_path, text=True)
+    assert output == 'A  source.py\n?? dist/\n'
+
+    # Changed artifacts:
+    wheel_path.write_bytes(b'changed wheel content')
+    assert is_build_cached(tmp_path, key) is False
+
+    # Changed sources:
+    store_build(tmp_path, key)
+    assert is_build_cached(tmp_path, key) is True
+    source_path.write_text('print("Changed")')
+    subprocess.check_call(['git', 'add', 'source.py'], cwd=tmp_path)
+    assert is_build_cached(tmp_path, get_build_key('1.0.0', cwd=tmp_path)) is False
+
+
+def test_build_key_options(tmp_path):
+    subprocess.check_call(['git', 'init', '--quiet'], cwd=tmp_path)
+
+    key = get_build_key('1.0.0', cwd=tmp_path, options={'compression_level': None})
+    assert get_build_key('1.0.0', cwd=tmp_path, options={'compression_level': None}) == key
+    assert get_build_key('1.0.0', cwd=tmp_path, options={'compression_level': 1}) != key
+    assert get_build_key(
+        '1.0.0', cwd=tmp_path, options={'compression_level': None, 'backend': 'poetry-core 2.0'}
+    ) != key
+
+    assert get_backend_version(build_in_process=True).startswith('poetry-core ')
+    assert get_backend_version() == get_backend_version()
+
+
+def test_build_key_untracked_include(tmp_path):
+    subprocess.check_call(['git', 'init', '--quiet'], cwd=tmp_path)
+    Path(tmp_path, '.gitignore').write_text('foo/static/\n')
+    Path(tmp_path, 'pyproject.toml').write_text(
+        '[tool.poetry]\n'
+        'name = "foo"\n'
+        'include = ["CHANGELOG.md", {path = "foo/static", format = "sdist"}]\n'
+    )
+    Path(tmp_path, 'CHANGELOG.md').write_text('1.0.0')
+    static_path = Path(tmp_path, 'foo', 'static')
+    static_path.mkdir(parents=True)
+    Path(static_path, 'app.js').write_text('// generated')
+    subprocess.check_call(
+        ['git', 'add', '.gitignore', 'pyproject.toml', 'CHANGELOG.md'], cwd=tmp_path
+    )
+
+    assert get_include_files(tmp_path) == ['CHANGELOG.md', 'foo/static/app.js']
+
+    key = get_build_key('1.0.0', cwd=tmp_path)
+    assert get_build_key('1.0.0', cwd=tmp_path) == key
+
+    # The generated asset, that git ignores, is changed:
+    Path(static_path, 'app.js').write_text('// generated again')
+    assert get_build_key('1.0.0', cwd=tmp_path) != key
+
+
+def install_distribution(site_packages, name, version):
+    dist_info = Path(site_packages, f'{name.replace("-", "_")}-{version}.dist-info')
+    dist_info.mkdir(parents=True)
+    Path(dist_info, 'METADATA').write_text(
+        f'Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n'
+    )
+    return dist_info
+
+
+def test_backend_version_of_virtualenv(tmp_path):
+    # e.g.: poetry installed via pipx:
+    bin_path = Path(tmp_path, 'venv', 'bin')
+    bin_path.mkdir(parents=True)
+    prog_path = Path(bin_path, 'poetry')
+    prog_path.write_text(f'#!{bin_path}/python\nimport sys\n')
+    site_packages = Path(tmp_path, 'venv', 'lib', 'python3.11', 'site-packages')
+    dist_info = install_distribution(site_packages, 'poetry', '1.8.0')
+    install_distribution(site_packages, 'poetry-core', '1.9.0')
+    install_distribution(site_packages, 'requests', '2.0.0')
+
+    with patch('poetry_publish.utils.build_cache.which', return_value=str(prog_path)):
+        assert get_backend_version() == 'poetry 1.8.0, poetry-core 1.9.0'
+
+        # A upgrade doesn't touch the program, but the installed distribution:
+        shutil.rmtree(dist_info)
+        install_distribution(site_packages, 'poetry', '1.8.1')
+        assert get_backend_version() == 'poetry 1.8.1, poetry-core 1.9.0'
+
+
+def test_backend_version_of_shim(tmp_path):
+    # e.g.: a pyenv shim: The environment of poetry is unknown
+    prog_path = Path(tmp_path, 'poetry')
+    prog_path.write_text('#!/usr/bin/env bash\nexec pyenv exec poetry "$@"\n')
+    toolchain = SimulatedToolchain(
+        outputs={'/fake/bin/poetry --version': 'Poetry (version 1.8.0)\n'}
+    )
+    with patch('poetry_publish.utils.build_cache.which', return_value=str(prog_path)), toolchain:
+        assert get_backend_version() == 'Poetry (version 1.8.0)'
+    assert toolchain.outputs == {}
@@ -0,0 +1,51 @@
+import hashlib
+from pathlib import Path
+
+from poetry_publish.utils.cache import CACHE_DIR_NAME
+from poetry_publish.utils.manifest import (
+    ArtifactDigests,
+    hash_artifacts,
+    hash_file,
+    load_manifest,
+    write_manifest,
+)
+
+
+def test_hash_file(tmp_path):
+    content = b'0123456789' * 100_000
+    file_path = Path(tmp_path, 'foo-1.0.tar.gz')
+    file_path.write_bytes(content)
+
+    # A small buffer, so the file is read in many blocks:
+    assert hash_file(file_path, buffer_size=4096) == ArtifactDigests(
+        name='foo-1.0.tar.gz',
+        size=len(content),
+        sha256=hashlib.sha256(content).hexdigest(),
+        blake2_256=hashlib.blake2b(content, digest_size=32).hexdigest(),
+        md5=hashlib.md5(content).hexdigest(),
+    )
+
+
+def test_manifest(tmp_path):
+    assert hash_artifacts(Path(tmp_path, 'dist')) == []
+    assert load_manifest(tmp_path) is None
+
+    dist_path = Path(tmp_path, 'dist')
+    dist_path.mkdir()
+    for name in ('foo-1.0-py3-none-any.whl', 'foo-1.0.tar.gz'):
+        Path(dist_path, name).write_bytes(name.encode())
+    Path(dist_path, 'sub_directory').mkdir()
+
+    artifacts = hash_artifacts(dist_path, max_workers=2)
+    assert [(artifact.name, artifact.size) for artifact in artifacts] == [
+        ('foo-1.0-py3-none-any.whl', 24),
+        ('foo-1.0.tar.gz', 14),
+    ]
+
+    manifest_path = write_manifest(tmp_path, artifacts, version='1.0', commit='abc123')
+    assert manifest_path == Path(tmp_path, CACHE_DIR_NAME, 'manifest.json')
+    assert load_manifest(tmp_path) == {
+        'version': '1.0',
+        'commit': 'abc123',
+        'artifacts': artifacts,
+    }
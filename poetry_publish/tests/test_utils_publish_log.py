@@ -0,0 +1,124 @@
+import gzip
+import json
+from pathlib import Path
+
+from poetry_publish.publish import ReleaseContext, check_git_clean
+from poetry_publish.tests.simulation import git_commit_all
+from poetry_publish.utils.cache import CACHE_DIR_NAME
+from poetry_publish.utils.publish_log import CommandLog, log_event, publish_log
+from poetry_publish.utils.steps import Step, run_steps
+
+
+def read_records(path):
+    return [json.loads(line) for line in Path(path).read_text().splitlines()]
+
+
+def test_publish_log(tmp_path):
+    log_path = Path(tmp_path, 'publish.log')
+
+    def build(context):
+        with CommandLog() as log:
+            log.write("Call: 'poetry build'\n")
+            log.write('Building foo (1.0.0)\n')
+
+    with publish_log(log_path):
+        log_event('release_start', version='1.0.0')
+        run_steps([Step('check', print), Step('build', build)], None, max_workers=1)
+
+    records = read_records(log_path)
+    assert [(record['step'], record['event']) for record in records] == [
+        (None, 'release_start'),
+        ('check', 'step_start'),
+        ('check', 'step_end'),
+        ('build', 'step_start'),
+        ('build', 'output'),
+        ('build', 'step_end'),
+    ]
+    assert records[0]['version'] == '1.0.0'
+    assert records[4]['message'] == "Call: 'poetry build'\nBuilding foo (1.0.0)\n"
+    assert records[5]['duration'] >= 0
+    assert records[5]['time'].endswith('+00:00')
+
+    # Nothing is logged without a active publish log:
+    log_event('release_start', version='2.0.0')
+    assert len(read_records(log_path)) == 6
+
+
+def test_command_log_chunks(tmp_path):
+    log_path = Path(tmp_path, 'publish.log')
+    with publish_log(log_path):
+        # Chunks of a pipe split the lines:
+        with CommandLog(chunk_size=10) as log:
+            for chunk in ('line 1\nli', 'ne 2\nline', ' 3\nline 4', '\n', 'end'):
+                log.write(chunk)
+                assert log._size < 10
+
+        # Progress output without a newline:
+        with CommandLog(chunk_size=10) as log:
+            for number in range(5):
+                log.write(f'\r{number * 25}%')
+                assert log._size < 10
+
+    messages = [record['message'] for record in read_records(log_path)]
+    assert messages == [
+        'line 1\nline 2\n',
+        'line 3\n',
+        'line 4\n',
+        'end',
+        '\r0%\r25%\r50%',  # too big for one chunk
+        '\r75%\r100%',
+    ]
+
+
+def test_publish_log_rotate_by_size(tmp_path):
+    log_path = Path(tmp_path, 'publish.log')
+    for run in range(5):
+        with publish_log(log_path, max_bytes=1000, backup_count=2):
+            for number in range(10):
+                log_event('output', f'run {run} line {number} ' + 'x' * 50)
+
+    backup_path = Path(tmp_path, CACHE_DIR_NAME, 'logs')
+    assert sorted(path.name for path in tmp_path.iterdir()) == [CACHE_DIR_NAME, 'publish.log']
+    assert sorted(path.name for path in backup_path.iterdir()) == [
+        'publish.log.1.gz',
+        'publish.log.2.gz',
+    ]
+    assert log_path.stat().st_size <= 1000
+    with gzip.open(Path(backup_path, 'publish.log.1.gz')) as f:
+        records = [json.loads(line) for line in f]
+    assert records[-1]['message'] < read_records(log_path)[0]['message']
+
+
+def test_publish_log_rotate_by_age(tmp_path):
+    log_path = Path(tmp_path, 'publish.log')
+    log_path.write_text('Unstructured log of a old version\n')
+
+    with publish_log(log_path):
+        log_event('release_start')
+    with gzip.open(Path(tmp_path, CACHE_DIR_NAME, 'logs', 'publish.log.1.gz')) as f:
+        assert f.read() == b'Unstructured log of a old version\n'
+    assert [record['event'] for record in read_records(log_path)] == ['release_start']
+
+    # Not too old:
+    with publish_log(log_path, max_age=60):
+        log_event('release_end')
+    assert [record['event'] for record in read_records(log_path)] == [
+        'release_start',
+        'release_end',
+    ]
+
+
+def test_publish_log_rotate_keeps_git_clean(tmp_path, capsys):
+    # A existing project, that ignores the log of a old poetry-publish version:
+    Path(tmp_path, '.gitignore').write_text('publish.log\n')
+    git_commit_all(tmp_path)
+    log_path = Path(tmp_path, 'publish.log')
+    log_path.write_text('Unstructured log of a old version\n')
+
+    with publish_log(log_path):  # rotates the old log at once
+        log_event('release_start')
+    assert Path(tmp_path, CACHE_DIR_NAME, 'logs', 'publish.log.1.gz').is_file()
+
+    check_git_clean(ReleaseContext(package_root=tmp_path, version='1.0.0', cwd=tmp_path))
+    out, err = capsys.readouterr()
+    assert out.endswith('OK\n')
@@ -0,0 +1,55 @@
+import subprocess
+from pathlib import Path
+from unittest.mock import patch
+
+from poetry_publish.utils import update_rst_readme
+from poetry_publish.utils.cache import CACHE_DIR_NAME
+
+
+def test_update_rst_readme_cached(capsys, tmp_path):
+    subprocess.check_call(['git', 'init', '--quiet'], cwd=tmp_path)
+    creole_readme_path = Path(tmp_path, 'README.creole')
+    creole_readme_path.write_text('= Title =\n\nHello **World**\n')
+    rest_readme_path = Path(tmp_path, 'README.rst')
+    rest_readme_path.write_text('old\n')
+
+    assert update_rst_readme(package_root=tmp_path) == rest_readme_path
+    assert capsys.readouterr().out == 'Generate README.rst from README.creole...done.\n'
+    assert 'Hello **World**' in rest_readme_path.read_text()
+    assert Path(tmp_path, CACHE_DIR_NAME, 'readme.json').is_file()
+
+    # Unchanged -> python-creole is not called:
+    with patch('creole.setup_utils.update_rst_readme') as creole_update:
+        assert update_rst_readme(package_root=tmp_path) == rest_readme_path
+    creole_update.assert_not_called()
+    assert capsys.readouterr().out == (
+        'Generate README.rst from README.creole...nothing changed (cached), ok.\n'
+    )
+
+    # A other python-creole version:
+    with patch('poetry_publish.utils.readme_cache.get_creole_version', return_value='0.0.1'):
+        update_rst_readme(package_root=tmp_path)
+    assert capsys.readouterr().out == (
+        'Generate README.rst from README.creole...nothing changed, ok.\n'
+    )
+
+    # Changed source:
+    creole_readme_path.write_text('= Title =\n\nHello **Creole**\n')
+    update_rst_readme(package_root=tmp_path)
+    assert capsys.readouterr().out == 'Generate README.rst from README.creole...done.\n'
+    assert 'Hello **Creole**' in rest_readme_path.read_text()
+
+    # Edited README.rst:
+    rest_readme_path.write_text('edited\n')
+    update_rst_readme(package_root=tmp_path)
+    assert capsys.readouterr().out == 'Generate README.rst from README.creole...done.\n'
+    assert 'Hello **Creole**' in rest_readme_path.read_text()
+
+    update_rst_readme(package_root=tmp_path)
+    assert capsys.readouterr().out == (
+        'Generate README.rst from README.creole...nothing changed (cached), ok.\n'
+    )
+
+    # The cache directory doesn't change the git status:
+    output = subprocess.check_output(['git', 'status', '--porcelain'], cwd=tmp_path, text=True)
+    assert output == '?? README.creole\n?? README.rst\n'
@@ -0,0 +1,50 @@
+import subprocess
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from poetry_publish.tests.simulation import create_project
+from poetry_publish.utils.backend_build import build_artifact
+from poetry_publish.utils.cache import CACHE_DIR_NAME
+from poetry_publish.utils.smoke_test import get_top_level_names, smoke_test_wheel
+
+
+def test_get_top_level_names(tmp_path):
+    wheel_path = Path(tmp_path, 'foo-1.0.0-py3-none-any.whl')
+    with zipfile.ZipFile(wheel_path, 'w') as zip_file:
+        for name in (
+            'foo/__init__.py',
+            'foo/bar/__init__.py',
+            'foo_plugin.py',
+            'foo.pth',
+            'foo-1.0.0.dist-info/METADATA',
+            'foo-1.0.0.data/scripts/foo',
+        ):
+            zip_file.writestr(name, '')
+    assert get_top_level_names(wheel_path) == ['foo', 'foo_plugin']
+
+
+def test_smoke_test_wheel(tmp_path):
+    project_path = Path(tmp_path, 'project')
+    project_path.mkdir()
+    create_project(project_path)
+    wheel_path = build_artifact('wheel', project_path, Path(tmp_path, 'dist'))
+
+    result = smoke_test_wheel(wheel_path, base_path=tmp_path)
+    assert result.wheel_name == 'foo-1.2.3-py3-none-any.whl'
+    assert result.packages == ['foo']
+
+    pool_path = Path(tmp_path, CACHE_DIR_NAME, 'venvs')
+    template_path, ready_path = sorted(pool_path.iterdir())
+    assert ready_path.name.startswith(f'{template_path.name}-ready-')
+
+    # The template is unchanged by the install into the clone:
+    assert not list(template_path.glob('lib*/**/site-packages/foo'))
+
+    # A broken package in the next clone of the pool:
+    Path(project_path, 'foo', '__init__.py').write_text('import does_not_exist\n')
+    wheel_path = build_artifact('wheel', project_path, Path(tmp_path, 'dist'))
+    with pytest.raises(subprocess.CalledProcessError):
+        smoke_test_wheel(wheel_path, base_path=tmp_path)
+    assert len(list(pool_path.iterdir())) == 2
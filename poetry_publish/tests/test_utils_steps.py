@@ -0,0 +1,71 @@
+import threading
+
+import pytest
+
+from poetry_publish.utils.steps import Step, run_steps, sort_steps
+
+
+def test_sort_steps():
+    steps = [
+        Step('c', print, requires=('a', 'b')),
+        Step('b', print, requires=('a',)),
+        Step('a', print),
+        Step('d', print),
+    ]
+    assert [step.name for step in sort_steps(steps)] == ['a', 'b', 'c', 'd']
+
+    with pytest.raises(ValueError) as excinfo:
+        sort_steps([Step('a', print, requires=('b',)), Step('b', print, requires=('a',))])
+    assert str(excinfo.value) == "Cyclic step dependencies in: ['a', 'b']"
+
+    with pytest.raises(ValueError) as excinfo:
+        sort_steps([Step('a', print, requires=('foo',))])
+    assert str(excinfo.value) == "Step 'a' requires unknown step 'foo'"
+
+    with pytest.raises(ValueError) as excinfo:
+        sort_steps([Step('a', print), Step('a', print)])
+    assert str(excinfo.value) == "Duplicate step names in: ['a', 'a']"
+
+
+def test_run_steps_serial():
+    calls = []
+    steps = [
+        Step('second', lambda context: calls.append(('second', context)), requires=('first',)),
+        Step('first', lambda context: calls.append(('first', context))),
+    ]
+    run_steps(steps, context='ctx', max_workers=1)
+    assert calls == [('first', 'ctx'), ('second', 'ctx')]
+
+
+def test_run_steps_parallel():
+    # Both independent steps must run at the same time, otherwise the barrier breaks:
+    barrier = threading.Barrier(2, timeout=5)
+    calls = []
+
+    def independent(context):
+        barrier.wait()
+        calls.append('independent')
+
+    steps = [
+        Step('one', independent),
+        Step('two', independent),
+        Step('last', lambda context: calls.append('last'), requires=('one', 'two')),
+    ]
+    run_steps(steps, context=None, max_workers=2)
+    assert calls == ['independent', 'independent', 'last']
+
+
+def test_run_steps_error():
+    calls = []
+
+    def fail(context):
+        raise SystemExit(2)
+
+    steps = [
+        Step('fail', fail),
+        Step('never', lambda context: calls.append('never'), requires=('fail',)),
+    ]
+    with pytest.raises(SystemExit) as excinfo:
+        run_steps(steps, context=None, max_workers=2)
+    assert excinfo.value.code == 2
+    assert calls == []
@@ -1,9 +1,20 @@
+import io
+import os
 import shutil
+import subprocess
 import sys
+import time
+from pathlib import Path
 
 import pytest
 
-from poetry_publish.utils.subprocess_utils import replace_prog, verbose_check_output
+from poetry_publish.utils.subprocess_utils import (
+    check_programs,
+    replace_prog,
+    verbose_check_call,
+    verbose_check_output,
+    verbose_stream_call,
+)
 
 
 def test_replace_prog():
@@ -16,6 +27,33 @@ def test_replace_prog():
     assert str(excinfo.value) == 'Executable "foo" not found in PATH!'
 
 
+def test_replace_prog_venv(tmp_path, monkeypatch):
+    venv_bin_path = Path(tmp_path, 'Scripts' if os.name == 'nt' else 'bin')
+    venv_bin_path.mkdir()
+    twine_path = Path(venv_bin_path, 'twine')
+    twine_path.write_text('#!/bin/sh\n')
+    twine_path.chmod(0o755)
+    monkeypatch.setenv('VIRTUAL_ENV', str(tmp_path))
+
+    # Programs of the virtualenv are used without "poetry run":
+    assert replace_prog(['twine', 'check']) == [str(twine_path), 'check']
+
+    # Other programs are searched in PATH:
+    assert replace_prog(['python']) == [shutil.which('python')]
+
+    # The lookup is cached:
+    twine_path.unlink()
+    assert replace_prog(['twine', 'check']) == [str(twine_path), 'check']
+
+
+def test_check_programs():
+    check_programs('python', 'git')
+
+    with pytest.raises(FileNotFoundError) as excinfo:
+        check_programs('python', 'foo', 'bar')
+    assert str(excinfo.value) == 'Executables not found in PATH: foo, bar'
+
+
 def test_verbose_check_output(capsys):
     call_info, output = verbose_check_output('python', '--version')
     assert call_info == "Call: 'python --version'"
@@ -28,3 +66,56 @@ def test_verbose_check_output(capsys):
     with pytest.raises(FileNotFoundError) as excinfo:
         verbose_check_output('foobar')
     assert str(excinfo.value) == 'Executable "foobar" not found in PATH!'
+
+
+def test_verbose_stream_call(capsys):
+    log = io.StringIO()
+    code = 'for no in range(1000): print(f"line {no}")'
+    call_info, output = verbose_stream_call('python', '-c', code, log=log, tail_lines=2)
+    assert call_info == f"Call: {' '.join(('python', '-c', code))!r}"
+    assert output == 'line 998\nline 999\n'
+
+    lines = ''.join(f'line {no}\n' for no in range(1000))
+    out, err = capsys.readouterr()
+    assert out == f'\t{call_info}\n\n{lines}'
+    assert log.getvalue() == f'{call_info}\n{lines}'
+
+    with pytest.raises(subprocess.CalledProcessError) as excinfo:
+        verbose_stream_call('python', '-c', 'print("Bam!");import sys;sys.exit(3)')
+    assert excinfo.value.returncode == 3
+    assert excinfo.value.output == 'Bam!\n'
+
+
+def test_verbose_stream_call_partial_line(monkeypatch):
+    """
+    A question without a newline must be shown, before the user answers.
+    """
+    writes = []
+
+    class Stdout:
+        def write(self, text):
+            writes.append((time.monotonic(), text))
+
+        def flush(self):
+            pass
+
+    code = (
+        'import sys,time;sys.stdout.write("Username: ");sys.stdout.flush();'
+        'time.sleep(1);print("foo")'
+    )
+    monkeypatch.setattr(sys, 'stdout', Stdout())
+    call_info, output = verbose_stream_call(sys.executable, '-c', code)
+    assert output == 'Username: foo\n'
+
+    output_writes = writes[2:]  # without the call info and its newline
+    assert ''.join(text for _, text in output_writes) == 'Username: foo\n'
+    question_time, question = output_writes[0]
+    assert question == 'Username: '
+    assert output_writes[-1][0] - question_time > 0.5
+
+
+def test_verbose_check_call_timeout():
+    start_time = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        verbose_check_call(sys.executable, '-c', 'import time;time.sleep(30)', timeout=0.5)
+    assert time.monotonic() - start_time < 10
@@ -0,0 +1,44 @@
+import multiprocessing
+import re
+import threading
+import time
+
+import pytest
+
+from poetry_publish.utils.throttle import UploadThrottle
+
+
+def test_upload_throttle(capsys):
+    with multiprocessing.Manager() as manager:
+        with pytest.raises(ValueError):
+            UploadThrottle(manager, name='pypi', max_uploads=0)
+
+        throttle = UploadThrottle(manager, name='pypi', max_uploads=2, interval=0.1)
+        lock = threading.Lock()
+        running = []
+        starts = []
+        max_running = []
+
+        def upload():
+            with throttle.slot() as start:
+                with lock:
+                    starts.append(start)
+                    running.append(1)
+                    max_running.append(len(running))
+                time.sleep(0.3)
+                with lock:
+                    running.pop()
+
+        threads = [threading.Thread(target=upload) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert max(max_running) == 2
+    starts.sort()
+    assert all(b - a > 0.09 for a, b in zip(starts, starts[1:]))
+
+    # The waiting time depends on the start of the threads, e.g.: "Wait 0.1s" or "Wait 0.0s"
+    out, err = capsys.readouterr()
+    assert re.search(r'Wait \d+\.\ds for the next upload to pypi', out)
@@ -0,0 +1,55 @@
+import json
+import pstats
+import sys
+from pathlib import Path
+
+from poetry_publish.utils.steps import Step, run_steps
+from poetry_publish.utils.subprocess_utils import verbose_check_output
+from poetry_publish.utils.timing import print_timings, write_profile, write_report
+
+
+def busy_step(context):
+    verbose_check_output('python', '-c', 'sum(range(1000000))')
+
+
+def test_step_timings(tmp_path, capsys):
+    steps = [
+        Step('busy', busy_step),
+        Step('idle', lambda context: None, requires=('busy',)),
+    ]
+    timings = run_steps(steps, context=None, max_workers=1, profile=True)
+    assert [timing.name for timing in timings] == ['busy', 'idle']
+
+    busy, idle = timings
+    assert busy.ok is True
+    assert busy.wall_time > 0
+    assert [command.call_info for command in busy.commands] == [
+        "Call: 'python -c sum(range(1000000))'"
+    ]
+    if sys.platform != 'win32':
+        assert busy.child_cpu_time > 0
+        assert busy.child_max_rss > 1024 * 1024
+    assert idle.commands == []
+    assert idle.child_cpu_time == 0
+    assert idle.child_max_rss == 0
+
+    print_timings(timings)
+    out, err = capsys.readouterr()
+    assert out.startswith('\nTimings:\n\tstep')
+    assert '\tbusy ' in out
+    assert '\tidle ' in out
+
+    report_path = Path(tmp_path, 'publish.json')
+    write_report(timings, report_path, version='1.2.3')
+    report = json.loads(report_path.read_text())
+    assert report['version'] == '1.2.3'
+    assert [step['name'] for step in report['steps']] == ['busy', 'idle']
+    assert report['steps'][0]['start'] == 0
+    assert report['steps'][0]['commands'][0]['call_info'] == (
+        "Call: 'python -c sum(range(1000000))'"
+    )
+
+    profile_path = Path(tmp_path, 'publish.prof')
+    write_profile(timings, profile_path)
+    stats = pstats.Stats(str(profile_path))
+    assert any(function_name == 'busy_step' for _, _, function_name in stats.stats)
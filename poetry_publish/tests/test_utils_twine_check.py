@@ -1,5 +1,21 @@
-from poetry_publish.utils.subprocess_utils import verbose_check_call
-from poetry_publish.utils.twine_check import _parse_twine_output, run_twine_check
+import sys
+import time
+import types
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from poetry_publish.tests.simulation import SimulatedToolchain, make_wheel
+from poetry_publish.utils.subprocess_utils import verbose_check_call, verbose_iter_output
+from poetry_publish.utils.twine_check import (
+    TwineCheckResult,
+    TwineOutputParser,
+    _parse_twine_output,
+    check_artifacts,
+    iter_check_results,
+    run_twine_check,
+)
 
 
 def test_parse_twine_output():
@@ -19,6 +35,61 @@ def test_parse_twine_output():
     assert checks == [True, False]
 
 
+def test_twine_output_parser():
+    parser = TwineOutputParser()
+    assert parser.feed('Checking dist/foo.whl: \x1b[32mPASS') == []
+    assert parser.feed('ED\x1b[0m\nChecking dist/foo.tar.gz: ') == [
+        TwineCheckResult(filename='dist/foo.whl', status='PASSED')
+    ]
+    assert parser.feed('PASSED with warnings\nWARNING  `long_description_content_type`') == []
+    assert parser.feed('\nChecking dist/bar.whl: FAILED\nERROR    `long_description` has') == [
+        TwineCheckResult(
+            filename='dist/foo.tar.gz',
+            status='WARNING',
+            messages=['WARNING  `long_description_content_type`'],
+        )
+    ]
+    assert parser.feed(' syntax errors\n         line 4: Warning: foo\n') == []
+    assert parser.close() == [
+        TwineCheckResult(
+            filename='dist/bar.whl',
+            status='FAILED',
+            messages=['ERROR    `long_description` has syntax errors', 'line 4: Warning: foo'],
+        )
+    ]
+
+    parser = TwineOutputParser()
+    assert parser.feed('ERROR    No files to check.\n') == [
+        TwineCheckResult(filename='', status='FAILED', messages=['ERROR    No files to check.'])
+    ]
+
+
+def test_twine_check_fail_fast():
+    script = (
+        'import time\n'
+        'print("Checking dist/broken.whl: FAILED")\n'
+        'print("ERROR    `long_description` has syntax errors")\n'
+        'print("Checking dist/slow.whl: ", end="")\n'
+        'time.sleep(30)\n'
+        'print("PASSED")\n'
+    )
+    start_time = time.monotonic()
+    output = verbose_iter_output(sys.executable, '-c', script)
+    try:
+        results = list(iter_check_results(output, fail_fast=True))
+    finally:
+        output.close()
+    assert time.monotonic() - start_time < 10
+
+    assert results == [
+        TwineCheckResult(
+            filename='dist/broken.whl',
+            status='FAILED',
+            messages=['ERROR    `long_description` has syntax errors'],
+        )
+    ]
+
+
 def test_run_twine_check(capsys):
     verbose_check_call('poetry', 'build')
 
@@ -31,3 +102,75 @@ def test_run_twine_check(capsys):
     assert out.endswith('OK\n')
 
     assert ok is True
+
+
+def test_check_artifacts(tmp_path):
+    ok_path = make_wheel(tmp_path, 'ok', 'Headline\n========\n\nText\n')
+    broken_path = make_wheel(tmp_path, 'broken', 'Headline\n========\n\n`broken markup\n')
+    Path(tmp_path, 'no_artifact.txt').touch()
+
+    results = check_artifacts(tmp_path)
+    assert [(result.filename, result.status) for result in results] == [
+        (str(broken_path), 'FAILED'),
+        (str(ok_path), 'PASSED'),
+    ]
+    assert results[0].ok is False
+    assert results[0].messages == [
+        'line 4: Warning: Inline interpreted text or phrase reference start-string'
+        ' without end-string.'
+    ]
+    assert results[1].ok is True
+    assert results[1].messages == []
+
+
+def test_run_twine_check_in_process(tmp_path, capsys):
+    dist_path = Path(tmp_path, 'dist')
+    dist_path.mkdir()
+    ok_path = make_wheel(dist_path, 'ok', 'Headline\n========\n\nText\n')
+
+    assert run_twine_check(cwd=tmp_path, in_process=True) is True
+    out, err = capsys.readouterr()
+    assert out == f'\nRun "twine check":\n\tChecking {ok_path}: PASSED\nOK\n'
+
+    broken_path = make_wheel(dist_path, 'broken', 'Headline\n========\n\n`broken markup\n')
+    with patch('poetry_publish.utils.twine_check.confirm') as confirm:
+        run_twine_check(cwd=tmp_path, in_process=True)
+    confirm.assert_called_once_with('Twine check failed!')
+    out, err = capsys.readouterr()
+    assert f'Checking {ok_path}: PASSED' in out  # all artifacts are checked
+
+    # Never offer to publish the artifacts, that are not checked:
+    with patch('poetry_publish.utils.twine_check.confirm') as confirm:
+        with pytest.raises(SystemExit) as exit:
+            run_twine_check(cwd=tmp_path, in_process=True, fail_fast=True)
+    assert exit.value.code == 12
+    confirm.assert_not_called()
+    out, err = capsys.readouterr()
+    assert f'ERROR: Checking {broken_path}: FAILED' in out
+    assert 'ERROR: Twine check failed! (Not all artifacts are checked)' in out
+
+
+def test_run_twine_check_without_twine_api(tmp_path, capsys):
+    # e.g.: a new twine version without the internal functions:
+    toolchain = SimulatedToolchain(
+        outputs={'/fake/bin/twine check dist/*.*': 'Checking dist/foo.whl: PASSED'}
+    )
+    with patch.dict(
+        sys.modules, {'twine.commands.check': types.ModuleType('twine.commands.check')}
+    ), toolchain:
+        assert run_twine_check(cwd=tmp_path, in_process=True) is True
+    assert toolchain.outputs == {}
+
+    out, err = capsys.readouterr()
+    assert 'The twine API is not available, fallback and call "twine check"' in out
+    assert '\tChecking dist/foo.whl: PASSED\nOK\n' in out
+
+
+def test_check_artifacts_fail_fast(tmp_path):
+    broken_path = make_wheel(tmp_path, 'broken', 'Headline\n========\n\n`broken markup\n')
+    make_wheel(tmp_path, 'ok', 'Headline\n========\n\nText\n')
+
+    results = check_artifacts(tmp_path, max_workers=1, fail_fast=True)
+    assert [(result.filename, result.status) for result in results] == [
+        (str(broken_path), 'FAILED'),
+    ]
@@ -0,0 +1,139 @@
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from poetry_publish.tests.simulation import make_wheel
+from poetry_publish.utils.manifest import hash_file
+from poetry_publish.utils.upload import get_credentials, upload_artifacts
+
+
+class IndexHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for the legacy upload API of a package index.
+    """
+
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        filename = re.search(rb'filename="([^"]+)"', body).group(1).decode()
+
+        server = self.server
+        if filename in server.hang:
+            time.sleep(2)  # A index that accepts the connection, but never answers
+            return
+        with server.lock:
+            server.connections.add(self.client_address)
+            errors = server.errors.get(filename)
+            status = errors.pop(0) if errors else 200
+            if status == 200:
+                assert b'file_upload' in body
+                server.uploads.append(filename)
+                md5_digest = re.search(rb'name="md5_digest"\r\n\r\n([0-9a-f]+)', body)
+                if md5_digest:
+                    server.md5_digests.append(md5_digest.group(1).decode())
+
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def index_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), IndexHandler)
+    server.lock = threading.Lock()
+    server.connections = set()
+    server.uploads = []
+    server.md5_digests = []
+    server.errors = {}  # filename -> list of HTTP status codes for the next requests
+    server.hang = set()  # filenames of requests without a response
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_upload_artifacts(tmp_path, index_server):
+    for name in ('foo', 'bar', 'baz'):
+        make_wheel(tmp_path, name, 'Text\n')
+    index_server.errors['bar-1.0-py3-none-any.whl'] = [503]  # fails only once
+    index_server.errors['baz-1.0-py3-none-any.whl'] = [400]  # e.g. file exists
+
+    results = upload_artifacts(
+        tmp_path,
+        repository_url=f'http://127.0.0.1:{index_server.server_port}/legacy/',
+        max_workers=2,
+        backoff=0,
+    )
+    assert [(result.filename, result.ok, result.attempts, result.error) for result in results] == [
+        ('bar-1.0-py3-none-any.whl', True, 2, None),
+        ('baz-1.0-py3-none-any.whl', False, 1, '400 Bad Request'),
+        ('foo-1.0-py3-none-any.whl', True, 1, None),
+    ]
+    assert sorted(index_server.uploads) == ['bar-1.0-py3-none-any.whl', 'foo-1.0-py3-none-any.whl']
+
+    # All requests used the pool of keep-alive connections:
+    assert len(index_server.connections) <= 2
+
+    result = results[0]
+    assert result.size == Path(tmp_path, 'bar-1.0-py3-none-any.whl').stat().st_size
+    assert result.throughput > 0
+
+
+def test_upload_artifacts_from_manifest(tmp_path, index_server):
+    make_wheel(tmp_path, 'foo', 'Text\n')
+    bar_path = make_wheel(tmp_path, 'bar', 'Text\n')
+    make_wheel(tmp_path, 'not_in_manifest', 'Text\n')
+    artifacts = [hash_file(bar_path), hash_file(Path(tmp_path, 'foo-1.0-py3-none-any.whl'))]
+    make_wheel(tmp_path, 'bar', 'Changed after the build\n')
+
+    results = upload_artifacts(
+        tmp_path,
+        repository_url=f'http://127.0.0.1:{index_server.server_port}/legacy/',
+        backoff=0,
+        artifacts=artifacts,
+    )
+    assert [(result.filename, result.ok, result.attempts) for result in results] == [
+        ('bar-1.0-py3-none-any.whl', False, 0),
+        ('foo-1.0-py3-none-any.whl', True, 1),
+    ]
+    assert results[0].error == f'{bar_path} was changed after the build!'
+    assert index_server.uploads == ['foo-1.0-py3-none-any.whl']
+    assert index_server.md5_digests == [artifacts[1].md5]
+
+
+def test_upload_artifacts_timeout(tmp_path, index_server):
+    make_wheel(tmp_path, 'foo', 'Text\n')
+    index_server.hang.add('foo-1.0-py3-none-any.whl')
+
+    start_time = time.monotonic()
+    (result,) = upload_artifacts(
+        tmp_path,
+        repository_url=f'http://127.0.0.1:{index_server.server_port}/legacy/',
+        retries=1,
+        backoff=0,
+        timeout=(1, 0.2),
+    )
+    assert time.monotonic() - start_time < 1.5
+    assert result.ok is False
+    assert result.attempts == 2  # a timeout is retried
+    assert 'ReadTimeout' in result.error
+
+
+def test_get_credentials(monkeypatch):
+    assert get_credentials('test-pypi') == (None, None)
+
+    monkeypatch.setenv('POETRY_HTTP_BASIC_TEST_PYPI_USERNAME', 'user')
+    monkeypatch.setenv('POETRY_HTTP_BASIC_TEST_PYPI_PASSWORD', 'secret')
+    assert get_credentials('test-pypi') == ('user', 'secret')
+
+    monkeypatch.setenv('POETRY_PYPI_TOKEN_TEST_PYPI', 'pypi-token')
+    assert get_credentials('test-pypi') == ('__token__', 'pypi-token')
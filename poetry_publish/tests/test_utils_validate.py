@@ -0,0 +1,78 @@
+import io
+import tarfile
+import zipfile
+from pathlib import Path
+
+from poetry_publish.tests.simulation import create_project
+from poetry_publish.utils.backend_build import build_artifacts
+from poetry_publish.utils.validate import validate_artifacts
+
+
+def build(tmp_path):
+    project_path = Path(tmp_path, 'project')
+    project_path.mkdir()
+    create_project(project_path)
+    dist_path = Path(tmp_path, 'dist')
+    build_artifacts(project_path, dist_path)
+    return dist_path
+
+
+def test_validate_artifacts(tmp_path):
+    dist_path = build(tmp_path)
+
+    results = validate_artifacts(dist_path, version='1.2.3')
+    assert [(result.name, result.ok, result.warnings) for result in results] == [
+        ('foo-1.2.3-py3-none-any.whl', True, []),
+        ('foo-1.2.3.tar.gz', True, []),
+    ]
+    assert [result.files for result in results] == [4, 3]
+
+    results = validate_artifacts(dist_path, version='1.2.4')
+    assert [result.errors for result in results] == [
+        ["Version in the metadata is '1.2.3', not '1.2.4'"],
+        ["Version in the metadata is '1.2.3', not '1.2.4'"],
+    ]
+
+    results = validate_artifacts(dist_path, version='1.2.3', large_file_size=1000)
+    assert [result.warnings for result in results] == [
+        ['Large file: foo/__init__.py (0.1 MiB)'],
+        ['Large file: foo/__init__.py (0.1 MiB)'],
+    ]
+
+
+def test_validate_changed_artifacts(tmp_path):
+    dist_path = build(tmp_path)
+
+    # Change a file of the wheel and add files, that are not in the RECORD:
+    wheel_path = Path(dist_path, 'foo-1.2.3-py3-none-any.whl')
+    with zipfile.ZipFile(wheel_path) as zip_file:
+        files = {name: zip_file.read(name) for name in zip_file.namelist()}
+    files['foo/__init__.py'] = b'changed'
+    files['build/lib/foo.py'] = b''
+    with zipfile.ZipFile(wheel_path, 'w') as zip_file:
+        for name, content in files.items():
+            zip_file.writestr(name, content)
+
+    # Add a file of a old build to the sdist:
+    sdist_path = Path(dist_path, 'foo-1.2.3.tar.gz')
+    with tarfile.open(sdist_path) as tar_file:
+        members = [(member, tar_file.extractfile(member).read()) for member in tar_file]
+    build_path = Path(tmp_path, 'foo.py')
+    build_path.write_text('')
+    with tarfile.open(sdist_path, 'w:gz') as tar_file:
+        for member, content in members:
+            tar_file.addfile(member, io.BytesIO(content))
+        tar_file.add(build_path, arcname='foo-1.2.3/build/lib/foo.py')
+
+    wheel_result, sdist_result = validate_artifacts(dist_path, version='1.2.3')
+    assert wheel_result.errors == [
+        'Wrong hash in RECORD: foo/__init__.py',
+        'Not in RECORD: build/lib/foo.py',
+    ]
+    assert wheel_result.warnings == ['File from a "build" directory: build/lib/foo.py']
+    assert sdist_result.ok is True
+    assert sdist_result.warnings == ['File from a "build" directory: build/lib/foo.py']
+
+    wheel_path.write_bytes(b'broken')
+    wheel_result, sdist_result = validate_artifacts(dist_path, version='1.2.3')
+    assert wheel_result.errors == ['Broken archive: File is not a zip file']
@@ -0,0 +1,85 @@
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from poetry_publish.utils.steps import Step, run_steps, set_timeouts
+from poetry_publish.utils.subprocess_utils import verbose_check_call, verbose_check_output
+from poetry_publish.utils.timing import print_timings
+from poetry_publish.utils.watchdog import StepTimeoutError
+
+
+def process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='process groups are POSIX only')
+def test_step_timeout_kills_process_tree(tmp_path, capsys):
+    pid_path = Path(tmp_path, 'grandchild.pid')
+    script = (
+        'import subprocess, sys, time\n'
+        'grandchild = subprocess.Popen([sys.executable, "-c", "import time;time.sleep(60)"])\n'
+        f'open({str(pid_path)!r}, "w").write(str(grandchild.pid))\n'
+        'time.sleep(60)\n'
+    )
+
+    def hanging_step(context):
+        verbose_check_output('python', '-c', script)
+
+    steps = set_timeouts([Step('fast', print), Step('hanging', hanging_step)], {'hanging': 1})
+    assert [step.timeout for step in steps] == [None, 1]
+
+    timings = []
+    start_time = time.monotonic()
+    with patch('poetry_publish.utils.subprocess_utils._stdin_is_tty', return_value=False):
+        with pytest.raises(StepTimeoutError) as excinfo:
+            run_steps(steps, context='ctx', max_workers=1, timings=timings)
+    assert time.monotonic() - start_time < 10
+
+    err = excinfo.value
+    assert err.step_name == 'hanging'
+    assert err.timeout == 1
+    assert err.elapsed >= 1
+    assert str(err).startswith("Step 'hanging' timed out after 1.")
+    assert err.call_info.startswith("Call: 'python -c import subprocess")
+    assert f'(deadline: 1s), killed: {err.call_info}' in str(err)
+
+    # The child started a grandchild: it's killed, too.
+    grandchild_pid = int(pid_path.read_text())
+    for _ in range(50):
+        if not process_exists(grandchild_pid):
+            break
+        time.sleep(0.1)
+    else:
+        pytest.fail('The grandchild process is still running')
+
+    fast, hanging = timings
+    assert fast.ok is True
+    assert fast.timed_out is False
+    assert hanging.ok is False
+    assert hanging.timed_out is True
+
+    capsys.readouterr()
+    print_timings(timings)
+    out, err = capsys.readouterr()
+    assert ' ERROR' not in out
+    assert 'TIMEOUT (deadline: 1s)' in out
+
+
+def test_command_timeout_without_step():
+    with pytest.raises(subprocess.TimeoutExpired):
+        verbose_check_call(sys.executable, '-c', 'import time;time.sleep(30)', timeout=0.5)
+
+
+def test_set_timeouts_unknown_step():
+    with pytest.raises(ValueError) as excinfo:
+        set_timeouts([Step('a', print)], {'foo': 1})
+    assert str(excinfo.value) == "Timeout for unknown step 'foo'"
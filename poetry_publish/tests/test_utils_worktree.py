@@ -0,0 +1,156 @@
+import errno
+import os
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+from poetry_publish.publish import (
+    ReleaseContext,
+    get_dist_dir_args,
+    poetry_build,
+    twine_check,
+    validate_archives,
+    write_release_manifest,
+)
+from poetry_publish.tests.simulation import create_project, git_commit_all
+from poetry_publish.utils import worktree
+from poetry_publish.utils.cache import CACHE_DIR_NAME
+from poetry_publish.utils.worktree import (
+    collect_artifacts,
+    get_scratch_dir,
+    git_worktree,
+    link_or_copy,
+)
+
+
+def test_git_worktree(tmp_path):
+    repo_path = Path(tmp_path, 'repo')
+    repo_path.mkdir()
+    Path(repo_path, 'committed.txt').write_text('committed')
+    git_commit_all(repo_path)
+    Path(repo_path, 'untracked.txt').write_text('untracked')
+
+    scratch_path = Path(tmp_path, 'scratch')
+    scratch_path.mkdir()
+    with git_worktree(cwd=repo_path, scratch_dir=scratch_path) as worktree_path:
+        assert worktree_path.parent == scratch_path
+        assert sorted(path.name for path in worktree_path.iterdir()) == ['.git', 'committed.txt']
+
+    assert not worktree_path.exists()
+    output = subprocess.check_output(['git', 'worktree', 'list'], cwd=repo_path, text=True)
+    assert len(output.splitlines()) == 1
+
+
+def test_link_or_copy(tmp_path, monkeypatch):
+    src = Path(tmp_path, 'foo-1.0.0.tar.gz')
+    src.write_bytes(b'sdist')
+
+    paths = collect_artifacts(tmp_path, Path(tmp_path, 'dist'))
+    assert paths == [Path(tmp_path, 'dist', 'foo-1.0.0.tar.gz')]
+    assert paths[0].stat().st_ino == src.stat().st_ino  # hard-linked
+
+    def cross_device_link(src, dst):
+        raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+
+    monkeypatch.setattr(os, 'link', cross_device_link)
+    dst = Path(tmp_path, 'copy.tar.gz')
+    link_or_copy(src, dst)
+    assert dst.read_bytes() == b'sdist'
+    assert dst.stat().st_ino != src.stat().st_ino
+
+
+def test_build_in_worktree(tmp_path):
+    project_path = Path(tmp_path, 'project')
+    project_path.mkdir()
+    create_project(project_path)
+    git_commit_all(project_path)
+    Path(project_path, 'build').mkdir()  # e.g.: from a other build
+
+    context = ReleaseContext(
+        package_root=project_path,
+        version='1.2.3',
+        log_filename=str(Path(tmp_path, 'publish.log')),
+        cwd=project_path,
+        build_in_process=True,
+        build_in_worktree=True,
+        scratch_dir=tmp_path,
+    )
+    poetry_build(context)
+
+    assert [artifact.name for artifact in context.artifacts] == [
+        'foo-1.2.3-py3-none-any.whl',
+        'foo-1.2.3.tar.gz',
+    ]
+    assert sorted(path.name for path in project_path.iterdir()) == [
+        '.git',
+        '.poetry_publish_cache',
+        'build',  # untouched
+        'dist',
+        'foo',
+        'pyproject.toml',
+    ]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['project']  # worktree removed
+
+
+def test_get_scratch_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(worktree, 'SHM_PATH', tmp_path)
+    assert get_scratch_dir(min_free=0) == tmp_path
+
+    # e.g.: a container with a 64 MiB tmpfs:
+    usage = shutil.disk_usage(tmp_path)._replace(free=64 * 1024 * 1024)
+    monkeypatch.setattr(shutil, 'disk_usage', lambda path: usage)
+    assert get_scratch_dir() == Path(tempfile.gettempdir())
+    assert get_scratch_dir(min_free=usage.free) == tmp_path
+
+
+def test_build_in_worktree_output_dir(tmp_path):
+    project_path = Path(tmp_path, 'project')
+    project_path.mkdir()
+    create_project(project_path)
+    git_commit_all(project_path)
+    output_path = Path(tmp_path, 'output')
+
+    context = ReleaseContext(
+        package_root=project_path,
+        version='1.2.3',
+        log_filename=str(Path(tmp_path, 'publish.log')),
+        cwd=project_path,
+        twine_in_process=True,
+        build_in_process=True,
+        build_in_worktree=True,
+        scratch_dir=tmp_path,
+        output_dir=output_path,
+        validate_archives=True,
+    )
+    assert context.dist_dir == str(Path(output_path, 'dist').resolve())
+    assert get_dist_dir_args(context) == [f'--dist-dir={context.dist_dir}']
+
+    poetry_build(context)
+    write_release_manifest(context)
+    validate_archives(context)
+    twine_check(context)
+
+    # The checkout is untouched, all artifacts and the state are in the output directory:
+    assert sorted(path.name for path in project_path.iterdir()) == [
+        '.git',
+        'foo',
+        'pyproject.toml',
+    ]
+    assert sorted(path.name for path in Path(output_path, 'dist').iterdir()) == [
+        'foo-1.2.3-py3-none-any.whl',
+        'foo-1.2.3.tar.gz',
+    ]
+    assert sorted(path.name for path in Path(output_path, CACHE_DIR_NAME).iterdir()) == [
+        '.gitignore',
+        'build.json',
+        'manifest.json',
+    ]
+
+    context.artifacts = None
+    poetry_build(context)  # cached
+    assert len(context.artifacts) == 2
+
+    context = ReleaseContext(package_root=project_path, version='1.2.3', cwd=project_path)
+    assert context.dist_dir == 'dist'
+    assert get_dist_dir_args(context) == []
@@ -1,6 +1,42 @@
-try:
-    from creole.setup_utils import update_rst_readme
-except ModuleNotFoundError:
-    def update_rst_readme():
+from pathlib import Path
+
+
+def update_rst_readme(package_root, filename='README.creole'):
+    """
+    Generate README.rst from README.creole with python-creole.
+    python-creole is imported here, so it's only loaded if it's really needed.
+
+    The conversion is skipped, if README.creole, the python-creole version
+    and the generated README.rst are unchanged since the last call.
+    """
+    from poetry_publish.utils.readme_cache import (
+        get_creole_version,
+        get_readme_key,
+        is_readme_cached,
+        store_readme,
+    )
+
+    creole_readme_path = Path(package_root, filename)
+    rest_readme_path = creole_readme_path.with_suffix('.rst')
+    creole_version = get_creole_version()
+    if creole_version is not None and creole_readme_path.is_file():
+        key = get_readme_key(creole_readme_path, creole_version)
+        if is_readme_cached(package_root, key, rest_readme_path):
+            print(
+                f'Generate {rest_readme_path.name} from {creole_readme_path.name}'
+                '...nothing changed (cached), ok.'
+            )
+            return rest_readme_path
+    else:
+        key = None
+
+    try:
+        from creole.setup_utils import update_rst_readme
+    except ModuleNotFoundError:
         # no-op, just print a warning
         print("WARNING: python-creole package is not installed.")
+    else:
+        rest_readme_path = update_rst_readme(package_root=package_root, filename=filename)
+        if key is not None:
+            store_readme(package_root, key, rest_readme_path)
+        return rest_readme_path
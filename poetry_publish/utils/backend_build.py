@@ -0,0 +1,100 @@
+"""
+    Build sdist and wheel in this process, with the poetry-core builders
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    "poetry build" creates the sdist and then the wheel, one after the other.
+    Here both archives are built at the same time in two threads: zlib releases
+    the GIL while compressing, so the compression of both archives runs on two cores.
+
+    poetry-core compresses the wheel with zlib level 6 and the sdist with level 9.
+    A other `compression_level` (0-9) trades the archive size for the build speed.
+"""
+
+import functools
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from gzip import GzipFile
+from pathlib import Path
+
+
+FORMATS = ('sdist', 'wheel')
+
+
+class _LevelZipFile(zipfile.ZipFile):
+    """
+    poetry-core adds all files to the wheel as ZipInfo objects: They are always
+    compressed with the zlib default level, so the level must be set per file.
+    """
+
+    def writestr(self, zinfo_or_arcname, data, compress_type=None, compresslevel=None):
+        if compresslevel is None:
+            compresslevel = self.compresslevel
+        super().writestr(zinfo_or_arcname, data, compress_type, compresslevel)
+
+
+class _ZipFileModule:
+    """
+    Stands in for the "zipfile" module of the wheel builder
+    """
+
+    def __init__(self, compression_level):
+        self.ZipFile = functools.partial(_LevelZipFile, compresslevel=compression_level)
+
+    def __getattr__(self, name):
+        return getattr(zipfile, name)
+
+
+@contextmanager
+def _patch(module, name, value):
+    old_value = getattr(module, name)
+    setattr(module, name, value)
+    try:
+        yield
+    finally:
+        setattr(module, name, old_value)
+
+
+def _compression_level(builder_module, fmt, compression_level):
+    if fmt == 'sdist':
+        return _patch(
+            builder_module,
+            'GzipFile',
+            functools.partial(GzipFile, compresslevel=compression_level),
+        )
+    return _patch(builder_module, 'zipfile', _ZipFileModule(compression_level))
+
+
+def build_artifact(fmt, package_root, target_dir, compression_level=None):
+    """
+    Build the sdist or the wheel of the poetry project in `package_root`
+    and returns the path of the archive.
+    """
+    from poetry.core.factory import Factory
+    from poetry.core.masonry.builders import sdist, wheel
+
+    builder_module = sdist if fmt == 'sdist' else wheel
+    builder_class = sdist.SdistBuilder if fmt == 'sdist' else wheel.WheelBuilder
+
+    poetry = Factory().create_poetry(Path(package_root))  # not shared between the threads
+    builder = builder_class(poetry)
+    if compression_level is None:
+        return Path(builder.build(Path(target_dir)))
+
+    with _compression_level(builder_module, fmt, compression_level):
+        return Path(builder.build(Path(target_dir)))
+
+
+def build_artifacts(package_root, target_dir, compression_level=None, formats=FORMATS):
+    """
+    Build sdist and wheel concurrently and returns the paths of the archives.
+    """
+    if compression_level is not None and not 0 <= compression_level <= 9:
+        raise ValueError(f'Compression level must be between 0 and 9, not: {compression_level!r}')
+
+    with ThreadPoolExecutor(max_workers=len(formats)) as executor:
+        futures = [
+            executor.submit(build_artifact, fmt, package_root, target_dir, compression_level)
+            for fmt in formats
+        ]
+        return [future.result() for future in futures]
@@ -0,0 +1,173 @@
+"""
+    Skip "poetry build" if the sources, the version and the build settings are unchanged
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    The cache key is a hash of the version, the build settings (incl. the version of the
+    build backend) and the blob hashes of all files that git tracks. So the tracked sources
+    must not be read, but the git repository must be clean!
+    Only the files of the `include` setting in "pyproject.toml" that git doesn't track
+    (e.g.: generated assets) are read and hashed.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+from poetry_publish.utils.cache import CACHE_DIR_NAME, get_cache_dir
+from poetry_publish.utils.manifest import hash_artifacts, hash_file
+from poetry_publish.utils.subprocess_utils import verbose_check_output, which
+
+
+CACHE_FILENAME = 'build.json'
+
+
+# Distributions that are used by "poetry build":
+BACKEND_DISTRIBUTIONS = ('poetry', 'poetry-core')
+
+
+def get_site_packages(prog_path):
+    """
+    Returns the "site-packages" directories of the Python environment of a installed
+    program, e.g.: "~/.local/pipx/venvs/poetry/bin/poetry" -> the pipx virtualenv.
+    The environment is the one of the interpreter in the "#!" line of the program.
+    """
+    try:
+        with Path(prog_path).open('rb') as f:
+            first_line = f.readline(1024)
+    except OSError:
+        return []
+    if not first_line.startswith(b'#!'):
+        return []
+    interpreter = Path(first_line[2:].decode(errors='replace').strip().split(' ')[0])
+    if not interpreter.name.startswith('python'):
+        return []  # e.g.: the bash script of a pyenv shim
+    prefix = interpreter.parent.parent
+    return sorted(prefix.glob('lib/python*/site-packages'))
+
+
+def get_distribution_versions(paths, names):
+    """
+    Returns "<name> <version>" of all installed distributions `names` in `paths`
+    """
+    from importlib import metadata
+
+    versions = {}
+    for distribution in metadata.distributions(path=[str(path) for path in paths]):
+        name = (distribution.metadata['Name'] or '').lower().replace('_', '-')
+        if name in names:
+            versions.setdefault(name, f'{name} {distribution.version}')
+    return [versions[name] for name in names if name in versions]
+
+
+def get_backend_version(build_in_process=False):
+    """
+    Identify the build backend: A upgrade must change the cache key.
+
+    For "poetry build" the installed versions of poetry and poetry-core are read from
+    the environment of the poetry program, without calling it (that's too slow).
+    Only if that's not possible, e.g.: poetry is called via a pyenv shim,
+    "poetry --version" is called.
+    """
+    if build_in_process:
+        import poetry.core
+
+        return f'poetry-core {poetry.core.__version__}'
+
+    prog_path = which('poetry')
+    if not prog_path:
+        return 'poetry'
+    versions = get_distribution_versions(
+        get_site_packages(Path(prog_path).resolve()), names=BACKEND_DISTRIBUTIONS
+    )
+    if versions and versions[0].startswith('poetry '):
+        return ', '.join(versions)
+
+    call_info, output = verbose_check_output('poetry', '--version')
+    return output.strip()
+
+
+def load_pyproject(package_root):
+    try:
+        import tomllib
+    except ImportError:  # Python < 3.11
+        import tomli as tomllib
+
+    with Path(package_root, 'pyproject.toml').open('rb') as f:
+        return tomllib.load(f)
+
+
+def get_include_files(package_root):
+    """
+    Returns the relative paths of all files that match the `include` patterns
+    of the [tool.poetry] section, e.g.: include = ['CHANGELOG.md', 'foo/static/**/*']
+    """
+    try:
+        pyproject = load_pyproject(package_root)
+    except FileNotFoundError:
+        return []
+
+    package_root = Path(package_root)
+    paths = set()
+    for include in pyproject.get('tool', {}).get('poetry', {}).get('include', []):
+        pattern = include['path'] if isinstance(include, dict) else include
+        for path in package_root.glob(pattern):
+            if path.is_dir():
+                paths.update(sub_path for sub_path in path.rglob('*') if sub_path.is_file())
+            elif path.is_file():
+                paths.add(path)
+    return sorted(path.relative_to(package_root).as_posix() for path in paths)
+
+
+def get_build_key(version, cwd=None, options=None):
+    """
+    `options` are the build settings, e.g.: {'build_in_process': True, 'compression_level': 1}
+    """
+    call_info, output = verbose_check_output('git', 'ls-files', '--stage', '-z', cwd=cwd)
+    key = hashlib.sha256()
+    key.update(f'{version}\0'.encode())
+    key.update(f'{json.dumps(options or {}, sort_keys=True)}\0'.encode())
+    key.update(output.encode())
+
+    # e.g.: "100644 <blob hash> 0\tfoo/__init__.py"
+    tracked = {entry.split('\t', 1)[1] for entry in output.split('\0') if '\t' in entry}
+    package_root = Path(cwd or '.')
+    for name in get_include_files(package_root):
+        if name not in tracked:
+            key.update(f'{name}\0{hash_file(Path(package_root, name)).sha256}\0'.encode())
+    return key.hexdigest()
+
+
+def get_cached_build(base_path, key):
+    """
+    Returns the ArtifactDigests of "dist", if the artifacts are built from the same sources
+    and still unchanged. Otherwise None.
+    """
+    cache_path = Path(base_path, CACHE_DIR_NAME, CACHE_FILENAME)
+    try:
+        record = json.loads(cache_path.read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+    if record.get('key') != key or not record.get('artifacts'):
+        return None
+
+    artifacts = hash_artifacts(Path(base_path, 'dist'))
+    if {artifact.name: artifact.sha256 for artifact in artifacts} != record['artifacts']:
+        return None
+    return artifacts
+
+
+def store_build(base_path, key, artifacts=None):
+    """
+    Store the build key with the digests of the artifacts.
+    Pass the ArtifactDigests, if they are known, to avoid reading the artifacts again.
+    """
+    if artifacts is None:
+        artifacts = hash_artifacts(Path(base_path, 'dist'))
+    if artifacts:
+        cache_path = Path(get_cache_dir(base_path), CACHE_FILENAME)
+        record = {
+            'key': key,
+            'artifacts': {artifact.name: artifact.sha256 for artifact in artifacts},
+        }
+        cache_path.write_text(json.dumps(record, indent=4))
@@ -0,0 +1,19 @@
+from pathlib import Path
+
+
+CACHE_DIR_NAME = '.poetry_publish_cache'
+
+
+def get_cache_dir(base_path):
+    """
+    Returns the project-local cache directory and create it, if not exists.
+
+    The directory contains a .gitignore, so it never makes the git repository "unclean".
+    """
+    cache_dir = Path(base_path, CACHE_DIR_NAME)
+    if not cache_dir.is_dir():
+        cache_dir.mkdir(parents=True)
+        Path(cache_dir, '.gitignore').write_text(
+            '# Created by poetry-publish, automatically.\n*\n'
+        )
+    return cache_dir
@@ -1,7 +1,45 @@
 import sys
+import threading
+
+
+# Release steps may run in parallel: Never ask more than one question at the same time.
+_CONFIRM_LOCK = threading.Lock()
+
+_INTERACTIVE = True
+
+# Set by the first "No": The other running steps abort without a new question.
+_ABORTED = threading.Event()
+
+
+def set_interactive(interactive):
+    """
+    Non-interactive runs (e.g. in worker processes) abort instead of asking the user.
+    """
+    global _INTERACTIVE
+    _INTERACTIVE = interactive
+
+
+def reset_abort():
+    """
+    A new release starts: Ask again, after a abort of a earlier release in this process.
+    """
+    _ABORTED.clear()
+
+
+def abort():
+    _ABORTED.set()
+    sys.exit(-1)
 
 
 def confirm(txt):
-    if input(f'\n{txt}\nPublish anyhow? (Y/N)').lower() not in ('y', 'j'):
-        print('Bye.')
-        sys.exit(-1)
+    with _CONFIRM_LOCK:
+        if _ABORTED.is_set():
+            sys.exit(-1)
+
+        if not _INTERACTIVE:
+            print(f'\n{txt}\nNon-interactive run -> abort.')
+            abort()
+
+        if input(f'\n{txt}\nPublish anyhow? (Y/N)').lower() not in ('y', 'j'):
+            print('Bye.')
+            abort()
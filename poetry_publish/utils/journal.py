@@ -0,0 +1,69 @@
+"""
+    Checkpoint journal of a release
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Every finished release step is recorded in the project-local cache directory.
+    The journal is only valid for the same version and the same git commit:
+    A interrupted release can be resumed, without e.g.: a second upload.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+from poetry_publish.utils.cache import CACHE_DIR_NAME, get_cache_dir
+
+
+JOURNAL_FILENAME = 'release.json'
+
+
+class ReleaseJournal:
+    def __init__(self, base_path, version, commit):
+        self.base_path = Path(base_path)
+        self.key = {'version': version, 'commit': commit}
+        self.done = []
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return Path(self.base_path, CACHE_DIR_NAME, JOURNAL_FILENAME)
+
+    def load(self):
+        """
+        Load the done steps of a interrupted run of the same release.
+        Returns True, if there is something to resume.
+        """
+        try:
+            record = json.loads(self.path.read_text())
+        except (FileNotFoundError, ValueError):
+            return False
+
+        if record.get('key') != self.key:
+            return False
+
+        self.done = list(record.get('done', []))
+        return bool(self.done)
+
+    def is_done(self, step_name):
+        return step_name in self.done
+
+    def mark_done(self, step_name):
+        with self._lock:
+            self.done.append(step_name)
+            cache_dir = get_cache_dir(self.base_path)
+            # Write a new file and replace the old one: a crash never leaves a broken journal
+            temp_path = Path(cache_dir, f'{JOURNAL_FILENAME}.tmp')
+            temp_path.write_text(json.dumps({'key': self.key, 'done': self.done}, indent=4))
+            os.replace(temp_path, self.path)
+
+    def remove(self):
+        """
+        The release is complete: Nothing to resume.
+        """
+        with self._lock:
+            self.done = []
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
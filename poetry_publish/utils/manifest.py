@@ -0,0 +1,97 @@
+"""
+    Release manifest: What was built?
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Every artifact is read only once: sha256, blake2b and md5 digests are computed
+    in the same pass, with a large reused buffer. The artifacts are hashed in parallel
+    (hashlib releases the GIL while hashing large blocks).
+
+    The manifest is stored in the project-local cache directory,
+    so later steps and e.g.: audit scripts can reuse the digests.
+"""
+
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from poetry_publish.utils.cache import CACHE_DIR_NAME, get_cache_dir
+
+
+MANIFEST_FILENAME = 'manifest.json'
+
+BUFFER_SIZE = 4 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class ArtifactDigests:
+    name: str
+    size: int
+    sha256: str
+    blake2_256: str  # blake2b with a digest size of 256 bits, like PyPI uses
+    md5: str
+
+
+def hash_file(file_path, buffer_size=BUFFER_SIZE):
+    file_path = Path(file_path)
+    sha256 = hashlib.sha256()
+    blake2 = hashlib.blake2b(digest_size=32)
+    md5 = hashlib.md5()
+    size = 0
+
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with file_path.open('rb', buffering=0) as f:
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            size += count
+            chunk = view[:count]
+            sha256.update(chunk)
+            blake2.update(chunk)
+            md5.update(chunk)
+
+    return ArtifactDigests(
+        name=file_path.name,
+        size=size,
+        sha256=sha256.hexdigest(),
+        blake2_256=blake2.hexdigest(),
+        md5=md5.hexdigest(),
+    )
+
+
+def hash_artifacts(dist_path, max_workers=None):
+    """
+    Returns the ArtifactDigests of all files in `dist_path`, sorted by name.
+    """
+    dist_path = Path(dist_path)
+    if not dist_path.is_dir():
+        return []
+    file_paths = sorted(path for path in dist_path.iterdir() if path.is_file())
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(hash_file, file_paths))
+
+
+def write_manifest(base_path, artifacts, **info):
+    """
+    Store the digests of all artifacts. `info` is added, e.g.: name, version and commit.
+    """
+    manifest_path = Path(get_cache_dir(base_path), MANIFEST_FILENAME)
+    manifest = {**info, 'artifacts': [asdict(artifact) for artifact in artifacts]}
+    manifest_path.write_text(json.dumps(manifest, indent=4))
+    return manifest_path
+
+
+def load_manifest(base_path):
+    """
+    Returns the stored manifest or None.
+    """
+    manifest_path = Path(base_path, CACHE_DIR_NAME, MANIFEST_FILENAME)
+    try:
+        manifest = json.loads(manifest_path.read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+    manifest['artifacts'] = [ArtifactDigests(**artifact) for artifact in manifest['artifacts']]
+    return manifest
@@ -0,0 +1,244 @@
+"""
+    Structured publish log
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Every record is one JSON line with a timestamp and the name of the release step,
+    e.g.: the start and the end of every step and every output line of the called programs.
+
+    The records are written by a background thread, so the release steps never wait
+    for the file system. The log file is rotated, if it's too big or too old.
+    The old generations are gzip compressed and only `backup_count` of them are kept.
+    They are stored in the project-local cache directory: They never make the git
+    repository "unclean", a existing "publish.log" ignore rule is enough.
+"""
+
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+
+from poetry_publish.utils.cache import CACHE_DIR_NAME, get_cache_dir
+from poetry_publish.utils.timing import get_current_step
+
+
+LOGGER_NAME = 'poetry_publish.release'
+
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_MAX_AGE = 30 * 24 * 60 * 60  # seconds
+LOG_BACKUP_COUNT = 5
+
+# Subdirectory of the cache directory for the old generations of the log file:
+LOG_BACKUP_DIR_NAME = 'logs'
+
+# Records that wait for the background writer, before the release steps are blocked:
+QUEUE_SIZE = 100
+
+# Output of the called programs is logged in records of about this size:
+OUTPUT_CHUNK_SIZE = 16 * 1024
+
+logger = logging.getLogger(LOGGER_NAME)
+logger.setLevel(logging.INFO)
+logger.propagate = False  # e.g.: the build output doesn't belong in the logs of the caller
+
+
+def log_event(event, message='', step=None, **fields):
+    """
+    Add a record to the publish log, e.g.: log_event('step_end', step='build', duration=1.2)
+    Without a `step` the current release step of the calling thread is used.
+    """
+    extra = {'event': event, 'fields': fields}
+    if step is not None:
+        extra['step'] = step
+    logger.info(message, extra=extra)
+
+
+class StepFilter(logging.Filter):
+    """
+    Add the name of the current release step to the records.
+    Must be used in the thread that emits the records, not in the background writer.
+    """
+
+    def filter(self, record):
+        if getattr(record, 'step', None) is None:
+            step_timing = get_current_step()
+            record.step = step_timing.name if step_timing is not None else None
+        return True
+
+
+class BlockingQueueHandler(QueueHandler):
+    """
+    Wait, if the queue is full: A program with a lot of output can't fill the memory.
+    """
+
+    def enqueue(self, record):
+        self.queue.put(record)
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec='milliseconds'
+            ),
+            'level': record.levelname,
+            'step': getattr(record, 'step', None),
+            'event': getattr(record, 'event', None),
+            'message': record.getMessage(),
+            **getattr(record, 'fields', {}),
+        }
+        return json.dumps(data)
+
+
+def gzip_rotator(source, dest):
+    with open(source, 'rb') as source_file, gzip.open(dest, 'wb') as dest_file:
+        shutil.copyfileobj(source_file, dest_file)
+    os.remove(source)
+
+
+class RotatingJsonLinesHandler(RotatingFileHandler):
+    """
+    Rotate the log file, if it's bigger than `max_bytes` or the first record
+    is older than `max_age` seconds. The old generations are stored in the cache
+    directory next to the log file, e.g.: ".poetry_publish_cache/logs/publish.log.1.gz"
+    (the newest) ... ".poetry_publish_cache/logs/publish.log.5.gz" (the oldest)
+    """
+
+    def __init__(
+        self,
+        filename,
+        max_bytes=LOG_MAX_BYTES,
+        max_age=LOG_MAX_AGE,
+        backup_count=LOG_BACKUP_COUNT,
+    ):
+        super().__init__(
+            filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True
+        )
+        self.max_age = max_age
+        self.log_dir = Path(self.baseFilename).parent
+        self.backup_dir = Path(self.log_dir, CACHE_DIR_NAME, LOG_BACKUP_DIR_NAME)
+        self.namer = lambda name: str(Path(self.backup_dir, f'{Path(name).name}.gz'))
+        self.rotator = gzip_rotator
+        self.setFormatter(JsonLinesFormatter())
+        self._start_time = None
+
+    def _get_start_time(self):
+        """
+        Returns the timestamp of the first record in the log file.
+        """
+        if self._start_time is not None:
+            return self._start_time
+
+        try:
+            with open(self.baseFilename, encoding='utf-8', errors='replace') as f:
+                first_line = f.readline()
+        except FileNotFoundError:
+            first_line = ''
+
+        if not first_line:
+            self._start_time = time.time()
+        else:
+            try:
+                start_time = datetime.fromisoformat(json.loads(first_line)['time'])
+                self._start_time = start_time.timestamp()
+            except (ValueError, TypeError, KeyError):
+                # e.g.: a unstructured log of a old poetry-publish version: rotate it now
+                self._start_time = 0
+        return self._start_time
+
+    def shouldRollover(self, record):
+        if super().shouldRollover(record):
+            return True
+        if self.max_age and self.backupCount > 0:
+            return time.time() - self._get_start_time() > self.max_age
+        return False
+
+    def doRollover(self):
+        if self.backupCount > 0:
+            get_cache_dir(self.log_dir)  # with the .gitignore
+            self.backup_dir.mkdir(exist_ok=True)
+        super().doRollover()
+        self._start_time = None
+
+
+@contextmanager
+def publish_log(
+    filename, max_bytes=LOG_MAX_BYTES, max_age=LOG_MAX_AGE, backup_count=LOG_BACKUP_COUNT
+):
+    """
+    Write all records of log_event() into `filename` while the context is active.
+    All records are written, before the context is left.
+    """
+    handler = RotatingJsonLinesHandler(
+        filename, max_bytes=max_bytes, max_age=max_age, backup_count=backup_count
+    )
+    log_queue = queue.Queue(maxsize=QUEUE_SIZE)
+    queue_handler = BlockingQueueHandler(log_queue)
+    queue_handler.addFilter(StepFilter())
+    listener = QueueListener(log_queue, handler)
+
+    listener.start()
+    logger.addHandler(queue_handler)
+    try:
+        yield
+    finally:
+        logger.removeHandler(queue_handler)
+        listener.stop()
+        handler.close()
+
+
+class CommandLog:
+    """
+    File-like object for the `log` argument of e.g.: verbose_stream_call()
+    The output of the program is added in chunks of complete lines to the publish log:
+    A record per line would be too slow for programs with a lot of output.
+
+    At most about `chunk_size` characters are buffered: A line that is longer
+    (e.g.: progress output with only "\r") is split.
+    """
+
+    def __init__(self, chunk_size=OUTPUT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self._parts = []
+        self._size = 0
+
+    def write(self, text):
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size < self.chunk_size:
+            return
+
+        # The written text rarely ends with a complete line, e.g.: chunks of a pipe
+        buffer = ''.join(self._parts)
+        end = buffer.rfind('\n') + 1
+        if len(buffer) - end >= self.chunk_size:
+            end = len(buffer)  # The incomplete line alone is too big
+        if end:
+            log_event('output', buffer[:end])
+        rest = buffer[end:]
+        self._parts = [rest] if rest else []
+        self._size = len(rest)
+
+    def flush(self):
+        pass  # The chunks are emitted by write() and close()
+
+    def _emit(self):
+        log_event('output', ''.join(self._parts))
+        self._parts = []
+        self._size = 0
+
+    def close(self):
+        if self._parts:
+            self._emit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
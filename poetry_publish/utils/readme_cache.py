@@ -0,0 +1,79 @@
+"""
+    Skip the README.creole -> README.rst conversion if nothing changed
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    The cache key is a hash of the creole source and the python-creole version.
+    The hash of the generated README.rst is stored, too: So a edited or deleted
+    README.rst will be generated again.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+from poetry_publish.utils.cache import CACHE_DIR_NAME, get_cache_dir
+
+
+CACHE_FILENAME = 'readme.json'
+
+
+def get_creole_version():
+    """
+    Returns the installed python-creole version or None, without importing python-creole.
+    """
+    try:
+        from importlib.metadata import PackageNotFoundError, version
+    except ImportError:  # Python 3.7
+        try:
+            import creole
+        except ModuleNotFoundError:
+            return None
+        return creole.__version__
+
+    try:
+        return version('python-creole')
+    except PackageNotFoundError:
+        return None
+
+
+def hash_file(file_path):
+    try:
+        return hashlib.sha256(Path(file_path).read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def get_readme_key(creole_readme_path, creole_version):
+    key = hashlib.sha256()
+    key.update(f'{creole_version}\0'.encode())
+    key.update(Path(creole_readme_path).read_bytes())
+    return key.hexdigest()
+
+
+def _read_records(base_path):
+    cache_path = Path(base_path, CACHE_DIR_NAME, CACHE_FILENAME)
+    try:
+        return json.loads(cache_path.read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def is_readme_cached(base_path, key, rest_readme_path):
+    """
+    Is README.rst generated from the same source with the same python-creole version
+    and still unchanged?
+    """
+    record = _read_records(base_path).get(Path(rest_readme_path).name)
+    if not record or record.get('key') != key:
+        return False
+    return hash_file(rest_readme_path) == record.get('rst')
+
+
+def store_readme(base_path, key, rest_readme_path):
+    rst_hash = hash_file(rest_readme_path)
+    if rst_hash is None:
+        return
+    records = _read_records(base_path)
+    records[Path(rest_readme_path).name] = {'key': key, 'rst': rst_hash}
+    cache_path = Path(get_cache_dir(base_path), CACHE_FILENAME)
+    cache_path.write_text(json.dumps(records, indent=4))
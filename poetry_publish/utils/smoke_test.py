@@ -0,0 +1,175 @@
+"""
+    Smoke test of the built wheel: Install it and import it in a new virtualenv
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Creating a virtualenv with pip costs seconds, so it's done only once: The virtualenvs
+    are clones of a cached template with hard links for all files (only the directories
+    are created). A used clone is deleted and a new one is prepared for the next run.
+
+    pip never changes installed files in place, it only creates new files or deletes
+    old ones: A install into a clone doesn't change the template.
+"""
+
+import os
+import shutil
+import sys
+import time
+import uuid
+import venv
+import zipfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+
+from poetry_publish.utils.cache import get_cache_dir
+from poetry_publish.utils.subprocess_utils import verbose_check_output
+
+
+VENV_POOL_DIR_NAME = 'venvs'
+
+# Number of prepared virtualenvs:
+POOL_SIZE = 1
+
+
+@dataclass
+class SmokeTestResult:
+    wheel_name: str
+    packages: List[str]
+    install_duration: float
+    import_duration: float
+
+
+def get_python_path(venv_path):
+    if os.name == 'nt':
+        return Path(venv_path, 'Scripts', 'python.exe')
+    return Path(venv_path, 'bin', 'python')
+
+
+def clone_venv(src, dst):
+    """
+    Clone the virtualenv with hard links for all files: Only the directories are created.
+    """
+    shutil.copytree(src, dst, symlinks=True, copy_function=os.link)
+
+
+class VenvPool:
+    def __init__(self, base_path, size=POOL_SIZE):
+        self.pool_path = Path(get_cache_dir(base_path), VENV_POOL_DIR_NAME)
+        self.size = size
+
+    @property
+    def template_path(self):
+        version = '.'.join(str(number) for number in sys.version_info[:3])
+        return Path(self.pool_path, f'template-{version}')
+
+    def _new_path(self, prefix):
+        return Path(self.pool_path, f'{prefix}-{uuid.uuid4().hex}')
+
+    def get_template(self):
+        """
+        Returns the path of the template virtualenv and create it, if not exists.
+        """
+        template_path = self.template_path
+        if not template_path.is_dir():
+            print(f'\nCreate the template virtualenv: {template_path}')
+            temp_path = self._new_path('tmp')
+            venv.EnvBuilder(with_pip=True, symlinks=os.name != 'nt').create(temp_path)
+            try:
+                os.rename(temp_path, template_path)
+            except OSError:  # Created by a other release at the same time
+                shutil.rmtree(temp_path)
+        return template_path
+
+    def _ready_paths(self):
+        prefix = f'{self.template_path.name}-ready-'
+        return sorted(path for path in self.pool_path.iterdir() if path.name.startswith(prefix))
+
+    def fill(self):
+        """
+        Prepare clones of the template, until the pool is full.
+        """
+        template_path = self.get_template()
+        for _ in range(self.size - len(self._ready_paths())):
+            temp_path = self._new_path('tmp')
+            clone_venv(template_path, temp_path)
+            os.rename(temp_path, self._new_path(f'{template_path.name}-ready'))
+
+    @contextmanager
+    def venv(self):
+        """
+        Take a prepared virtualenv from the pool, or clone a new one.
+        It's deleted after use and the pool is filled again.
+        """
+        template_path = self.get_template()
+        venv_path = self._new_path('used')
+        for ready_path in self._ready_paths():
+            try:
+                os.rename(ready_path, venv_path)  # Nobody else can take it now
+            except OSError:
+                continue
+            break
+        else:
+            clone_venv(template_path, venv_path)
+
+        try:
+            yield venv_path
+        finally:
+            shutil.rmtree(venv_path, ignore_errors=True)
+            self.fill()
+
+
+def get_top_level_names(wheel_path):
+    """
+    Returns the names of the top-level packages and modules in the wheel.
+    """
+    names = set()
+    with zipfile.ZipFile(wheel_path) as zip_file:
+        for name in zip_file.namelist():
+            top_level = name.split('/', 1)[0]
+            if top_level.endswith(('.dist-info', '.data', '.pth')):
+                continue
+            if '/' not in name:  # a module, e.g.: "foo.py"
+                if not top_level.endswith('.py'):
+                    continue
+                top_level = top_level[:-3]
+            names.add(top_level)
+    return sorted(names)
+
+
+def smoke_test_wheel(wheel_path, base_path, pool_size=POOL_SIZE):
+    """
+    Install the wheel (with its dependencies) into a virtualenv from the pool
+    and import all top-level packages. Raises CalledProcessError, if anything fails.
+    """
+    wheel_path = Path(wheel_path).resolve()
+    packages = get_top_level_names(wheel_path)
+    pool = VenvPool(base_path, size=pool_size)
+    with pool.venv() as venv_path:
+        python = str(get_python_path(venv_path))
+
+        start_time = time.monotonic()
+        call_info, output = verbose_check_output(
+            python,
+            '-m',
+            'pip',
+            'install',
+            '--disable-pip-version-check',
+            '--no-input',
+            str(wheel_path),
+            cwd=venv_path,
+        )
+        install_duration = time.monotonic() - start_time
+
+        start_time = time.monotonic()
+        if packages:
+            # Isolated and not in the project directory: Import only the installed packages
+            verbose_check_output(python, '-I', '-c', f'import {", ".join(packages)}', cwd=venv_path)
+        import_duration = time.monotonic() - start_time
+
+    return SmokeTestResult(
+        wheel_name=wheel_path.name,
+        packages=packages,
+        install_duration=install_duration,
+        import_duration=import_duration,
+    )
@@ -0,0 +1,152 @@
+"""
+    Run a graph of named release steps
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Every step declares the names of the steps it depends on.
+    Independent steps are executed concurrently on a thread pool.
+
+    With a ReleaseJournal, steps that are done in a interrupted run are not called again.
+    Only their (cheap) `verify` function is called, if the step has one.
+
+    The start and the end of every step is added to the publish log.
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, replace
+from typing import Callable, Tuple
+
+from poetry_publish.utils.publish_log import log_event
+from poetry_publish.utils.timing import call_timed
+
+
+@dataclass(frozen=True)
+class Step:
+    name: str
+    func: Callable
+    requires: Tuple[str, ...] = ()
+    verify: Callable = None  # called instead of `func`, if the step is done in a journal
+    timeout: float = None  # seconds for all commands of the step, None -> no deadline
+
+
+def sort_steps(steps):
+    """
+    Returns the steps in a topological order that keeps the given order, if possible.
+
+    >>> steps = [Step('b', print, requires=('a',)), Step('a', print), Step('c', print)]
+    >>> [step.name for step in sort_steps(steps)]
+    ['a', 'b', 'c']
+    """
+    names = [step.name for step in steps]
+    if len(set(names)) != len(names):
+        raise ValueError(f'Duplicate step names in: {names}')
+
+    for step in steps:
+        for name in step.requires:
+            if name not in names:
+                raise ValueError(f'Step {step.name!r} requires unknown step {name!r}')
+
+    done = set()
+    ordered = []
+    pending = list(steps)
+    while pending:
+        for step in pending:
+            if done.issuperset(step.requires):
+                break
+        else:
+            raise ValueError(f'Cyclic step dependencies in: {[step.name for step in pending]}')
+        pending.remove(step)
+        ordered.append(step)
+        done.add(step.name)
+    return ordered
+
+
+def set_timeouts(steps, timeouts=None, default=None):
+    """
+    Returns the steps with the timeout from the `timeouts` dict (step name -> seconds)
+    or the `default` timeout.
+
+    >>> steps = set_timeouts([Step('a', print), Step('b', print)], {'b': 60}, default=10)
+    >>> [(step.name, step.timeout) for step in steps]
+    [('a', 10), ('b', 60)]
+    """
+    timeouts = timeouts or {}
+    names = [step.name for step in steps]
+    for name in timeouts:
+        if name not in names:
+            raise ValueError(f'Timeout for unknown step {name!r}')
+    return [replace(step, timeout=timeouts.get(step.name, default)) for step in steps]
+
+
+def run_steps(steps, context, max_workers=None, timings=None, profile=False, journal=None):
+    """
+    Call `step.func(context)` for all steps, as soon as all required steps are done.
+
+    With max_workers=1 all steps are called one after another in the calling thread.
+    Otherwise independent steps run in parallel on a thread pool.
+    The first error stops scheduling new steps and is raised after the running ones are done.
+
+    A StepTiming of every called step is appended to the `timings` list.
+
+    Every finished step is recorded in the `journal` (a ReleaseJournal), if given.
+    """
+    steps = sort_steps(steps)
+    if timings is None:
+        timings = []
+
+    def call_logged(step, func):
+        log_event('step_start', step=step.name)
+        start_time = time.monotonic()
+        try:
+            call_timed(step.name, func, context, timings, profile=profile, timeout=step.timeout)
+        except BaseException as err:
+            duration = time.monotonic() - start_time
+            log_event('step_error', repr(err), step=step.name, duration=duration)
+            raise
+        log_event('step_end', step=step.name, duration=time.monotonic() - start_time)
+
+    def call(step):
+        if journal is not None and journal.is_done(step.name):
+            if step.verify is None:
+                print(f'\nStep {step.name!r} is already done, skip.')
+                log_event('step_skip', step=step.name)
+            else:
+                call_logged(step, step.verify)
+            return
+
+        call_logged(step, step.func)
+        if journal is not None:
+            journal.mark_done(step.name)
+
+    if max_workers == 1:
+        for step in steps:
+            call(step)
+        return timings
+
+    done = set()
+    pending = list(steps)
+    error = None
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='step') as executor:
+        running = {}
+        while True:
+            if error is None:
+                for step in list(pending):
+                    if done.issuperset(step.requires):
+                        pending.remove(step)
+                        running[executor.submit(call, step)] = step
+
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                step = running.pop(future)
+                exception = future.exception()
+                if exception is None:
+                    done.add(step.name)
+                elif error is None:
+                    error = exception
+
+    if error is not None:
+        raise error
+    return timings
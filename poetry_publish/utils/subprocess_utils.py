@@ -1,38 +1,270 @@
+import codecs
+import collections
+import functools
+import itertools
 import os
 import shutil
+import signal
 import subprocess
+import sys
+import time
+from pathlib import Path
+
+from poetry_publish.utils.timing import record_command
+from poetry_publish.utils.watchdog import Watchdog
+
+
+def _stdin_is_tty():
+    try:
+        return sys.stdin.isatty()
+    except (AttributeError, ValueError):  # no stdin or closed
+        return False
+
+
+class ChildProcess(subprocess.Popen):
+    """
+    subprocess.Popen() that stores the resource usage of the finished child process
+    in `rusage` (Only on POSIX systems, otherwise it's always None)
+
+    Without a terminal (e.g.: in CI) the child runs in a new session on POSIX systems,
+    so that kill_tree() can kill all processes that it started, too.
+    On a terminal the programs must be able to ask e.g. for credentials, so only the
+    child itself is killed.
+    """
+
+    rusage = None
+
+    def __init__(self, args, **kwargs):
+        if os.name == 'posix':
+            kwargs.setdefault('start_new_session', not _stdin_is_tty())
+        self.own_session = kwargs.get('start_new_session', False)
+        super().__init__(args, **kwargs)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None and self.returncode is None:
+            # e.g.: KeyboardInterrupt: A child in a own session didn't get the signal
+            self.kill_tree()
+        return super().__exit__(exc_type, exc_val, exc_tb)
+
+    def kill_tree(self):
+        if self.own_session:
+            try:
+                os.killpg(self.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        elif os.name == 'nt':
+            subprocess.call(
+                ['taskkill', '/F', '/T', '/PID', str(self.pid)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        else:
+            self.kill()
+
+    def wait(self, timeout=None):
+        if self.returncode is None and timeout is None and hasattr(os, 'wait4'):
+            try:
+                pid, status, self.rusage = os.wait4(self.pid, 0)
+            except ChildProcessError:
+                pass  # Was already collected, e.g.: by poll()
+            else:
+                if os.WIFSIGNALED(status):
+                    self.returncode = -os.WTERMSIG(status)
+                else:
+                    self.returncode = os.WEXITSTATUS(status)
+        return super().wait(timeout=timeout)
+
+
+# Programs that are used from the virtualenv of the project, without "poetry run"
+VENV_PROGRAMS = ('python', 'twine')
+
+
+def get_venv_bin_path():
+    """
+    Returns the "bin" directory of the active virtualenv (e.g.: via "poetry run") or None
+    """
+    virtual_env = os.environ.get('VIRTUAL_ENV')
+    if virtual_env:
+        return Path(virtual_env, 'Scripts' if os.name == 'nt' else 'bin')
+    if sys.prefix != sys.base_prefix:
+        return Path(sys.executable).parent
+
+
+@functools.lru_cache(maxsize=None)
+def _which(prog_name, path, venv_bin_path):
+    if venv_bin_path and prog_name in VENV_PROGRAMS:
+        prog_path = shutil.which(prog_name, path=venv_bin_path)
+        if prog_path:
+            return prog_path
+    return shutil.which(prog_name, path=path)
+
+
+def which(prog_name):
+    """
+    Cached shutil.which(): The lookup is done only once per PATH and virtualenv.
+    """
+    venv_bin_path = get_venv_bin_path()
+    return _which(
+        prog_name,
+        os.environ.get('PATH', os.defpath),
+        str(venv_bin_path) if venv_bin_path else None,
+    )
 
 
 def replace_prog(args):
     prog_name = args[0]
-    prog_path = shutil.which(prog_name)
+    prog_path = which(prog_name)
     if not prog_path:
         raise FileNotFoundError(f'Executable "{prog_name}" not found in PATH!')
     args = [prog_path, *args[1:]]
     return args
 
 
-def verbose_check_output(*args, log=None):
-    """ 'verbose' version of subprocess.check_output() """
+def check_programs(*prog_names):
+    """
+    Resolve all programs up front and report all missing ones at once.
+    """
+    missing = []
+    for prog_name in prog_names:
+        try:
+            replace_prog([prog_name])
+        except FileNotFoundError:
+            missing.append(prog_name)
+    if missing:
+        raise FileNotFoundError(f'Executables not found in PATH: {", ".join(missing)}')
+
+
+def verbose_check_output(*args, log=None, cwd=None, env=None):
+    """
+    'verbose' version of subprocess.check_output()
+    `env` adds environment variables for this call only, e.g.: credentials
+    """
     call_info = f"Call: {' '.join(args)!r}"
     args = replace_prog(args)
-    try:
-        output = subprocess.check_output(args, text=True, env=os.environ, stderr=subprocess.STDOUT)
-    except subprocess.CalledProcessError as err:
+    env = dict(os.environ, **env) if env else os.environ
+    start_time = time.monotonic()
+    with ChildProcess(
+        args, text=True, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, cwd=cwd
+    ) as process, Watchdog(process, call_info) as watchdog:
+        output = process.stdout.read()
+        return_code = process.wait()
+    record_command(call_info, time.monotonic() - start_time, process.rusage)
+    watchdog.check()
+
+    if return_code:
         print('\n***ERROR:')
-        print(err.output)
+        print(output)
         if log is not None:
-            log.write(err.output)
-        raise
+            log.write(output)
+        raise subprocess.CalledProcessError(return_code, args, output=output)
     return call_info, output
 
 
-def verbose_check_call(*args):
-    """ 'verbose' version of subprocess.check_call() """
-    print(f"\tCall: {' '.join(args)!r}\n")
+def verbose_check_call(*args, cwd=None, timeout=None):
+    """
+    'verbose' version of subprocess.check_call()
+    The program is killed, if it's not finished after `timeout` seconds.
+    """
+    call_info = f"Call: {' '.join(args)!r}"
+    print(f'\t{call_info}\n')
     args = replace_prog(args)
-    subprocess.check_call(
-        args,
-        universal_newlines=True,
-        env=os.environ
-    )
+    start_time = time.monotonic()
+    with ChildProcess(
+        args, universal_newlines=True, env=os.environ, cwd=cwd
+    ) as process, Watchdog(process, call_info, timeout=timeout) as watchdog:
+        return_code = process.wait()
+    record_command(call_info, time.monotonic() - start_time, process.rusage)
+    watchdog.check()
+
+    if return_code:
+        raise subprocess.CalledProcessError(return_code, args)
+
+
+def _append_tail(tail, partial, text):
+    """
+    Add the complete lines of `text` to the `tail` deque. Returns the incomplete last line.
+    """
+    lines = (partial + text).splitlines(keepends=True)
+    if lines and not lines[-1].endswith(('\n', '\r')):
+        partial = lines.pop()
+    else:
+        partial = ''
+    tail.extend(lines)
+    return partial
+
+
+def verbose_stream_call(*args, log=None, tail_lines=100, cwd=None, chunk_size=64 * 1024):
+    """
+    Call the program and stream the output to stdout and the log file, as soon as
+    it's available: A question without a newline (e.g. "Username: ") is shown at once.
+
+    Only the last `tail_lines` lines are kept in memory. They are returned
+    and used as `output` of the CalledProcessError on errors.
+    """
+    call_info = f"Call: {' '.join(args)!r}"
+    print(f'\t{call_info}\n')
+    if log is not None:
+        log.write(f'{call_info}\n')
+        log.flush()
+
+    args = replace_prog(args)
+    env = dict(os.environ, PYTHONUNBUFFERED='1')  # Don't let Python programs buffer the pipe
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    tail = collections.deque(maxlen=tail_lines)
+    partial = ''
+    start_time = time.monotonic()
+    with ChildProcess(
+        args, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, cwd=cwd
+    ) as process, Watchdog(process, call_info) as watchdog:
+        chunks = iter(functools.partial(process.stdout.read1, chunk_size), b'')
+        for text in itertools.chain(
+            (decoder.decode(chunk) for chunk in chunks), (decoder.decode(b'', final=True),)
+        ):
+            if not text:
+                continue
+            sys.stdout.write(text)
+            sys.stdout.flush()
+            if log is not None:
+                log.write(text)
+                log.flush()
+            partial = _append_tail(tail, partial, text)
+        return_code = process.wait()
+    record_command(call_info, time.monotonic() - start_time, process.rusage)
+    watchdog.check()
+
+    if partial:
+        tail.append(partial)
+    output = ''.join(tail)
+    if return_code:
+        print(f'\n***ERROR: {call_info} returned exit status {return_code}')
+        raise subprocess.CalledProcessError(return_code, args, output=output)
+    return call_info, output
+
+
+def verbose_iter_output(*args, cwd=None, chunk_size=64 * 1024):
+    """
+    Call the program and yield the output (stdout and stderr) as soon as it's available.
+
+    Close the generator to terminate the program early, e.g.: on the first error.
+    The exit status is not checked: The caller must evaluate the output.
+    """
+    call_info = f"Call: {' '.join(args)!r}"
+    args = replace_prog(args)
+    env = dict(os.environ, PYTHONUNBUFFERED='1')  # Don't let Python programs buffer the pipe
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    start_time = time.monotonic()
+    with ChildProcess(
+        args, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, cwd=cwd
+    ) as process, Watchdog(process, call_info) as watchdog:
+        finished = False
+        try:
+            for chunk in iter(functools.partial(process.stdout.read1, chunk_size), b''):
+                yield decoder.decode(chunk)
+            finished = True
+            yield decoder.decode(b'', final=True)
+        finally:
+            if not finished:
+                process.terminate()
+            process.wait()
+            record_command(call_info, time.monotonic() - start_time, process.rusage)
+    watchdog.check()
@@ -0,0 +1,55 @@
+"""
+    Throttle the uploads to a package index
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Package indexes limit the uploads per time. A UploadThrottle allows `max_uploads`
+    uploads at the same time and waits `interval` seconds between the starts of two
+    uploads. The state lives in a multiprocessing manager: One throttle is shared by
+    all release processes that upload to the same index.
+"""
+
+import time
+from contextlib import contextmanager
+
+from poetry_publish.utils.publish_log import log_event
+
+
+# Uploads to one index at the same time:
+MAX_UPLOADS = 1
+
+# Seconds between the starts of two uploads to one index:
+UPLOAD_INTERVAL = 10
+
+
+class UploadThrottle:
+    def __init__(self, manager, name, max_uploads=MAX_UPLOADS, interval=UPLOAD_INTERVAL):
+        if max_uploads < 1:
+            raise ValueError(f'Max. uploads must be at least 1, not: {max_uploads}')
+        if interval < 0:
+            raise ValueError(f'Upload interval must not be negative, not: {interval}')
+        self.name = name
+        self.max_uploads = max_uploads
+        self.interval = interval
+        self.semaphore = manager.BoundedSemaphore(max_uploads)
+        self.lock = manager.Lock()
+        self.last_start = manager.Value('d', None)  # time.monotonic() is system-wide
+
+    @contextmanager
+    def slot(self):
+        """
+        Wait until a upload to the index is allowed and hold the slot until it's done.
+        Yields the start time of the upload (time.monotonic()), that the throttle stores.
+        """
+        start_time = time.monotonic()
+        with self.semaphore:
+            with self.lock:  # the next upload waits for this one to start
+                last_start = self.last_start.value
+                if last_start is not None:
+                    delay = last_start + self.interval - time.monotonic()
+                    if delay > 0:
+                        print(f'\nWait {delay:.1f}s for the next upload to {self.name}')
+                        time.sleep(delay)
+                upload_start = time.monotonic()
+                self.last_start.value = upload_start
+            log_event('upload_slot', repository=self.name, wait=upload_start - start_time)
+            yield upload_start
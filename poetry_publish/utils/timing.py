@@ -0,0 +1,185 @@
+"""
+    Timing of release steps and of the external commands they call
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    The step that runs in the current thread is stored in a thread local,
+    so the subprocess helpers can add the used resources of their child processes to it.
+"""
+
+import json
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, List
+
+
+_CURRENT = threading.local()
+
+
+@dataclass
+class CommandTiming:
+    call_info: str
+    wall_time: float
+    cpu_time: float = None  # user + system time of the child process
+    max_rss: int = None  # peak resident set size of the child process in bytes
+
+
+@dataclass
+class StepTiming:
+    name: str
+    start_time: float = 0.0
+    wall_time: float = 0.0
+    ok: bool = False
+    timeout: float = None  # deadline in seconds, after the start of the step
+    timed_out: bool = False
+    commands: List[CommandTiming] = field(default_factory=list)
+    profiler: Any = field(default=None, repr=False)  # cProfile.Profile, if profiling is enabled
+
+    @property
+    def child_cpu_time(self):
+        return sum(command.cpu_time or 0.0 for command in self.commands)
+
+    @property
+    def child_max_rss(self):
+        return max((command.max_rss or 0 for command in self.commands), default=0)
+
+    def as_dict(self, run_start_time):
+        return {
+            'name': self.name,
+            'start': round(self.start_time - run_start_time, 6),
+            'wall_time': round(self.wall_time, 6),
+            'child_cpu_time': round(self.child_cpu_time, 6),
+            'child_max_rss': self.child_max_rss,
+            'ok': self.ok,
+            'timeout': self.timeout,
+            'timed_out': self.timed_out,
+            'commands': [
+                {
+                    'call_info': command.call_info,
+                    'wall_time': round(command.wall_time, 6),
+                    'cpu_time': command.cpu_time,
+                    'max_rss': command.max_rss,
+                }
+                for command in self.commands
+            ],
+        }
+
+
+def get_current_step():
+    """
+    Returns the StepTiming of the step that runs in the current thread, or None
+    """
+    return getattr(_CURRENT, 'step_timing', None)
+
+
+def bind_current_step(func):
+    """
+    Returns a wrapper of `func` that runs in the step of the calling thread,
+    e.g.: to call commands from a thread pool with the deadline of the step.
+    """
+    step_timing = get_current_step()
+
+    def wrapper(*args, **kwargs):
+        _CURRENT.step_timing = step_timing
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _CURRENT.step_timing = None
+
+    return wrapper
+
+
+def record_command(call_info, wall_time, rusage=None):
+    """
+    Add a finished child process to the step of the current thread, if any.
+    """
+    step_timing = get_current_step()
+    if step_timing is None:
+        return
+
+    command = CommandTiming(call_info=call_info, wall_time=wall_time)
+    if rusage is not None:
+        command.cpu_time = rusage.ru_utime + rusage.ru_stime
+        # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+        command.max_rss = rusage.ru_maxrss if sys.platform == 'darwin' else rusage.ru_maxrss * 1024
+    step_timing.commands.append(command)
+
+
+def call_timed(name, func, context, timings, profile=False, timeout=None):
+    """
+    Call `func(context)` and append the StepTiming to `timings`.
+    With profile=True the Python code of the step is profiled with cProfile, too.
+    The `timeout` is the deadline for all commands that the step calls.
+    """
+    step_timing = StepTiming(name=name, timeout=timeout)
+    timings.append(step_timing)
+    if profile:
+        import cProfile
+
+        step_timing.profiler = cProfile.Profile()
+
+    _CURRENT.step_timing = step_timing
+    step_timing.start_time = time.monotonic()
+    try:
+        if profile:
+            step_timing.profiler.runcall(func, context)
+        else:
+            func(context)
+        step_timing.ok = True
+    finally:
+        step_timing.wall_time = time.monotonic() - step_timing.start_time
+        _CURRENT.step_timing = None
+
+
+def print_timings(timings):
+    print('\nTimings:')
+    name_width = max((len(timing.name) for timing in timings), default=0)
+    print(f'\t{"step":<{name_width}} {"wall":>8} {"child cpu":>10} {"child rss":>10}')
+    for timing in sorted(timings, key=lambda timing: timing.start_time):
+        if timing.timed_out:
+            status = f' TIMEOUT (deadline: {timing.timeout}s)'
+        else:
+            status = '' if timing.ok else ' ERROR'
+        print(
+            f'\t{timing.name:<{name_width}} {timing.wall_time:>7.2f}s'
+            f' {timing.child_cpu_time:>9.2f}s'
+            f' {timing.child_max_rss / 1024 / 1024:>7.1f}MiB{status}'
+        )
+
+
+def write_report(timings, report_path, **info):
+    """
+    Write the timings as JSON. `info` is added as meta information, e.g.: the version
+    """
+    run_start_time = min((timing.start_time for timing in timings), default=0.0)
+    report = {
+        **info,
+        'steps': [
+            timing.as_dict(run_start_time)
+            for timing in sorted(timings, key=lambda timing: timing.start_time)
+        ],
+    }
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=4)
+
+
+def write_profile(timings, profile_path):
+    """
+    Merge the cProfile statistics of all steps into one file for e.g.: pstats or snakeviz
+    """
+    import pstats
+
+    stats = None
+    for timing in timings:
+        if timing.profiler is None:
+            continue
+        try:
+            if stats is None:
+                stats = pstats.Stats(timing.profiler)
+            else:
+                stats.add(timing.profiler)
+        except TypeError:  # nothing was profiled in this step
+            continue
+    if stats is not None:
+        stats.dump_stats(profile_path)
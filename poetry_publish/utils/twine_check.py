@@ -1,31 +1,228 @@
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List
+
 from poetry_publish.utils.ansi import strip_style
 from poetry_publish.utils.interactive import confirm
-from poetry_publish.utils.subprocess_utils import verbose_check_output
+from poetry_publish.utils.subprocess_utils import verbose_iter_output
 
 
-def _parse_twine_output(output):
-    checks = []
-    output = strip_style(output)
-    for line in output.splitlines():
-        line = line.strip()
+ARTIFACT_SUFFIXES = ('.whl', '.tar.gz', '.zip')
+
+# e.g.: "Checking dist/foo-1.0-py3-none-any.whl: PASSED"
+# or from old twine versions: "Checking distribution dist/foo-1.0.tar.gz: Passed"
+CHECKING_RE = re.compile(r'^Checking (?:distribution )?(.+?): (.*)$')
+
+
+@dataclass
+class TwineCheckResult:
+    filename: str
+    status: str  # 'PASSED', 'WARNING' or 'FAILED'
+    messages: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self):
+        return self.status != 'FAILED'
+
+
+def _get_status(status_text):
+    """
+    e.g.: 'PASSED' -> 'PASSED', 'PASSED with warnings' -> 'WARNING', 'FAILED' -> 'FAILED'
+    """
+    status_text = status_text.upper()
+    if not status_text.startswith('PASSED'):
+        return 'FAILED'
+    elif 'WARNING' in status_text:
+        return 'WARNING'
+    return 'PASSED'
+
+
+class TwineOutputParser:
+    """
+    Parse the output of "twine check" while it's running.
+
+    twine prints "Checking <filename>: " before a artifact is checked and the status after it,
+    followed by the messages. So a artifact is complete, if the next one is started.
+    """
+
+    def __init__(self):
+        self.current = None
+        self._buffer = ''
+
+    def feed(self, text):
+        """
+        Add a part of the output. Returns the TwineCheckResult of all completed artifacts.
+        """
+        results = []
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split('\n')
+        for line in lines:
+            results.extend(self._feed_line(line))
+
+        if self.current is not None:
+            if strip_style(self._buffer).lstrip().startswith('Checking '):
+                # The next artifact is being checked
+                results.append(self._finish())
+        return results
+
+    def close(self):
+        """
+        The output is complete: Returns the TwineCheckResult of the remaining artifacts.
+        """
+        results = self._feed_line(self._buffer)
+        self._buffer = ''
+        if self.current is not None:
+            results.append(self._finish())
+        return results
+
+    def _finish(self):
+        result, self.current = self.current, None
+        return result
+
+    def _feed_line(self, line):
+        line = strip_style(line).strip()
         if not line:
-            continue
+            return []
 
-        if line.endswith('PASSED'):
-            print(f'\t{line}')
-            checks.append(True)
-        else:
-            print(f'ERROR: {line}')
-            checks.append(False)
-    return checks
+        match = CHECKING_RE.match(line)
+        if match:
+            results = [self._finish()] if self.current is not None else []
+            filename, status_text = match.groups()
+            self.current = TwineCheckResult(filename=filename, status=_get_status(status_text))
+            return results
 
+        if self.current is None:
+            # Output without artifact, e.g.: "No files to check."
+            return [TwineCheckResult(filename='', status='FAILED', messages=[line])]
 
-def run_twine_check():
+        self.current.messages.append(line)
+        return []
+
+
+def iter_check_results(chunks, fail_fast=False):
+    """
+    Parse the output chunks of "twine check" and yield a TwineCheckResult for every artifact,
+    as soon as it's complete. With fail_fast=True stop after the first failed artifact.
+    """
+    parser = TwineOutputParser()
+    for chunk in chunks:
+        for result in parser.feed(chunk):
+            yield result
+            if fail_fast and not result.ok:
+                return
+    yield from parser.close()
+
+
+def _parse_twine_output(output):
+    return [result.ok for result in iter_check_results([output])]
+
+
+def get_artifacts(dist_path):
+    return sorted(
+        path
+        for path in Path(dist_path).iterdir()
+        if path.is_file() and path.name.endswith(ARTIFACT_SUFFIXES)
+    )
+
+
+def has_twine_api():
+    """
+    check_artifact() uses internal functions of twine, that a new twine version may change.
+    """
+    try:
+        from twine.commands.check import _check_file, _WarningStream  # noqa: F401
+    except (ImportError, AttributeError):
+        return False
+    return True
+
+
+def check_artifact(file_path):
+    """
+    Check one artifact with the twine machinery, without starting a new process.
+    """
+    from twine.commands.check import _check_file, _WarningStream
+
+    render_warning_stream = _WarningStream()
+    warnings, is_ok = _check_file(str(file_path), render_warning_stream)
+    messages = list(warnings)
+    render_warnings = str(render_warning_stream)
+    if render_warnings:
+        messages.append(render_warnings)
+
+    if not is_ok:
+        status = 'FAILED'
+    elif warnings:
+        status = 'WARNING'
+    else:
+        status = 'PASSED'
+    return TwineCheckResult(filename=str(file_path), status=status, messages=messages)
+
+
+def check_artifacts(dist_path, max_workers=None, fail_fast=False):
+    """
+    Check all artifacts in parallel and return a TwineCheckResult for every file.
+    With fail_fast=True no new check is started after the first failed artifact.
+    """
+    failed = threading.Event()
+
+    def check(file_path):
+        if fail_fast and failed.is_set():
+            return None
+        result = check_artifact(file_path)
+        if not result.ok:
+            failed.set()
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(check, get_artifacts(dist_path))
+        return [result for result in results if result is not None]
+
+
+def print_check_result(result):
+    if result.ok:
+        print(f'\tChecking {result.filename}: {result.status}')
+    else:
+        print(f'ERROR: Checking {result.filename}: {result.status}')
+    for message in result.messages:
+        print(f'\t\t{message}')
+
+
+def run_twine_check(cwd=None, in_process=False, fail_fast=False, dist_dir='dist'):
+    """
+    Check all artifacts in `dist_dir` (relative to `cwd`) and print the result of every
+    artifact as soon as it's known. With fail_fast=True the check stops at the first
+    failed artifact and exits: The other artifacts are not checked, so they can't be
+    published anyhow.
+    """
     print('\nRun "twine check":')
-    call_info, output = verbose_check_output('poetry', 'run', 'twine', 'check', 'dist/*.*')
-    print(f'\t{call_info}')
-    checks = _parse_twine_output(output)
-    if True not in checks or False in checks:
+    if in_process and not has_twine_api():
+        print('\tThe twine API is not available, fallback and call "twine check"')
+        in_process = False
+
+    if in_process:
+        results = check_artifacts(Path(cwd or '.', dist_dir), fail_fast=fail_fast)
+        for result in results:
+            print_check_result(result)
+    else:
+        pattern = f'{dist_dir}/*.*'  # expanded by twine
+        print(f"\tCall: 'twine check {pattern}'")
+        results = []
+        output = verbose_iter_output('twine', 'check', pattern, cwd=cwd)
+        try:
+            for result in iter_check_results(output, fail_fast=fail_fast):
+                print_check_result(result)
+                results.append(result)
+        finally:
+            output.close()  # terminates twine, if it's still running
+
+    if not results or not all(result.ok for result in results):
+        if fail_fast:
+            print('\n *** ERROR: Twine check failed! (Not all artifacts are checked)')
+            sys.exit(12)
         confirm('Twine check failed!')
     else:
         print('OK')
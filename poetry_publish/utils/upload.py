@@ -0,0 +1,259 @@
+"""
+    Upload artifacts to a package index without "poetry publish" or "twine upload"
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    All files are uploaded concurrently over one pool of keep-alive connections.
+    Every file is retried on its own, with exponential backoff.
+
+    The credentials are read from the same environment variables that twine uses:
+    TWINE_USERNAME (default: "__token__") and TWINE_PASSWORD
+    or for a named repository from the environment variables of poetry, see get_credentials()
+"""
+
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import poetry_publish
+from poetry_publish.utils.twine_check import ARTIFACT_SUFFIXES, get_artifacts
+
+
+PYPI_UPLOAD_URL = 'https://upload.pypi.org/legacy/'
+
+# Server errors and rate limits are worth a new try. All other errors are final.
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# Seconds to connect and to wait for the response of the index, a timeout is retried:
+UPLOAD_TIMEOUT = (10, 300)
+
+
+@dataclass
+class UploadResult:
+    filename: str
+    size: int
+    ok: bool = False
+    duration: float = 0.0  # of the last attempt
+    attempts: int = 0
+    error: str = None
+
+    @property
+    def throughput(self):
+        """
+        Bytes per second of the last attempt
+        """
+        if not self.duration:
+            return 0.0
+        return self.size / self.duration
+
+
+@dataclass
+class RepositoryResult:
+    """
+    Result of the upload of all artifacts to one repository
+    """
+
+    name: str
+    ok: bool = False
+    duration: float = 0.0
+    error: str = None
+
+
+def get_credential_variables(repository_name):
+    """
+    Returns the names of the environment variables of poetry for the repository:
+    (token, username, password)
+
+    >>> token_name, username_name, password_name = get_credential_variables('test-pypi')
+    >>> token_name, username_name
+    ('POETRY_PYPI_TOKEN_TEST_PYPI', 'POETRY_HTTP_BASIC_TEST_PYPI_USERNAME')
+    """
+    key = re.sub(r'[^A-Za-z0-9]', '_', repository_name).upper()
+    return (
+        f'POETRY_PYPI_TOKEN_{key}',
+        f'POETRY_HTTP_BASIC_{key}_USERNAME',
+        f'POETRY_HTTP_BASIC_{key}_PASSWORD',
+    )
+
+
+def get_credentials(repository_name):
+    """
+    Returns (username, password) of the repository from the environment variables of poetry,
+    e.g. for "testpypi": POETRY_PYPI_TOKEN_TESTPYPI or
+    POETRY_HTTP_BASIC_TESTPYPI_USERNAME and POETRY_HTTP_BASIC_TESTPYPI_PASSWORD
+    """
+    token_name, username_name, password_name = get_credential_variables(repository_name)
+    token = os.environ.get(token_name)
+    if token:
+        return '__token__', token
+    return os.environ.get(username_name), os.environ.get(password_name)
+
+
+def make_session(username=None, password=None, max_connections=4):
+    """
+    Without credentials, the ones of twine are used: TWINE_USERNAME and TWINE_PASSWORD
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    if username is None:
+        username = os.environ.get('TWINE_USERNAME', '__token__')
+    if password is None:
+        password = os.environ.get('TWINE_PASSWORD')
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if password:
+        session.auth = (username, password)
+    session.headers['User-Agent'] = f'poetry-publish/{poetry_publish.__version__}'
+    return session
+
+
+def get_upload_fields(file_path, digests=None):
+    """
+    The form fields for the legacy upload API, without the file content.
+
+    If the ArtifactDigests from the release manifest are given, the file must be unchanged
+    and all known digests are sent.
+    """
+    from twine.package import PackageFile
+
+    package = PackageFile.from_filename(str(file_path), comment=None)
+    if digests is not None:
+        if package.sha2_digest != digests.sha256:
+            raise ValueError(f'{file_path} was changed after the build!')
+    fields = []
+    for key, value in package.metadata_dictionary().items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple)):
+            fields.extend((key, item) for item in value)
+        else:
+            fields.append((key, value))
+    if digests is not None and 'md5_digest' not in dict(fields):
+        fields.append(('md5_digest', digests.md5))
+    fields.append((':action', 'file_upload'))
+    fields.append(('protocol_version', '1'))
+    return fields
+
+
+def upload_file(
+    session,
+    repository_url,
+    file_path,
+    retries=3,
+    backoff=1.0,
+    digests=None,
+    timeout=UPLOAD_TIMEOUT,
+):
+    from requests import RequestException
+    from requests_toolbelt import MultipartEncoder
+
+    file_path = Path(file_path)
+    size = file_path.stat().st_size if digests is None else digests.size
+    result = UploadResult(filename=file_path.name, size=size)
+    try:
+        fields = get_upload_fields(file_path, digests=digests)
+    except ValueError as err:
+        result.error = str(err)
+        return result
+
+    for attempt in range(1, retries + 2):
+        if attempt > 1:
+            time.sleep(backoff * 2 ** (attempt - 2))
+
+        result.attempts = attempt
+        start_time = time.monotonic()
+        try:
+            with file_path.open('rb') as f:
+                encoder = MultipartEncoder(
+                    [*fields, ('content', (file_path.name, f, 'application/octet-stream'))]
+                )
+                response = session.post(
+                    repository_url,
+                    data=encoder,
+                    headers={'Content-Type': encoder.content_type},
+                    allow_redirects=False,
+                    timeout=timeout,
+                )
+        except RequestException as err:  # e.g.: a connection error or a timeout
+            result.error = repr(err)
+        else:
+            result.duration = time.monotonic() - start_time
+            if 200 <= response.status_code < 300:
+                result.ok = True
+                result.error = None
+                break
+
+            result.error = f'{response.status_code} {response.reason}'
+            if response.status_code not in RETRY_STATUS_CODES:
+                break
+
+    return result
+
+
+def upload_artifacts(
+    dist_path,
+    repository_url=PYPI_UPLOAD_URL,
+    username=None,
+    password=None,
+    max_workers=4,
+    retries=3,
+    backoff=1.0,
+    artifacts=None,
+    timeout=UPLOAD_TIMEOUT,
+):
+    """
+    Upload all artifacts from `dist_path` concurrently and return a UploadResult for every file.
+
+    `artifacts` are the ArtifactDigests from the release manifest: Only these files
+    are uploaded and they must be unchanged.
+
+    `timeout` is the (connect, read) timeout of every request in seconds: A index that
+    doesn't answer can't block the upload forever.
+    """
+    if artifacts is None:
+        uploads = [(file_path, None) for file_path in get_artifacts(dist_path)]
+    else:
+        uploads = [
+            (Path(dist_path, artifact.name), artifact)
+            for artifact in artifacts
+            if artifact.name.endswith(ARTIFACT_SUFFIXES)
+        ]
+
+    session = make_session(username=username, password=password, max_connections=max_workers)
+
+    def upload(file_path, digests):
+        return upload_file(
+            session,
+            repository_url,
+            file_path,
+            retries=retries,
+            backoff=backoff,
+            digests=digests,
+            timeout=timeout,
+        )
+
+    with session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(upload, *args) for args in uploads]
+        return [future.result() for future in futures]
+
+
+def print_repository_report(results):
+    for result in results:
+        status = 'OK' if result.ok else f'ERROR: {result.error}'
+        print(f'\t{result.name}: {result.duration:.2f}s - {status}')
+
+
+def print_upload_report(results):
+    for result in results:
+        status = 'OK' if result.ok else f'ERROR: {result.error}'
+        print(
+            f'\t{result.filename}: {result.size / 1024:.1f} KiB'
+            f' in {result.duration:.2f}s ({result.throughput / 1024 / 1024:.2f} MiB/s)'
+            f' attempts: {result.attempts} - {status}'
+        )
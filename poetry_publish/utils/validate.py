@@ -0,0 +1,204 @@
+"""
+    Validate wheel and sdist without extracting them
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Every file in a archive is read as a stream: The wheel files are hashed and compared
+    with the RECORD. The sdist is read in one pass through the compressed tar stream.
+    Nothing is written to disk. The archives are validated in parallel (zlib and hashlib
+    release the GIL).
+
+    Errors, e.g.: a wrong hash or a other version in the metadata, mean a broken artifact.
+    Warnings, e.g.: a very large file or files from a old "build" directory, must be
+    confirmed.
+"""
+
+import base64
+import csv
+import hashlib
+import io
+import tarfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from email.parser import HeaderParser
+from pathlib import Path
+from typing import List
+
+from poetry_publish.utils.twine_check import get_artifacts
+
+
+# Files bigger than this are reported:
+LARGE_FILE_SIZE = 10 * 1024 * 1024
+
+CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class ValidationResult:
+    name: str
+    files: int = 0
+    errors: List[str] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self):
+        return not self.errors
+
+
+def _normalize_version(version):
+    from packaging.version import InvalidVersion, Version
+
+    try:
+        return str(Version(version))
+    except InvalidVersion:
+        return version
+
+
+def check_metadata_version(result, metadata, version):
+    metadata_version = HeaderParser().parsestr(metadata).get('Version')
+    if metadata_version is None:
+        result.errors.append('No version in the metadata')
+    elif _normalize_version(metadata_version) != _normalize_version(version):
+        result.errors.append(f'Version in the metadata is {metadata_version!r}, not {version!r}')
+
+
+def check_file(result, name, size, large_file_size):
+    if size > large_file_size:
+        result.warnings.append(f'Large file: {name} ({size / 1024 / 1024:.1f} MiB)')
+    if name.startswith('build/'):
+        result.warnings.append(f'File from a "build" directory: {name}')
+
+
+def _record_hash(file_obj, algorithm):
+    digest = hashlib.new(algorithm)
+    while True:
+        chunk = file_obj.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+    return base64.urlsafe_b64encode(digest.digest()).rstrip(b'=').decode('ascii')
+
+
+def validate_wheel(wheel_path, version, large_file_size=LARGE_FILE_SIZE):
+    result = ValidationResult(name=Path(wheel_path).name)
+    with zipfile.ZipFile(wheel_path) as zip_file:
+        infos = [info for info in zip_file.infolist() if not info.is_dir()]
+        result.files = len(infos)
+
+        record_names = [
+            info.filename for info in infos if info.filename.endswith('.dist-info/RECORD')
+        ]
+        if len(record_names) != 1:
+            result.errors.append(f'Expected one .dist-info/RECORD, found: {record_names}')
+            return result
+        record_name = record_names[0]
+        dist_info = record_name.rsplit('/', 1)[0]
+
+        record = {}
+        with zip_file.open(record_name) as f:
+            for row in csv.reader(io.TextIOWrapper(f, encoding='utf-8', newline='')):
+                if row:
+                    record[row[0]] = row[1:]
+
+        try:
+            metadata = zip_file.read(f'{dist_info}/METADATA').decode('utf-8')
+        except KeyError:
+            result.errors.append(f'No {dist_info}/METADATA')
+        else:
+            check_metadata_version(result, metadata, version)
+
+        for info in infos:
+            name = info.filename
+            check_file(result, name, info.file_size, large_file_size)
+            if name == record_name or name in (f'{record_name}.jws', f'{record_name}.p7s'):
+                continue
+
+            try:
+                hash_value, size = record.pop(name)[:2]
+            except KeyError:
+                result.errors.append(f'Not in RECORD: {name}')
+                continue
+            if not hash_value:
+                result.errors.append(f'No hash in RECORD: {name}')
+                continue
+
+            algorithm, _, expected = hash_value.partition('=')
+            if algorithm not in ('sha256', 'sha384', 'sha512'):
+                result.errors.append(f'Unsupported hash in RECORD: {name} {algorithm}')
+                continue
+            with zip_file.open(info) as f:
+                actual = _record_hash(f, algorithm)
+            if actual != expected:
+                result.errors.append(f'Wrong hash in RECORD: {name}')
+            elif size and int(size) != info.file_size:
+                result.errors.append(f'Wrong size in RECORD: {name}')
+
+        for name in record:
+            if name != record_name:
+                result.errors.append(f'Missing file from RECORD: {name}')
+    return result
+
+
+def validate_sdist(sdist_path, version, large_file_size=LARGE_FILE_SIZE):
+    result = ValidationResult(name=Path(sdist_path).name)
+    root = None
+    metadata = None
+    # "r|gz" reads the archive as one stream, without seeking:
+    with tarfile.open(sdist_path, mode='r|gz') as tar_file:
+        for member in tar_file:
+            name = member.name
+            top_level, _, rel_path = name.partition('/')
+            if root is None:
+                root = top_level
+            if name.startswith('/') or '..' in name.split('/') or top_level != root:
+                result.errors.append(f'File outside of the root directory {root!r}: {name}')
+                continue
+            if member.issym() or member.islnk():
+                result.warnings.append(f'Link: {name} -> {member.linkname}')
+            if not member.isfile():
+                continue
+
+            result.files += 1
+            check_file(result, rel_path, member.size, large_file_size)
+            if rel_path == 'PKG-INFO':
+                metadata = tar_file.extractfile(member).read().decode('utf-8')
+
+    if metadata is None:
+        result.errors.append('No PKG-INFO')
+    else:
+        check_metadata_version(result, metadata, version)
+    return result
+
+
+def validate_artifact(path, version, large_file_size=LARGE_FILE_SIZE):
+    path = Path(path)
+    try:
+        if path.name.endswith('.whl'):
+            return validate_wheel(path, version, large_file_size)
+        if path.name.endswith('.tar.gz'):
+            return validate_sdist(path, version, large_file_size)
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError, ValueError) as err:
+        return ValidationResult(name=path.name, errors=[f'Broken archive: {err}'])
+    return ValidationResult(name=path.name, warnings=['Not validated: Unknown archive format'])
+
+
+def validate_artifacts(dist_path, version, max_workers=None, large_file_size=LARGE_FILE_SIZE):
+    """
+    Validate all wheels and sdists in `dist_path` in parallel.
+    Returns the ValidationResult of every artifact, sorted by name.
+    """
+    paths = get_artifacts(dist_path)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            lambda path: validate_artifact(path, version, large_file_size), paths
+        )
+        return sorted(results, key=lambda result: result.name)
+
+
+def print_validation_result(result):
+    status = 'OK' if result.ok else 'ERROR'
+    print(f'\t{result.name} ({result.files} files): {status}')
+    for error in result.errors:
+        print(f'\t\tERROR: {error}')
+    for warning in result.warnings:
+        print(f'\t\tWARNING: {warning}')
@@ -0,0 +1,84 @@
+"""
+    Kill external commands that exceed their timeout or the deadline of the current step
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    The deadline of a step starts with the step. Every command that the step calls
+    gets only the remaining time. The whole process tree of the command is killed,
+    so e.g.: a hanging ssh process of "git fetch" doesn't survive.
+"""
+
+import subprocess
+import threading
+import time
+
+from poetry_publish.utils.timing import get_current_step
+
+
+class StepTimeoutError(TimeoutError):
+    def __init__(self, step_name, timeout, elapsed, call_info):
+        super().__init__(
+            f'Step {step_name!r} timed out after {elapsed:.1f}s'
+            f' (deadline: {timeout}s), killed: {call_info}'
+        )
+        self.step_name = step_name
+        self.timeout = timeout
+        self.elapsed = elapsed
+        self.call_info = call_info
+
+
+class Watchdog:
+    """
+    Use as context manager around a running ChildProcess, e.g.:
+
+        with ChildProcess(args) as process, Watchdog(process, call_info) as watchdog:
+            process.wait()
+        watchdog.check()  # raise the timeout error, if the process was killed
+    """
+
+    def __init__(self, process, call_info, timeout=None):
+        self.process = process
+        self.call_info = call_info
+        self.timeout = timeout  # of this command, e.g.: for "git fetch"
+        self.step_timing = get_current_step()
+        self.expired = None  # 'command' or 'step', if the process was killed
+        self._reason = None
+        self._timer = None
+
+    def __enter__(self):
+        limits = []
+        if self.timeout is not None:
+            limits.append((self.timeout, 'command'))
+
+        step_timing = self.step_timing
+        if step_timing is not None and step_timing.timeout is not None:
+            deadline = step_timing.start_time + step_timing.timeout
+            limits.append((max(deadline - time.monotonic(), 0), 'step'))
+
+        if limits:
+            seconds, self._reason = min(limits)
+            self._timer = threading.Timer(seconds, self._expire)
+            self._timer.daemon = True
+            self._timer.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._timer is not None:
+            self._timer.cancel()
+
+    def _expire(self):
+        self.expired = self._reason
+        self.process.kill_tree()
+
+    def check(self):
+        """
+        Raise the timeout error, if the process was killed by the watchdog.
+        """
+        if self.expired == 'command':
+            raise subprocess.TimeoutExpired(self.process.args, self.timeout)
+        elif self.expired == 'step':
+            step_timing = self.step_timing
+            step_timing.timed_out = True
+            elapsed = time.monotonic() - step_timing.start_time
+            raise StepTimeoutError(
+                step_timing.name, step_timing.timeout, elapsed, self.call_info
+            )
@@ -0,0 +1,107 @@
+"""
+    Build in a clean git worktree on a scratch directory
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    The checkout of the project is not touched by the build: The worktree contains only
+    the committed files, so e.g.: a old "build" directory or untracked files can't get into
+    the artifacts. The scratch directory is a tmpfs (in memory), if available.
+
+    Many releases can build from the same clone at the same time: Every build gets
+    its own worktree.
+"""
+
+import errno
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from poetry_publish.utils.subprocess_utils import verbose_check_output
+
+
+# tmpfs on most Linux systems:
+SHM_PATH = Path('/dev/shm')
+
+# Free bytes the tmpfs needs for a worktree and its build, e.g.: containers use 64 MiB:
+SHM_MIN_FREE = 1024 * 1024 * 1024
+
+
+def get_scratch_dir(min_free=SHM_MIN_FREE):
+    """
+    Returns the directory for worktrees: tmpfs, if available and at least `min_free`
+    bytes are free, otherwise the temp directory.
+    """
+    if SHM_PATH.is_dir() and os.access(SHM_PATH, os.W_OK | os.X_OK):
+        try:
+            free = shutil.disk_usage(SHM_PATH).free
+        except OSError:
+            free = 0
+        if free >= min_free:
+            return SHM_PATH
+    return Path(tempfile.gettempdir())
+
+
+def get_git_prefix(cwd=None):
+    """
+    Returns the path of `cwd` relative to the root of its git repository, e.g.: "packages/foo/"
+    """
+    call_info, output = verbose_check_output('git', 'rev-parse', '--show-prefix', cwd=cwd)
+    return output.strip()
+
+
+@contextmanager
+def git_worktree(cwd=None, commit='HEAD', scratch_dir=None):
+    """
+    Check out `commit` of the git repository in `cwd` into a new worktree in the
+    scratch directory. The worktree is removed on exit.
+    """
+    if scratch_dir is None:
+        scratch_dir = get_scratch_dir()
+    worktree_path = Path(tempfile.mkdtemp(prefix='poetry_publish_', dir=scratch_dir))
+    try:
+        call_info, output = verbose_check_output(
+            'git', 'worktree', 'add', '--detach', str(worktree_path), commit, cwd=cwd
+        )
+        print(f'\t{call_info}')
+    except BaseException:
+        shutil.rmtree(worktree_path, ignore_errors=True)
+        raise
+
+    try:
+        yield worktree_path
+    finally:
+        try:
+            verbose_check_output(
+                'git', 'worktree', 'remove', '--force', str(worktree_path), cwd=cwd
+            )
+        finally:
+            shutil.rmtree(worktree_path, ignore_errors=True)
+
+
+def link_or_copy(src, dst):
+    """
+    Hard-link `src` to `dst`, or copy it, if that's not possible, e.g.: from tmpfs to a disk.
+    """
+    try:
+        os.link(src, dst)
+    except OSError as err:
+        if err.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+            raise
+        shutil.copy2(src, dst)
+
+
+def collect_artifacts(dist_path, output_path):
+    """
+    Hard-link or copy all artifacts from `dist_path` into `output_path`
+    and returns the new paths.
+    """
+    output_path = Path(output_path)
+    output_path.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for src in sorted(Path(dist_path).iterdir()):
+        if src.is_file():
+            dst = Path(output_path, src.name)
+            link_or_copy(src, dst)
+            paths.append(dst)
+    return paths